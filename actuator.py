@@ -0,0 +1,284 @@
+"""
+actuator.py
+Power limit / 風扇寫入的致動層 (actuator)。
+
+ - 寫入在背景 worker 執行，step 不會被慢的 driver 呼叫卡住
+ - 尚未執行的舊指令會被新目標覆蓋 (coalesce)，只套用最新值
+ - 目標整數瓦數與目前已套用值相同時直接略過 (no-op)
+ - 寫入後回讀 power.limit 確認，並記錄每筆指令的延遲
+"""
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+
+class ActuationResult(NamedTuple):
+    kind: str                  # "power_limit" / "fan"
+    gpu_id: int                # 風扇指令時為 fan 編號
+    target: int
+    applied: Optional[float]   # 回讀值 (無法回讀時為 None)
+    ok: bool
+    skipped: bool              # no-op，未下指令
+    latency: float             # submit -> 完成 (秒)
+    write_time: float          # 實際寫入 (含回讀) 花費 (秒)
+
+
+class CommandWriter:
+    """Writes through nvidia-smi / nvidia-settings (one process per distinct value)."""
+    name = "nvidia-smi"
+
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+
+    def set_power_limits(self, targets: Dict[int, int]) -> Dict[int, bool]:
+        # 相同瓦數的卡合併成一次 nvidia-smi -i a,b 呼叫
+        groups = {}
+        for gid, watts in targets.items():
+            groups.setdefault(watts, []).append(gid)
+        status = {}
+        for watts, ids in groups.items():
+            cmd = [
+                "nvidia-smi",
+                "-i", ",".join(str(i) for i in ids),
+                f"--power-limit={watts}"
+            ]
+            ok = self._run(cmd, "[WARN] Setting PL failed?")
+            status.update({gid: ok for gid in ids})
+        return status
+
+    def set_fans(self, targets: Dict[int, int]) -> Dict[int, bool]:
+        cmd = ["nvidia-settings"]
+        for fan, speed in targets.items():
+            cmd += ["--assign", f"[fan:{fan}]/GPUTargetFanSpeed={speed}"]
+        ok = self._run(cmd, "[WARN] Setting fan speed failed?")
+        return {fan: ok for fan in targets}
+
+    def _run(self, cmd, warn_msg) -> bool:
+        try:
+            subprocess.check_call(cmd, shell=False, timeout=self.timeout)
+            return True
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+            print(warn_msg, e)
+            return False
+
+
+class NVMLWriter(CommandWriter):
+    """Sets power limits in-process through NVML (needs root); fans still use nvidia-settings."""
+    name = "nvml"
+
+    def __init__(self, timeout=5.0):
+        super().__init__(timeout)
+        import pynvml  # optional dependency: nvidia-ml-py
+        self._nvml = pynvml
+        pynvml.nvmlInit()
+        self._handles = {}
+
+    def set_power_limits(self, targets: Dict[int, int]) -> Dict[int, bool]:
+        nvml = self._nvml
+        status = {}
+        for gid, watts in targets.items():
+            try:
+                if gid not in self._handles:
+                    self._handles[gid] = nvml.nvmlDeviceGetHandleByIndex(gid)
+                # NVML 單位為 mW
+                nvml.nvmlDeviceSetPowerManagementLimit(self._handles[gid], watts * 1000)
+                status[gid] = True
+            except nvml.NVMLError as e:
+                print("[WARN] Setting PL failed?", e)
+                status[gid] = False
+        return status
+
+
+class Actuator:
+    """
+    Coalescing, de-duplicating actuator for power limit and fan targets.
+    Args:
+        gpu_ids: controlled GPUs (order matches readback())
+        readback: callable returning one GPUSample per gpu_id, used to confirm
+                  the applied power limit (e.g. monitor.backend.read_all)
+        async_mode: run writes on a background worker (submit never blocks)
+        writer: CommandWriter (default) or NVMLWriter
+        spans: optional spans.Spans; each power limit write (including readback) is
+               recorded as the "actuator_write" span
+    """
+
+    def __init__(self, gpu_ids, readback: Optional[Callable] = None, async_mode=True,
+                 writer=None, history=256, spans=None):
+        self.gpu_ids = list(gpu_ids)
+        self.readback = readback
+        self.async_mode = async_mode
+        self.writer = writer if writer is not None else CommandWriter()
+        self.spans = spans
+
+        # 已確認套用的值；None 代表未知 (第一次一定會寫)
+        self.applied_pl: Dict[int, Optional[float]] = {gid: None for gid in self.gpu_ids}
+        self.applied_fan: Dict[int, Optional[int]] = {}
+        # 等待執行的目標: {gpu_id: (watts, submit_time)}
+        self._pending_pl: Dict[int, tuple] = {}
+        self._pending_fan: Dict[int, tuple] = {}
+
+        self.results = deque(maxlen=history)
+        self.stats = {"submitted": 0, "coalesced": 0, "skipped": 0, "written": 0, "failed": 0}
+        # 每張卡 / 每個風扇的失敗次數: {(kind, gpu_id 或 fan_id): n}
+        self.failures: Dict[tuple, int] = {}
+
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._worker = None
+
+    # ------------------------------------------------------------------
+    def submit_power_limits(self, targets: Dict[int, int]):
+        """Request integer-watt power limits {gpu_id: watts}; returns immediately in async mode."""
+        self._submit(self._pending_pl, targets)
+
+    def submit_fans(self, targets: Dict[int, int]):
+        """Request fan speeds {fan_id: percent}."""
+        self._submit(self._pending_fan, targets)
+
+    def _submit(self, pending, targets):
+        now = time.monotonic()
+        with self._cond:
+            for key, value in targets.items():
+                self.stats["submitted"] += 1
+                if key in pending:
+                    # 尚未執行的舊目標被覆蓋
+                    self.stats["coalesced"] += 1
+                pending[key] = (int(value), now)
+            if self.async_mode:
+                self._ensure_worker()
+                self._cond.notify_all()
+        if not self.async_mode:
+            self._drain()
+
+    def wait(self, timeout=None) -> bool:
+        """Block until every submitted target has been processed."""
+        if not self.async_mode:
+            return True
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not (self._pending_pl or self._pending_fan or self._busy),
+                timeout=timeout
+            )
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    # ------------------------------------------------------------------
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._worker_loop, name="actuator", daemon=True)
+            self._worker.start()
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._pending_pl or self._pending_fan)
+                if self._closed and not (self._pending_pl or self._pending_fan):
+                    return
+            self._drain()
+
+    def _drain(self):
+        with self._cond:
+            pl, self._pending_pl = self._pending_pl, {}
+            fan, self._pending_fan = self._pending_fan, {}
+            self._busy = True
+        try:
+            if pl:
+                self._apply_power_limits(pl)
+            if fan:
+                self._apply_fans(fan)
+        finally:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _apply_power_limits(self, pending):
+        todo = {}
+        for gid, (watts, t_submit) in pending.items():
+            applied = self.applied_pl.get(gid)
+            if applied is not None and int(round(applied)) == watts:
+                self._record("power_limit", gid, watts, applied, True, True, t_submit, 0.0)
+            else:
+                todo[gid] = (watts, t_submit)
+        if not todo:
+            return
+
+        spans = self.spans
+        t_span = spans.begin() if spans is not None else 0.0
+        t0 = time.monotonic()
+        status = self.writer.set_power_limits({gid: w for gid, (w, _) in todo.items()})
+        readings = self._read_back()
+        write_time = time.monotonic() - t0
+        if spans is not None:
+            spans.end("actuator_write", t_span)
+
+        for gid, (watts, t_submit) in todo.items():
+            ok = status.get(gid, False)
+            applied = readings.get(gid)
+            if applied is not None:
+                if int(round(applied)) != watts:
+                    print(f"[WARN] GPU {gid} PL readback {applied:.0f}W != target {watts}W")
+                    ok = False
+                self.applied_pl[gid] = applied
+            elif ok:
+                self.applied_pl[gid] = float(watts)
+            else:
+                self.applied_pl[gid] = None
+            self._record("power_limit", gid, watts, applied, ok, False, t_submit, write_time)
+
+    def _apply_fans(self, pending):
+        todo = {}
+        for fan, (speed, t_submit) in pending.items():
+            if self.applied_fan.get(fan) == speed:
+                self._record("fan", fan, speed, speed, True, True, t_submit, 0.0)
+            else:
+                todo[fan] = (speed, t_submit)
+        if not todo:
+            return
+        t0 = time.monotonic()
+        status = self.writer.set_fans({fan: s for fan, (s, _) in todo.items()})
+        write_time = time.monotonic() - t0
+        for fan, (speed, t_submit) in todo.items():
+            ok = status.get(fan, False)
+            self.applied_fan[fan] = speed if ok else None
+            # 風扇轉速需時間爬升，不以回讀確認
+            self._record("fan", fan, speed, None, ok, False, t_submit, write_time)
+
+    def _read_back(self) -> Dict[int, float]:
+        if self.readback is None:
+            return {}
+        try:
+            samples = self.readback()
+        except Exception as e:
+            print(f"[WARN] PL readback failed: {e}")
+            return {}
+        return {gid: s.power_limit for gid, s in zip(self.gpu_ids, samples)}
+
+    def _record(self, kind, key, target, applied, ok, skipped, t_submit, write_time):
+        if skipped:
+            self.stats["skipped"] += 1
+        elif ok:
+            self.stats["written"] += 1
+        else:
+            self.stats["failed"] += 1
+            self.failures[(kind, key)] = self.failures.get((kind, key), 0) + 1
+        self.results.append(ActuationResult(
+            kind, key, target, applied, ok, skipped,
+            time.monotonic() - t_submit, write_time
+        ))
+
+    def latest(self, kind="power_limit") -> List[ActuationResult]:
+        """Most recent result for every GPU / fan of the given kind."""
+        seen = {}
+        for r in reversed(self.results):
+            if r.kind == kind and r.gpu_id not in seen:
+                seen[r.gpu_id] = r
+        return list(seen.values())
@@ -0,0 +1,313 @@
+"""
+bench_step.py
+控制迴圈每一步的延遲量測 (CPU-only，可放在 CI)。
+
+實際的 GPUEnv + GPUInfoMonitor + Actuator + GPUControlCallback + PPO 整套，
+只把 nvidia-smi / nvidia-settings 換成 fake_nvidia.py 的替身 (可設定延遲)，
+量測每個階段的延遲分佈 (p50 / p90 / p99 / max) 與每秒步數。
+
+量測的階段:
+    env_step            GPUEnv.step 全部
+    actuation_submit    送出 PL 目標 (主執行緒，應該幾乎為 0)
+    actuation_write     nvidia-smi --power-limit (背景執行緒)
+    actuation_readback  寫入後回讀 PL (背景執行緒)
+    scheduler_wait      等待 deadline (--step-time 0 時只剩開銷)
+    telemetry           monitor.update_info (子行程 + 解析 + 趨勢)
+    telemetry_read      backend.read_all (nvidia-smi 子行程 + 解析)
+    telemetry_parse     parse_smi_line (每行)
+    obs_build           組觀測向量
+    reward              獎勵函式
+    policy_forward      PPO policy forward (rollout 時)
+    callback            GPUControlCallback._on_step
+    log_write           sink.write_many (緩衝寫入)
+    tb_dump             logger.dump (TensorBoard event file)
+    ppo_train           每個 rollout 之後的 PPO 更新
+
+用法:
+    python bench_step.py --steps 512 --json bench.json
+    python bench_step.py --latency query=0.05 power_limit=0.1 settings=0.2
+    python bench_step.py --baseline bench.json --max-regression 0.25   # 退步超過 25% 回傳 1
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+import fake_nvidia
+
+PHASES = (
+    "env_step", "actuation_submit", "actuation_write", "actuation_readback", "scheduler_wait",
+    "telemetry", "telemetry_read", "telemetry_parse", "obs_build", "reward",
+    "policy_forward", "callback", "log_write", "tb_dump", "ppo_train",
+)
+# 回歸比較預設只看中位數 (子行程的尾端延遲受機器負載影響大)
+COMPARE_STATS = ("p50",)
+
+
+class PhaseTimer:
+    """
+    Collects durations per phase by wrapping methods in place.
+    Wrapped calls may come from any thread (list.append is atomic).
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, obj, name, phase):
+        original = getattr(obj, name)
+        samples = self.samples[phase]
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            t0 = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                samples.append(clock() - t0)
+
+        setattr(obj, name, timed)
+        return original
+
+    def clear(self):
+        for samples in self.samples.values():
+            samples.clear()
+
+    def summary(self) -> dict:
+        """{phase: {count, mean, p50, p90, p99, max}} in milliseconds."""
+        result = {}
+        for phase in PHASES:
+            samples = self.samples.get(phase)
+            if not samples:
+                continue
+            ms = np.asarray(samples) * 1e3
+            p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+            result[phase] = {
+                "count": len(ms), "mean": float(ms.mean()), "p50": float(p50),
+                "p90": float(p90), "p99": float(p99), "max": float(ms.max()),
+            }
+        return result
+
+
+def _parse_latency(items):
+    latency = {}
+    for item in items or []:
+        key, _, value = item.partition("=")
+        if key not in fake_nvidia.DEFAULT_CONFIG["latency"] or not value:
+            raise SystemExit(f"--latency: expected query|power_limit|settings=SECONDS, got {item!r}")
+        latency[key] = float(value)
+    return latency
+
+
+def instrument(timer, env, model, callback):
+    """Wrap every measured phase of the env / model / callback stack."""
+    import telemetry
+
+    timer.wrap(env, "step", "env_step")
+    timer.wrap(env.actuator, "submit_power_limits", "actuation_submit")
+    timer.wrap(env.actuator.writer, "set_power_limits", "actuation_write")
+    timer.wrap(env.actuator, "_read_back", "actuation_readback")
+    timer.wrap(env.scheduler, "wait", "scheduler_wait")
+    timer.wrap(env.monitor, "update_info", "telemetry")
+    timer.wrap(env.monitor.backend, "read_all", "telemetry_read")
+    timer.wrap(telemetry, "parse_smi_line", "telemetry_parse")
+    timer.wrap(env, "_build_obs", "obs_build")
+    timer.wrap(env, "reward_fn", "reward")
+    # nn.Module.__call__ 會查 self.forward，實例屬性即可覆蓋
+    timer.wrap(model.policy, "forward", "policy_forward")
+    timer.wrap(model, "train", "ppo_train")
+    timer.wrap(callback, "_on_step", "callback")
+    timer.wrap(model.logger, "dump", "tb_dump")
+
+    init_callback = callback._init_callback
+
+    def _init_and_wrap_sink():
+        # sink 在 learn() 開始時才建立
+        init_callback()
+        if not hasattr(callback.sink.write_many, "__wrapped_phase__"):
+            timer.wrap(callback.sink, "write_many", "log_write")
+            callback.sink.write_many.__wrapped_phase__ = "log_write"
+
+    callback._init_callback = _init_and_wrap_sink
+
+
+def run_benchmark(steps=512, warmup=64, step_time=0.0, latency=None, jitter=0.0, n_steps=128,
+                  sample_hz=None, aggregate=False, log_format="csv", dump_interval=100,
+                  workdir=None, seed=0, verbose=1) -> dict:
+    """
+    Train PPO for `steps` timesteps on GPUEnv backed by the fake binaries.
+    Args:
+        warmup: timesteps run before measuring (imports, first subprocesses, first rollout)
+        step_time: GPUEnv control period; 0 measures pure loop overhead
+        latency: {"query"|"power_limit"|"settings": seconds} added by the fake binaries
+        n_steps: PPO rollout length (ppo_train runs every n_steps)
+    Returns:
+        report dict: config, phases (ms), steps_per_sec, environment
+    """
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.logger import configure
+
+    from custom_callback import GPUControlCallback
+    from env import GPUEnv
+
+    own_dir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="bench_step_")
+    saved_env = {key: os.environ.get(key) for key in ("PATH", fake_nvidia.STATE_ENV)}
+    os.environ.update(fake_nvidia.install(
+        os.path.join(workdir, "bin"), os.path.join(workdir, "fake_state.json"),
+        latency=latency or {}, jitter=jitter, echo=False
+    ))
+    env = callback = None
+    try:
+        env = GPUEnv(gpu_id=0, step_time=step_time, telemetry_backend="nvidia-smi", sample_hz=sample_hz)
+        model = PPO("MlpPolicy", env, n_steps=n_steps, batch_size=64, n_epochs=5, seed=seed, verbose=0,
+                    device="cpu")
+        # 自訂 logger (learn 不會再換掉)，TensorBoard 寫到暫存目錄
+        model.set_logger(configure(os.path.join(workdir, "tb"), ["tensorboard"]))
+        callback = GPUControlCallback(
+            verbose=0, dump_interval=dump_interval, aggregate=aggregate,
+            csv_path=os.path.join(workdir, "training_log." + ("npyc" if log_format == "npyc" else "csv"))
+        )
+
+        timer = PhaseTimer()
+        instrument(timer, env, model, callback)
+        if warmup:
+            model.learn(warmup, callback=callback)
+            env.actuator.wait(timeout=10.0)
+            timer.clear()
+
+        t0 = time.perf_counter()
+        model.learn(steps, callback=callback, reset_num_timesteps=False)
+        elapsed = time.perf_counter() - t0
+        env.actuator.wait(timeout=10.0)
+        phases = timer.summary()
+        loop_ms = phases.get("env_step", {}).get("mean", 0.0) + phases.get("policy_forward", {}).get("mean", 0.0) \
+            + phases.get("callback", {}).get("mean", 0.0)
+        report = {
+            "config": {
+                "steps": steps, "warmup": warmup, "step_time": step_time, "latency": latency or {},
+                "jitter": jitter, "n_steps": n_steps, "sample_hz": sample_hz, "aggregate": aggregate,
+                "log_format": log_format, "dump_interval": dump_interval,
+            },
+            "phases": phases,
+            "steps_per_sec": steps / elapsed,
+            # 不含 PPO 更新的單步迴圈 (env + policy + callback)
+            "loop_steps_per_sec": 1e3 / loop_ms if loop_ms > 0 else None,
+            "elapsed": elapsed,
+            "actuator": dict(env.actuator.stats),
+            "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        }
+    finally:
+        if callback is not None:
+            callback.close()
+        if env is not None:
+            env.close()
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        if own_dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if verbose:
+        print_report(report)
+    return report
+
+
+def print_report(report):
+    print(f"{'phase':<20}{'count':>7}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}   (ms)")
+    for phase, s in report["phases"].items():
+        print(f"{phase:<20}{s['count']:>7}{s['mean']:>10.3f}{s['p50']:>10.3f}"
+              f"{s['p90']:>10.3f}{s['p99']:>10.3f}{s['max']:>10.3f}")
+    loop = report["loop_steps_per_sec"]
+    print(f"steps/s: {report['steps_per_sec']:.1f} (learn, incl. PPO updates)"
+          + (f", {loop:.1f} (control loop only)" if loop else ""))
+
+
+def compare(report, baseline, max_regression=0.25, min_delta_ms=0.5, phases=None, stats=COMPARE_STATS,
+            min_count=20) -> list:
+    """
+    Phases whose latency grew by more than max_regression (relative) AND min_delta_ms
+    (absolute, so sub-millisecond noise does not fail CI), plus the steps/s drop.
+    Phases with fewer than min_count samples (ppo_train, tb_dump) are too noisy to gate on
+    unless listed explicitly in `phases`.
+    Returns:
+        list of human readable regression messages (empty = pass)
+    """
+    failures = []
+    for phase, base in baseline["phases"].items():
+        if phases and phase not in phases:
+            continue
+        current = report["phases"].get(phase)
+        if current is None or (not phases and min(base["count"], current["count"]) < min_count):
+            continue
+        for stat in stats:
+            old, new = base[stat], current[stat]
+            if new - old > min_delta_ms and new > old * (1.0 + max_regression):
+                failures.append(f"{phase} {stat}: {old:.3f} -> {new:.3f} ms (+{(new / old - 1.0) * 100:.0f}%)"
+                                if old > 0 else f"{phase} {stat}: {old:.3f} -> {new:.3f} ms")
+    old, new = baseline["steps_per_sec"], report["steps_per_sec"]
+    if new < old / (1.0 + max_regression):
+        failures.append(f"steps/s: {old:.1f} -> {new:.1f} ({(new / old - 1.0) * 100:.0f}%)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-phase step latency against fake nvidia-smi / nvidia-settings")
+    parser.add_argument("--steps", type=int, default=512, help="measured timesteps")
+    parser.add_argument("--warmup", type=int, default=64, help="timesteps before measuring")
+    parser.add_argument("--step-time", type=float, default=0.0, help="GPUEnv control period (0 = free running)")
+    parser.add_argument("--latency", nargs="*", default=[], metavar="KIND=SECONDS",
+                        help="extra latency of the fake binaries: query / power_limit / settings")
+    parser.add_argument("--jitter", type=float, default=0.0, help="relative latency jitter (0.2 = +-20%%)")
+    parser.add_argument("--n-steps", type=int, default=128, help="PPO rollout length")
+    parser.add_argument("--sample-hz", type=float, default=None, help="background telemetry sampler rate")
+    parser.add_argument("--aggregate", action="store_true", help="window-aggregated TensorBoard logging")
+    parser.add_argument("--log-format", default="csv", choices=("csv", "npyc"))
+    parser.add_argument("--dump-interval", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="write the report here")
+    parser.add_argument("--baseline", default=None, help="compare against a previous --json report")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed relative slowdown per phase (--stats, default p50) and for steps/s")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="ignore slowdowns smaller than this many milliseconds")
+    parser.add_argument("--phases", nargs="*", default=None, choices=PHASES,
+                        help="only check these phases against the baseline")
+    parser.add_argument("--stats", nargs="*", default=list(COMPARE_STATS), choices=("mean", "p50", "p90", "p99"),
+                        help="statistics compared against the baseline")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        steps=args.steps, warmup=args.warmup, step_time=args.step_time,
+        latency=_parse_latency(args.latency), jitter=args.jitter, n_steps=args.n_steps,
+        sample_hz=args.sample_hz, aggregate=args.aggregate, log_format=args.log_format,
+        dump_interval=args.dump_interval, seed=args.seed
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {args.json}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["config"] != report["config"]:
+            print("[WARN] baseline was measured with a different configuration")
+        failures = compare(report, baseline, args.max_regression, args.min_delta_ms, args.phases, args.stats)
+        if failures:
+            print("REGRESSION:")
+            for line in failures:
+                print("  " + line)
+            sys.exit(1)
+        print(f"no regression against {args.baseline} (max {args.max_regression * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+checkpoint.py
+訓練中定期存檔 (背景寫檔) 與從存檔續訓。
+
+ - AsyncCheckpointCallback : 每 save_freq 步 (在 rollout 邊界) 於主執行緒複製一份狀態
+                             (policy / optimizer state_dict、timestep、_last_obs、ep_info_buffer、
+                             RNG、callback 狀態)，序列化與寫檔交給背景執行緒，控制迴圈不會停頓
+ - load_checkpoint         : 讀回存檔 (SB3 zip + 額外狀態)，learn(reset_num_timesteps=False)
+                             即從存檔的 rollout 邊界接續
+
+目錄結構:
+    checkpoints/step_00000512.zip        # 與 model.save() 相同格式，PPO.load 可直接讀
+    checkpoints/step_00000512.state.pt   # RNG / callback / env 狀態
+    checkpoints/latest.json              # 最後一個完整寫完的存檔 (最後才寫，當作 commit)
+
+續訓:
+    model, remaining = load_checkpoint("checkpoints", env, callbacks=[gpu_cb], total_timesteps=10000)
+    model.learn(remaining, callback=..., reset_num_timesteps=False)
+"""
+import copy
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import torch
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.save_util import save_to_zip_file
+from stable_baselines3.common.vec_env import VecEnv
+
+LATEST = "latest.json"
+
+
+def snapshot_model(model):
+    """
+    Copy everything BaseAlgorithm.save() would write, without serializing.
+    Returns:
+        (data, params, pytorch_variables) for save_to_zip_file
+    """
+    data = model.__dict__.copy()
+    exclude = set(model._excluded_save_params())
+    state_dicts_names, torch_variable_names = model._get_torch_save_params()
+    for name in state_dicts_names + torch_variable_names:
+        exclude.add(name.split(".")[0])
+    for name in exclude:
+        data.pop(name, None)
+    # 會在訓練中被改寫的容器 (ep_info_buffer、_last_obs 等) 需要複本
+    data = copy.deepcopy(data)
+
+    params = {}
+    for name, state in model.get_parameters().items():
+        params[name] = copy.deepcopy(state)
+
+    pytorch_variables = None
+    if torch_variable_names:
+        pytorch_variables = {}
+        for name in torch_variable_names:
+            obj = model
+            for attr in name.split("."):
+                obj = getattr(obj, attr)
+            pytorch_variables[name] = obj.detach().clone() if torch.is_tensor(obj) else copy.deepcopy(obj)
+    return data, params, pytorch_variables
+
+
+def _rng_state():
+    return {
+        "torch": torch.get_rng_state(),
+        "numpy": np.random.get_state(),
+        "python": random.getstate(),
+    }
+
+
+def _set_rng_state(state):
+    torch.set_rng_state(state["torch"])
+    np.random.set_state(state["numpy"])
+    random.setstate(state["python"])
+
+
+def _env_state(vec_env):
+    # 控制器內部的上一個 PL (相對動作的基準)；沒有這個屬性的 env 略過
+    try:
+        return {"pl_old": copy.deepcopy(vec_env.get_attr("pl_old"))}
+    except AttributeError:
+        return {}
+
+
+def _restore_env_state(vec_env, state):
+    for name, values in state.items():
+        for i, value in enumerate(values):
+            try:
+                # DummyVecEnv / SubprocVecEnv: 設到 Monitor 等 wrapper 內層的 env
+                vec_env.env_method("set_wrapper_attr", name, value, indices=[i])
+            except AttributeError:
+                vec_env.set_attr(name, value, indices=[i])
+
+
+class AsyncCheckpointCallback(BaseCallback):
+    """
+    Periodic checkpoints written by a background thread.
+    Args:
+        save_dir: checkpoint directory
+        save_freq: minimum steps between checkpoints; saved at the next rollout
+                   boundary, so a resumed run continues exactly
+        keep_last: number of checkpoints kept on disk, counting the ones already in
+                   save_dir (the least recently written are deleted)
+        callbacks: objects with state_dict() / load_state_dict() saved alongside
+                   (e.g. GPUControlCallback)
+        save_on_end: also checkpoint when learn() ends
+    """
+
+    def __init__(self, save_dir="checkpoints", save_freq=512, keep_last=3, callbacks=(),
+                 save_on_end=True, verbose=1):
+        super().__init__(verbose)
+        self.save_dir = save_dir
+        self.save_freq = save_freq
+        self.keep_last = keep_last
+        self.state_callbacks = list(callbacks)
+        self.save_on_end = save_on_end
+        self._last_save = None
+        self._pending = None
+        self._cond = threading.Condition()
+        self._writing = False
+        self._closed = False
+        self._thread = None
+        self.snapshot_secs = 0.0     # 最近一次在主執行緒花的時間
+        self.write_secs = 0.0        # 最近一次背景寫檔時間
+        self.saved = []              # 已寫完的 step
+
+    def _init_callback(self) -> None:
+        os.makedirs(self.save_dir, exist_ok=True)
+        if self._last_save is None:
+            self._last_save = self.num_timesteps
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._write_loop, name="checkpoint-writer", daemon=True)
+            self._thread.start()
+
+    def _on_step(self) -> bool:
+        return True
+
+    def _on_rollout_start(self) -> None:
+        # rollout 邊界：上一輪 train() 已完成、rollout buffer 為空，續訓只需要這裡的狀態
+        if self.num_timesteps - self._last_save >= self.save_freq:
+            self.checkpoint()
+
+    def _on_training_end(self) -> None:
+        if self.save_on_end and self.num_timesteps != self._last_save:
+            self.checkpoint()
+        self.wait()
+
+    # ------------------------------------------------------------------
+    def checkpoint(self):
+        """Snapshot now (main thread) and hand the write to the background thread."""
+        t0 = time.perf_counter()
+        step = self.model.num_timesteps
+        data, params, pytorch_variables = snapshot_model(self.model)
+        extra = {
+            "num_timesteps": step,
+            "rng": _rng_state(),
+            "env": _env_state(self.model.get_env()),
+            "callbacks": [cb.state_dict() for cb in self.state_callbacks],
+            "wall_time": time.time(),
+        }
+        with self._cond:
+            # 上一份還沒開始寫就被新的取代 (只保留最新)
+            self._pending = (step, data, params, pytorch_variables, extra)
+            self._cond.notify()
+        self._last_save = step
+        self.snapshot_secs = time.perf_counter() - t0
+
+    def wait(self):
+        """Block until every queued checkpoint is on disk."""
+        with self._cond:
+            while self._pending is not None or self._writing:
+                self._cond.wait()
+
+    def close(self):
+        self.wait()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                job, self._pending = self._pending, None
+                self._writing = True
+            try:
+                self._write(*job)
+            except Exception as e:
+                print("[WARN] checkpoint write failed?", e)
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def _write(self, step, data, params, pytorch_variables, extra):
+        t0 = time.perf_counter()
+        base = os.path.join(self.save_dir, f"step_{step:08d}")
+        # 先寫暫存檔再 rename，中途當機不會留下半個存檔
+        save_to_zip_file(base + ".zip.tmp", data=data, params=params, pytorch_variables=pytorch_variables)
+        os.replace(base + ".zip.tmp", base + ".zip")
+        torch.save(extra, base + ".state.pt.tmp")
+        os.replace(base + ".state.pt.tmp", base + ".state.pt")
+        latest = {"step": step, "model": os.path.basename(base) + ".zip",
+                  "state": os.path.basename(base) + ".state.pt"}
+        tmp = os.path.join(self.save_dir, LATEST + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(latest, f)
+        os.replace(tmp, os.path.join(self.save_dir, LATEST))
+
+        self.saved.append(step)
+        if self.keep_last:
+            self._prune()
+        self.write_secs = time.perf_counter() - t0
+        if self.verbose:
+            print(f"[checkpoint] step {step} -> {base}.zip "
+                  f"(snapshot {self.snapshot_secs * 1e3:.1f} ms, write {self.write_secs * 1e3:.0f} ms)")
+
+
+    def _prune(self):
+        # 以目錄裡的檔案為準 (含之前的執行留下的)，保留最近寫入的 keep_last 份
+        steps = list_checkpoints(self.save_dir)
+        steps.sort(key=lambda s: (os.path.getmtime(os.path.join(self.save_dir, f"step_{s:08d}.zip")), s))
+        for old in steps[:-self.keep_last]:
+            for ext in (".zip", ".state.pt"):
+                path = os.path.join(self.save_dir, f"step_{old:08d}{ext}")
+                if os.path.exists(path):
+                    os.remove(path)
+        self.saved = self.saved[-self.keep_last:]
+
+
+def list_checkpoints(save_dir):
+    """Steps of the step_XXXXXXXX.zip checkpoints in save_dir (ascending)."""
+    steps = []
+    for name in os.listdir(save_dir):
+        if name.startswith("step_") and name.endswith(".zip") and name[5:-4].isdigit():
+            steps.append(int(name[5:-4]))
+    return sorted(steps)
+
+
+def latest_checkpoint(save_dir):
+    """Path prefix of the newest complete checkpoint in save_dir, or None."""
+    path = os.path.join(save_dir, LATEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        latest = json.load(f)
+    return os.path.join(save_dir, latest["model"][:-len(".zip")])
+
+
+def load_checkpoint(path, env, algo=None, callbacks=(), total_timesteps=None, reset_env=False, **load_kwargs):
+    """
+    Restore a checkpoint written by AsyncCheckpointCallback.
+    Args:
+        path: checkpoint directory (uses latest.json) or a "step_XXXXXXXX" prefix
+        env: environment to attach (same spaces as during training); a live VecEnv
+             continues as is, a plain env is reset once to the saved power limit
+        algo: SB3 class (default PPO)
+        callbacks: objects whose state was saved (same order as when saving)
+        total_timesteps: overall budget; the remaining steps are returned
+        reset_env: call env.reset() now and start from that observation instead of
+                   the saved one; the saved power limit is not restored
+                   (the physical GPU state is never part of a checkpoint).
+                   learn(reset_num_timesteps=False) does not reset again, so load
+                   only once the hardware is ready (e.g. after preconditioning)
+    Returns:
+        (model, remaining_timesteps)
+    """
+    if algo is None:
+        from stable_baselines3 import PPO
+        algo = PPO
+    if os.path.isdir(path):
+        prefix = latest_checkpoint(path)
+        if prefix is None:
+            raise FileNotFoundError(f"{path}: no checkpoint")
+    else:
+        prefix = path[:-len(".zip")] if path.endswith(".zip") else path
+
+    # force_reset=False: 保留存檔的 _last_obs，learn() 不會重新 reset env
+    model = algo.load(prefix + ".zip", env=env, force_reset=reset_env, **load_kwargs)
+    extra = torch.load(prefix + ".state.pt", weights_only=False)
+    _set_rng_state(extra["rng"])
+    for cb, state in zip(callbacks, extra["callbacks"]):
+        cb.load_state_dict(state)
+    vec_env = model.get_env()
+    if reset_env:
+        # 明確 reset (不等 learn() 的 _setup_learn)，predict / learn 都從新的觀測開始
+        model._last_obs = vec_env.reset()
+        model._last_episode_starts = np.ones((vec_env.num_envs,), dtype=bool)
+        if model._vec_normalize_env is not None:
+            model._last_original_obs = model._vec_normalize_env.get_original_obs()
+    else:
+        if not isinstance(env, VecEnv):
+            # 剛包上的 Monitor / DummyVecEnv 要先 reset 才能 step：以存檔的 PL 重新 reset，
+            # 之後仍沿用存檔的 _last_obs
+            pl_old = extra["env"].get("pl_old")
+            if pl_old is not None and all(np.ndim(pl) == 0 for pl in pl_old):
+                vec_env.set_options([{"power_limit": float(pl)} for pl in pl_old])
+            vec_env.reset()
+        _restore_env_state(vec_env, extra["env"])
+
+    remaining = None
+    if total_timesteps is not None:
+        remaining = max(total_timesteps - model.num_timesteps, 0)
+    return model, remaining
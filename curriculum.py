@@ -0,0 +1,184 @@
+"""
+curriculum.py
+場景 A -> B -> C -> D 在同一個行程、同一個模型上連續訓練。
+
+原本每個場景是獨立腳本 (train.py / train_B.py / ...)：重建 GPUEnv、從 zip 重新載入模型、
+重建 optimizer，而且每個階段都要有人重新啟動。這裡把場景寫成 Stage 清單，
+階段切換只做：設定風扇 / 獎勵 / 負載強度 -> (升溫) -> 以 stage 的起始 PL reset -> learn，
+模型、optimizer、callback 與 logger 全部沿用，不經過磁碟。
+
+用法:
+    python curriculum.py                        # A B C D，實機
+    python curriculum.py --stages B C --init modelA.zip
+    python curriculum.py --sim --scale 0.01     # 模擬器快速試跑 (步數 x 0.01)
+"""
+import argparse
+import time
+from typing import NamedTuple, Optional
+
+SCENARIO_ORDER = ("A", "B", "C", "D")
+
+
+class Stage(NamedTuple):
+    name: str
+    steps: int                             # 本階段的訓練步數
+    fan: Optional[float] = None            # None = 沿用上一階段
+    power_limit: Optional[float] = None    # reset 後的起始 PL (None = env 預設 260W)
+    warmup_temp: Optional[float] = None    # 升溫到此溫度 (Preconditioner) 後才開始
+    reward: Optional[str] = None           # reward.py 的 variant 名稱 (None = 沿用)
+    load_intensity: Optional[float] = None # 有 TracePlayer 時調整回放強度
+    save: Optional[str] = None             # 階段結束後存檔 (None = 不存)
+
+
+# 與 train.py / train_B.py / train_C.py / train_D.py 相同的設定
+SCENARIOS = {
+    # 場景 A: fan=100% 燒到 65 度，起始 PL 250W，學會緩慢提升 PL
+    "A": Stage("A", 10000, fan=100.0, power_limit=250.0, warmup_temp=65.0, save="modelA.zip"),
+    # 場景 B: 風扇降到 30%
+    "B": Stage("B", 15000, fan=30.0, save="modelA_B.zip"),
+    "C": Stage("C", 20000, save="modelA_B_C.zip"),
+    "D": Stage("D", 12000, save="modelA_B_C_D.zip"),
+}
+
+
+def default_preconditioner(env, target_temp, verbose=1):
+    """Preconditioner for GPUEnv (CUDA duty-cycle load) or SimGPUEnv (simulated util and time)."""
+    from preconditioner import Preconditioner
+    from workload import CudaMatmulWorkload, DutyCycleWorker, SimLoad
+
+    if hasattr(env, "model"):
+        return Preconditioner(env.get_temp, SimLoad(env.model), target_temp=target_temp,
+                              clock=env._clock, sleep=env._wait, verbose=verbose)
+    return Preconditioner(env.get_temp, DutyCycleWorker(CudaMatmulWorkload()),
+                          target_temp=target_temp, verbose=verbose)
+
+
+class CurriculumRunner:
+    """
+    Runs stages back to back on one live model.
+    Args:
+        model: SB3 algorithm whose env wraps `env`
+        env: the GPUEnv / SimGPUEnv / SimGPUVecEnv the stages configure
+        callback: reused for every stage (e.g. GPUControlCallback)
+        player: optional TracePlayer for Stage.load_intensity
+        make_preconditioner: (env, target_temp) -> Preconditioner for Stage.warmup_temp
+    """
+
+    def __init__(self, model, env, callback=None, player=None, make_preconditioner=default_preconditioner,
+                 save=True, verbose=1):
+        self.model = model
+        self.env = env
+        self.callback = callback
+        self.player = player
+        self.make_preconditioner = make_preconditioner
+        self.save = save
+        self.verbose = verbose
+        # (stage, 切換秒數, 訓練秒數)
+        self.timings = []
+
+    def run(self, stages):
+        for stage in stages:
+            t0 = time.monotonic()
+            self.apply(stage)
+            t1 = time.monotonic()
+            if self.verbose:
+                print(f"[curriculum] stage {stage.name}: {stage.steps} steps "
+                      f"(setup {t1 - t0:.3f}s, timestep {self.model.num_timesteps})")
+            self.model.learn(
+                total_timesteps=stage.steps,
+                callback=self.callback,
+                reset_num_timesteps=False,
+                tb_log_name=stage.name,
+                log_interval=1
+            )
+            t2 = time.monotonic()
+            if self.save and stage.save:
+                self.model.save(stage.save)
+                if self.verbose:
+                    print(f"[curriculum] stage {stage.name} saved to {stage.save}")
+            self.timings.append((stage.name, t1 - t0, t2 - t1))
+        return self.model
+
+    def apply(self, stage: Stage):
+        """Configure the env for a stage and force a reset with its starting power limit."""
+        env = self.env
+        if stage.fan is not None:
+            env.set_fan_speed(stage.fan)
+        if stage.reward is not None:
+            from reward import get_reward
+            variant = get_reward(stage.reward)
+            if hasattr(env, "set_reward"):
+                env.set_reward(variant.scalar)
+            else:
+                env.reward_fn = variant.batch      # SimGPUVecEnv
+        if stage.load_intensity is not None and self.player is not None:
+            self.player.set_intensity(stage.load_intensity)
+        if stage.warmup_temp is not None:
+            if hasattr(env, "warm_up"):
+                env.warm_up(target_temp=stage.warmup_temp)
+            else:
+                precondition = self.make_preconditioner(env, stage.warmup_temp)
+                if not precondition.run():
+                    print(f"[WARN] stage {stage.name}: warm-up ended as {precondition.status.state} "
+                          f"at {precondition.status.temp:.1f}")
+                precondition.close()
+
+        vec_env = self.model.get_env()
+        vec_env.set_options({"power_limit": stage.power_limit} if stage.power_limit is not None else {})
+        # _last_obs = None 讓 learn() 以新的 options 重新 reset (起始 PL、清空歷史)
+        self.model._last_obs = None
+
+
+def main():
+    from stable_baselines3 import PPO
+    from custom_callback import GPUControlCallback
+
+    parser = argparse.ArgumentParser(description="Train scenarios A-D in one process")
+    parser.add_argument("--stages", nargs="*", default=list(SCENARIO_ORDER), choices=SCENARIO_ORDER)
+    parser.add_argument("--init", default=None, help="continue from a saved model (zip)")
+    parser.add_argument("--sim", action="store_true", help="train on SimGPUEnv instead of the real GPU")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every stage's step budget")
+    parser.add_argument("--no-save", action="store_true", help="do not write the per-stage zips")
+    parser.add_argument("--name", default="curriculum", help="TensorBoard run directory under tb_logs/")
+    args = parser.parse_args()
+
+    if args.sim:
+        from sim_env import SimGPUEnv
+        env = SimGPUEnv(step_time=2.0, seed=0)
+    else:
+        from env import GPUEnv
+        env = GPUEnv(gpu_id=0, step_time=2.0)
+
+    if args.init:
+        model = PPO.load(args.init, env=env, tensorboard_log=f"./tb_logs/{args.name}")
+    else:
+        model = PPO(
+            "MlpPolicy",
+            env,
+            verbose=1,
+            tensorboard_log=f"./tb_logs/{args.name}",
+            n_steps=256,
+            batch_size=64,
+            n_epochs=5,
+            gamma=0.99,
+            gae_lambda=0.95,
+            clip_range=0.2,
+            policy_kwargs=dict(log_std_init=1.0),
+        )
+    callback = GPUControlCallback(verbose=0, dump_interval=30, aggregate=True, csv_path="training_log.csv")
+
+    stages = [SCENARIOS[name] for name in args.stages]
+    if args.scale != 1.0:
+        stages = [s._replace(steps=max(1, int(s.steps * args.scale))) for s in stages]
+    runner = CurriculumRunner(model, env, callback=callback, save=not args.no_save)
+    try:
+        runner.run(stages)
+    finally:
+        callback.close()
+        env.close()
+    for name, setup, train in runner.timings:
+        print(f"stage {name}: setup {setup:.3f}s, training {train:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,24 @@
 """
 custom_callback.py
-記錄到 TensorBoard + 印在終端機 + 寫到 CSV
+記錄到 TensorBoard + 印在終端機 + 寫到 CSV (緩衝寫入，見 log_sink.py)
 """
 
-import os
-import csv
 import numpy as np
 from stable_baselines3.common.callbacks import BaseCallback
 
+from log_sink import make_sink
+from rolling_stats import RollingStats
+from window_logger import WindowAggregator
+
+LOG_COLUMNS = ("timestep", "temp", "power_limit", "reward", "slope_3s", "power_draw", "eta", "fan", "util")
+STAT_COLUMNS = ("temp", "slope_3s", "power_limit", "power_draw", "eta", "fan", "util", "reward", "temp_max")
+
+# TELEMETRY_KEYS 各欄對應的 TensorBoard key
+_TB_KEYS = ("gpu/temp", "gpu/slope_3s", "gpu/power_limit", "gpu/power_draw", "gpu/eta", "gpu/fan", "gpu/utilization")
+# 沒有 info["telemetry"] 的 env 改用 get_attr 讀取的屬性 (TELEMETRY_KEYS 順序)
+_CURRENT_ATTRS = ("current_temp", "current_slope_3s", "current_power_limit", "current_power_draw",
+                  "current_eta", "current_fan", "current_utilization")
+
 class EarlyStopCallback(BaseCallback):
     def __init__(self, max_steps: int):
         super().__init__()
@@ -20,119 +31,211 @@ class EarlyStopCallback(BaseCallback):
         return True
 
 class GPUControlCallback(BaseCallback):
-    def __init__(self, verbose=1, dump_interval=100, csv_path="training_log.csv"):
+    def __init__(self, verbose=1, dump_interval=100, csv_path="training_log.csv",
+                 log_format=None, flush_rows=256, flush_secs=5.0, stats_window=1024,
+                 aggregate=False, dump_secs=None, per_env_limit=8):
+        """
+        Args:
+            csv_path: log file; a ".npyc" extension (or log_format="npyc") selects
+                      the columnar binary format (log_sink.load_chunks)
+            flush_rows / flush_secs: rows are buffered and written in the background
+            stats_window: steps covered by the rolling statistics (self.stats)
+            aggregate: instead of recording every step, write one window summary
+                       (mean/min/max/last + temp/PL/action histograms) every
+                       dump_interval steps and/or dump_secs seconds
+            per_env_limit: with several envs / GPUs, also log individual values
+                           for the first per_env_limit of them (gpu_env/<i>/...)
+
+        Telemetry comes from info["telemetry"] of every env (GPUEnv, SimGPUVecEnv),
+        so it works with DummyVecEnv, SubprocVecEnv and vectorized simulators.
+        With more than one env / GPU the log gets one row per env per step and
+        an extra "env" column.
+        """
         super().__init__(verbose)
         self.dump_interval = dump_interval
         self.csv_path = csv_path
+        self.log_format = log_format
+        self.flush_rows = flush_rows
+        self.flush_secs = flush_secs
+        self.per_env_limit = per_env_limit
+        self.log_env_column = False
+        self.sink = None
+        self.window = None
+        if aggregate:
+            self.window = WindowAggregator(
+                every_steps=dump_interval, every_secs=dump_secs,
+                histograms=("gpu/temp", "gpu/power_limit", "gpu/action")
+            )
 
         self.header_written = False
 
-        self.temp_log = []
-        self.slope_3s_log = []
-        self.pl_log = []
-        self.power_draw_log = []
-        self.eta_log = []
-        self.fan_log = []
-        self.util_log = []
-        self.reward_log = []
+        # 最近 stats_window 步的滑動統計 (固定記憶體)，其他 callback 可讀 self.stats.summary()
+        self.stats = RollingStats(
+            STAT_COLUMNS,
+            window=stats_window,
+            sketch_ranges={"temp": (0.0, 120.0, 480), "power_limit": (100.0, 275.0, 175)},
+            thresholds={"temp_above_75": ("temp_max", 75.0)}
+        )
 
-        self.episode_reward = 0.0
+        self.episode_rewards = np.zeros(0)
 
     def _init_callback(self) -> None:
         """
-        在訓練開始前呼叫，可用來初始化 CSV。
+        在訓練開始前呼叫，開啟紀錄檔 (只有新檔案才寫 header)。
         """
-        
-
-        with open(self.csv_path, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                "timestep", 
-                "temp", 
-                "power_limit",
-                "reward",
-                "slope_3s",
-                "power_draw",
-                "eta",
-                "fan",
-                "util"
-            ])
+        if self.sink is None:
+            # 每步的列數 = env 數 x 每個 env 的 GPU 數 (多卡 obs 為 (N, F))
+            obs_shape = self.training_env.observation_space.shape
+            try:
+                history_len = self.training_env.get_attr("history_len")[0]
+            except AttributeError:
+                history_len = None
+            if history_len:
+                # history 觀測 (K, F) / (N, K, F)：去掉時間軸
+                obs_shape = obs_shape[:-2] + obs_shape[-1:]
+            slots = self.training_env.num_envs * (obs_shape[0] if len(obs_shape) == 2 else 1)
+            self.log_env_column = slots > 1
+            columns = LOG_COLUMNS + (("env",) if self.log_env_column else ())
+            self.sink = make_sink(
+                self.csv_path, columns, self.log_format,
+                flush_rows=self.flush_rows, flush_secs=self.flush_secs
+            )
         self.header_written = True
 
-    def _on_step(self) -> bool:
-        env_ = self.training_env.envs[0].unwrapped
+    def _gather_telemetry(self):
+        """
+        Telemetry of every env (and GPU) as one (rows, 7) array in TELEMETRY_KEYS order,
+        plus the env index of each row. Taken from the step infos; only envs that do
+        not publish info["telemetry"] fall back to get_attr.
+        """
+        infos = self.locals.get('infos', None) or []
+        if infos and all("telemetry" in info for info in infos):
+            rows = [np.atleast_2d(info["telemetry"]) for info in infos]
+        else:
+            values = np.array([self.training_env.get_attr(name) for name in _CURRENT_ATTRS], dtype=np.float64)
+            rows = list(values.T[:, None, :])
+        counts = [len(r) for r in rows]
+        return np.concatenate(rows), np.repeat(np.arange(len(rows)), counts)
 
-        temp  = float(env_.current_temp)
-        slope = float(env_.current_slope_3s)
-        pl    = float(env_.current_power_limit)
-        pdraw = float(env_.current_power_draw)
-        eta   = float(env_.current_eta)
-        fan   = float(env_.current_fan)
-        util  = float(env_.current_utilization)
+    def _on_step(self) -> bool:
+        telemetry, env_idx = self._gather_telemetry()
+        n_rows = len(telemetry)
 
         rewards = self.locals.get('rewards', None)
         if rewards is not None and len(rewards) > 0:
-            step_reward = float(rewards[0])
+            env_rewards = np.asarray(rewards, dtype=np.float64).reshape(-1)
         else:
-            step_reward = 0.0
+            env_rewards = np.zeros(int(env_idx[-1]) + 1)
+        if len(self.episode_rewards) != len(env_rewards):
+            self.episode_rewards = np.zeros(len(env_rewards))
+        row_rewards = env_rewards[env_idx]
+        infos = self.locals.get('infos', None) or []
+        if n_rows > len(env_rewards) and all("rewards" in info for info in infos):
+            # 多卡 env 的每張卡獎勵
+            row_rewards = np.concatenate([np.ravel(info["rewards"]) for info in infos])
+
+        temp, slope, pl, pdraw, eta, fan, util = telemetry.T
+        means = telemetry.mean(axis=0)
+        step_reward = float(env_rewards.mean())
 
-        self.temp_log.append(temp)
-        self.slope_3s_log.append(slope)
-        self.pl_log.append(pl)
-        self.power_draw_log.append(pdraw)
-        self.eta_log.append(eta)
-        self.fan_log.append(fan)
-        self.util_log.append(util)
-        self.reward_log.append(step_reward)
+        # 滑動統計以「步」為單位：各 env 平均，門檻以最熱的 env 計算
+        self.stats.append(tuple(means) + (step_reward, float(temp.max())))
 
-        self.episode_reward += step_reward
+        self.episode_rewards += env_rewards
 
         # 在終端機印出
         if self.verbose > 0:
-            print(
-                f"[Step {self.num_timesteps}] "
-                f"Temp={temp:.1f}, Slope={slope:.2f}, PL={pl:.1f}, PDraw={pdraw:.1f}, "
-                f"ETA={eta:.2f}, Fan={fan:.1f}, Util={util:.1f}, "
-                f"Reward={step_reward:.3f}"
-            )
-
-        # 寫入 TensorBoard
-        self.logger.record("gpu/temp", temp)
-        self.logger.record("gpu/slope_3s", slope)
-        self.logger.record("gpu/power_limit", pl)
-        self.logger.record("gpu/power_draw", pdraw)
-        self.logger.record("gpu/eta", eta)
-        self.logger.record("gpu/fan", fan)
-        self.logger.record("gpu/utilization", util)
-        self.logger.record("gpu/reward", step_reward)
+            if n_rows == 1:
+                print(
+                    f"[Step {self.num_timesteps}] "
+                    f"Temp={temp[0]:.1f}, Slope={slope[0]:.2f}, PL={pl[0]:.1f}, PDraw={pdraw[0]:.1f}, "
+                    f"ETA={eta[0]:.2f}, Fan={fan[0]:.1f}, Util={util[0]:.1f}, "
+                    f"Reward={step_reward:.3f}"
+                )
+            else:
+                print(
+                    f"[Step {self.num_timesteps}] {n_rows} GPUs "
+                    f"Temp={means[0]:.1f} (max {temp.max():.1f}), PL={means[2]:.1f}, "
+                    f"PDraw={means[3]:.1f}, Reward={step_reward:.3f}"
+                )
+
+        # 寫入 TensorBoard (所有 env 的平均；多 env 時另記 min/max 與前幾個 env 的個別值)
+        if self.window is not None:
+            # 彙總模式：先累積在記憶體，視窗結束才寫 event file
+            window = self.window
+            for key, column in zip(_TB_KEYS, telemetry.T):
+                window.add(key, column)
+            window.add("gpu/reward", env_rewards)
+            actions = self.locals.get('actions', None)
+            if actions is not None:
+                window.add("gpu/action", actions)
+        else:
+            for key, value in zip(_TB_KEYS, means):
+                self.logger.record(key, float(value))
+            self.logger.record("gpu/reward", step_reward)
+            if n_rows > 1:
+                self.logger.record("gpu/temp_max", float(temp.max()))
+                self.logger.record("gpu/temp_min", float(temp.min()))
+                for i in range(min(n_rows, self.per_env_limit)):
+                    self.logger.record(f"gpu_env/{i}/temp", float(temp[i]))
+                    self.logger.record(f"gpu_env/{i}/power_limit", float(pl[i]))
+                    self.logger.record(f"gpu_env/{i}/reward", float(row_rewards[i]))
 
         # 若回合結束(假如有設 done=True)
         dones = self.locals.get('dones', None)
-        if dones is not None and len(dones) > 0 and dones[0]:
-            print(f"Episode done. Total episode reward: {self.episode_reward:.3f}")
-            self.episode_reward = 0.0
-
-        # 將本步資訊寫入 CSV
-        with open(self.csv_path, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                self.num_timesteps,
-                temp,
-                pl,
-                step_reward,
-                slope,
-                pdraw,
-                eta,
-                fan,
-                util
-            ])
+        if dones is not None and len(dones) > 0:
+            for i in np.flatnonzero(dones):
+                if len(self.episode_rewards) == 1:
+                    print(f"Episode done. Total episode reward: {self.episode_rewards[i]:.3f}")
+                elif self.verbose > 1:
+                    print(f"Env {i} episode done. Total episode reward: {self.episode_rewards[i]:.3f}")
+                self.episode_rewards[i] = 0.0
+
+        # 將本步資訊寫入紀錄 (只進記憶體 batch，由背景執行緒寫檔)；多 env 時每個 env 一列
+        block = np.column_stack((
+            np.full(n_rows, self.num_timesteps),
+            temp,
+            pl,
+            row_rewards,
+            slope,
+            pdraw,
+            eta,
+            fan,
+            util
+        ) + ((np.arange(n_rows),) if self.log_env_column else ()))
+        self.sink.write_many(block)
 
         # 每隔 dump_interval 步強制將 TensorBoard logger dump
-        if (self.num_timesteps % self.dump_interval) == 0:
+        if self.window is not None:
+            if self.window.step():
+                self.record_rolling_stats()
+                self.window.write_logger(self.logger, self.num_timesteps)
+        elif (self.num_timesteps % self.dump_interval) == 0:
+            self.record_rolling_stats()
             self.logger.dump(self.num_timesteps)
 
         return True
 
+    def record_rolling_stats(self):
+        """Record the rolling aggregates under gpu_rolling/ (mean/min/max, p50/p95/p99, time above 75°C)."""
+        for key, value in self.stats.summary().items():
+            self.logger.record(f"gpu_rolling/{key}", value)
+
+    def state_dict(self) -> dict:
+        """Per-env episode returns and the rolling window, for checkpoint.py."""
+        return {"episode_rewards": self.episode_rewards.copy(), "stats": self.stats.state_dict()}
+
+    def load_state_dict(self, state):
+        self.episode_rewards = np.array(state["episode_rewards"], dtype=np.float64)
+        self.stats.load_state_dict(state["stats"])
+
     def _on_training_end(self) -> None:
-        pass
+        # 同一個 callback 可能再被 learn() 使用，這裡只寫出不關檔
+        if self.sink is not None:
+            self.sink.flush()
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
 
@@ -4,43 +4,137 @@ env.py
 
 import gymnasium as gym
 import numpy as np
-import subprocess
 import time
 
 from gymnasium import spaces
 from typing import Dict, Any, Tuple
 
+from actuator import Actuator
 from monitor import GPUInfoMonitor
+from ring_buffer import RingBuffer
+from scheduler import StepScheduler
+from spans import Spans
+from workload import CudaMatmulWorkload
 from reward import compute_reward
 
+# step 回傳的 info["telemetry"] 欄位 (單卡 (7,)，多卡 (N, 7))；
+# callback 直接從 infos 收集，不需要對 worker 做 get_attr
+TELEMETRY_KEYS = ("temp", "slope_3s", "power_limit", "power_draw", "eta", "fan", "util")
+
+# 觀測向量的欄位 (順序同 _obs_values)；trend_features=True 時再接 TREND_OBS_KEYS
+OBS_KEYS = ("temp", "gpu_util", "slope_3s", "power_limit", "power_draw", "eta", "fan")
+TREND_OBS_KEYS = ("slope_1s", "slope_10s", "temp_accel")
+
+# history 模式：回傳的 window view 只在之後這麼多步內有效 (reset() 會立即覆寫)；
+# 要保留更久需自行複製 (SB3 的 VecEnv 會複製 obs)
+HISTORY_SLACK = 64
+
+
+def telemetry_row(obs_dict) -> list:
+    return [
+        obs_dict["temp"],
+        obs_dict["slope_3s"],
+        obs_dict["power_limit"],
+        obs_dict["actual_power_draw"],
+        obs_dict["eta"],
+        obs_dict["fan"],
+        obs_dict["gpu_util"]
+    ]
+
+def make_spaces(trend_features=False, n_gpus=None):
+    """
+    Action / observation spaces shared by GPUEnv and the simulators.
+    Args:
+        n_gpus: multi-GPU mode, actions (n_gpus,) and observations (n_gpus, F)
+    Returns:
+        (action_space, observation_space)
+    """
+    # Action space: 相對值 -50~+50 (多卡時每張卡一個)
+    n_act = 1 if n_gpus is None else n_gpus
+    action_space = spaces.Box(
+        low=np.full(n_act, -50.0, dtype=np.float32),
+        high=np.full(n_act, 50.0, dtype=np.float32),
+        shape=(n_act,),
+        dtype=np.float32
+    )
+
+    # 觀測空間 (7)；trend_features=True 時再加 slope_1s, slope_10s, temp_accel (共 10)
+    low_obs = [0.0, 0.0, -10.0, 0.0, 0.0, 0.0, 0.0]
+    high_obs= [120.0, 100.0, 10.0, 300.0, 300.0, 1.0, 100.0]
+    if trend_features:
+        low_obs += [-10.0, -10.0, -5.0]
+        high_obs += [10.0, 10.0, 5.0]
+    low_obs = np.array(low_obs, dtype=np.float32)
+    high_obs = np.array(high_obs, dtype=np.float32)
+    if n_gpus is not None:
+        low_obs = np.tile(low_obs, (n_gpus, 1))
+        high_obs = np.tile(high_obs, (n_gpus, 1))
+    observation_space = spaces.Box(
+        low=low_obs,
+        high=high_obs,
+        shape=low_obs.shape,
+        dtype=np.float32
+    )
+    return action_space, observation_space
+
 class GPUEnv(gym.Env):
+    """
+    Power-limit control env.
+    Single GPU (gpu_id): action (1,), observation (7,) [or (10,) with trend_features].
+    Multi GPU (gpu_ids=[...]): one telemetry query per step for all cards,
+    action (N,) PL deltas, observation (N, F) stacked; reward is the mean of
+    per-GPU rewards (listed in info["rewards"]).
+    History mode (history_len=K): the observation is the last K control periods,
+    (K, F) or (N, K, F) for multi GPU, restricted to history_features (names from
+    OBS_KEYS / TREND_OBS_KEYS). It is a read-only view into a preallocated ring
+    buffer and is only valid until the ring wraps (HISTORY_SLACK more steps) or
+    the next reset(), which rewrites the buffer: copy it (np.array(obs)) to keep
+    it longer. SB3 VecEnvs already copy. After reset() the first observation is
+    repeated K times.
+    Every step publishes info["telemetry"] (columns TELEMETRY_KEYS); with
+    instrumentation enabled also info["spans"] (seconds per hot-path span, see spans.py).
+    """
     metadata = {"render_modes": ["human"]}
 
-    def __init__(self, gpu_id=0, step_time=2.0):
+    def __init__(self, gpu_id=0, step_time=2.0, telemetry_backend="auto", sample_hz=None,
+                 trend_features=False, monitor=None, gpu_ids=None, fan_ids=None,
+                 async_actuation=True, spans=None, history_len=None, history_features=None):
         super().__init__()
-        self.gpu_id = gpu_id
+        self.multi_gpu = gpu_ids is not None
+        self.gpu_ids = list(gpu_ids) if self.multi_gpu else [gpu_id]
+        self.gpu_id = self.gpu_ids[0]
+        # fan_ids: 每張卡對應的 nvidia-settings 風扇編號 (int 或 list)，預設與 GPU 編號相同
+        self.fan_ids = list(fan_ids) if fan_ids is not None else list(self.gpu_ids)
         self.step_time = step_time
 
-        # Action space: 相對值 -50~+50
-        self.action_space = spaces.Box(
-            low=np.array([-50.0]),
-            high=np.array([50.0]),
-            shape=(1,),
-            dtype=np.float32
+        self.trend_features = trend_features
+        self.action_space, self.observation_space = make_spaces(
+            trend_features, n_gpus=len(self.gpu_ids) if self.multi_gpu else None
         )
-
-        # 觀測空間 (7)
-        low_obs = np.array([0.0, 0.0, -10.0, 0.0, 0.0, 0.0, 0.0], dtype=np.float32)
-        high_obs= np.array([120.0, 100.0, 10.0, 300.0, 300.0, 1.0, 100.0], dtype=np.float32)
-        self.observation_space = spaces.Box(
-            low=low_obs,
-            high=high_obs,
-            shape=(7,),
-            dtype=np.float32
+        self._init_history(history_len, history_features)
+
+        # telemetry_backend: "auto" (telemetry bus > NVML > nvidia-smi) / "shm" / "nvml" / "nvidia-smi"
+        #                    / "fake" / TelemetryBackend
+        if monitor is None:
+            monitor = GPUInfoMonitor(gpu_ids=self.gpu_ids, backend=telemetry_backend)
+        self.monitor = monitor
+        # 熱路徑計時 (預設關閉，set_instrumentation(True) 或 spans.enable() 開啟)；與 monitor 共用
+        self.spans = spans if spans is not None else monitor.spans
+        self.monitor.spans = self.spans
+        # sample_hz: 設定後由背景執行緒高頻取樣 (例如 10~50 Hz)，否則每步同步讀一次
+        if sample_hz:
+            self.monitor.start_sampler(rate_hz=sample_hz)
+
+        # PL / 風扇寫入：背景執行、合併舊指令、略過 no-op、回讀確認 (見 actuator.py)
+        backend = self.monitor.backend
+        self.actuator = Actuator(
+            self.gpu_ids,
+            # telemetry bus 的 readback 會等到寫入之後的下一筆樣本
+            readback=None if backend.name == "fake" else getattr(backend, "readback", backend.read_all),
+            async_mode=async_actuation,
+            spans=self.spans
         )
 
-        self.monitor = GPUInfoMonitor(gpu_id=self.gpu_id)
-
         self.current_temp = 0.0
         self.current_slope_3s = 0.0
         self.current_power_limit = 260.0
@@ -48,59 +142,134 @@ class GPUEnv(gym.Env):
         self.current_eta = 0.0
         self.current_fan = 0.0
         self.current_utilization = 0.0
+        self.current_slope_1s = 0.0
+        self.current_slope_10s = 0.0
+        self.current_temp_accel = 0.0
+
+        # 固定控制週期：每步等到 deadline (上一個 deadline + step_time)，而不是再 sleep step_time
+        self.scheduler = StepScheduler(step_time, clock=self._clock, sleep=self._wait)
 
         self.pl_old = 260.0
         self.terminated_flag = False
+        # 獎勵函式 hook: reward_fn(temp=..., pl_old=..., pl_new=...)
+        self.reward_fn = compute_reward
+        self._stress_load = None
 
         self.reset()
 
+    def _init_history(self, history_len, history_features):
+        """Observation space and ring buffer of the history mode (history_len=None: off)."""
+        self.history_len = history_len
+        self.history_features = None
+        self._obs_history = None
+        if not history_len:
+            if history_features:
+                raise ValueError("history_features requires history_len")
+            return
+        names = OBS_KEYS + (TREND_OBS_KEYS if self.trend_features else ())
+        if isinstance(history_features, str):
+            history_features = (history_features,)
+        features = tuple(history_features) if history_features else names
+        unknown = [f for f in features if f not in names]
+        if unknown:
+            raise ValueError(f"Unknown history features {unknown}, expected some of {names}")
+        self.history_features = features
+        cols = [names.index(f) for f in features]
+        # 全部欄位且順序相同時直接 append 觀測向量，否則 np.take 到預先配置的 row
+        self._history_cols = None if list(cols) == list(range(len(names))) else np.array(cols)
+
+        base = self.observation_space
+        low = np.take(base.low, cols, axis=-1)
+        high = np.take(base.high, cols, axis=-1)
+        # 單卡 (K, F)，多卡 (N, K, F)
+        low = np.repeat(low[..., None, :], history_len, axis=-2)
+        high = np.repeat(high[..., None, :], history_len, axis=-2)
+        self.observation_space = spaces.Box(low=low, high=high, shape=low.shape, dtype=np.float32)
+
+        row_shape = (len(self.gpu_ids), len(cols)) if self.multi_gpu else (len(cols),)
+        self._history_row = np.zeros(row_shape, dtype=np.float32)
+        self._obs_history = RingBuffer(history_len + HISTORY_SLACK, row_shape, dtype=np.float32)
+
+    def _push_history(self, obs_arr, repeat=1) -> np.ndarray:
+        # 寫進環形緩衝區 (不配置新陣列)，回傳最新 history_len 列的 view
+        row = obs_arr
+        if self._history_cols is not None:
+            row = np.take(obs_arr, self._history_cols, axis=-1, out=self._history_row)
+        for _ in range(repeat):
+            self._obs_history.append(row)
+        window = self._obs_history.window(self.history_len)
+        # 唯讀：避免呼叫端改到緩衝區 (view 本身仍會在 wrap / reset 後被覆寫)
+        window.flags.writeable = False
+        # (K, N, F) -> (N, K, F)：只換 strides
+        return window.transpose(1, 0, 2) if self.multi_gpu else window
+
+    def set_reward(self, reward_fn):
+        """
+        Replace the reward function.
+        Args:
+            reward_fn: callable(temp, pl_old, pl_new) -> float
+        """
+        self.reward_fn = reward_fn
+
+    def set_instrumentation(self, enabled: bool):
+        """Turn the hot-path timing spans on or off at runtime (usable through VecEnv.env_method)."""
+        if enabled:
+            self.spans.pop_step()
+            self.spans.enable()
+        else:
+            self.spans.disable()
+
     def set_power_limit(self, pl_value: float):
-        clamped_val = float(np.clip(pl_value, 100.0, 275.0))
-        cmd = [
-            "nvidia-smi",
-            "-i", str(self.gpu_id),
-            f"--power-limit={int(clamped_val)}"
-        ]
-        try:
-            subprocess.check_call(cmd, shell=False)
-        except subprocess.CalledProcessError as e:
-            print("[WARN] Setting PL failed?", e)
+        # 多卡時所有卡設同一個值
+        self.set_power_limits([pl_value] * len(self.gpu_ids))
+
+    def set_power_limits(self, pl_values):
+        """
+        Apply one power limit per GPU in gpu_ids.
+        Writes go through self.actuator: GPUs sharing the same wattage are set
+        with a single nvidia-smi call and unchanged values are skipped.
+        """
+        targets = {
+            gid: int(float(np.clip(pl_value, 100.0, 275.0)))
+            for gid, pl_value in zip(self.gpu_ids, pl_values)
+        }
+        self.actuator.submit_power_limits(targets)
 
     def set_fan_speed(self, fan_speed: float):
         """
-        Set GPU fan speed using nvidia-settings
+        Set GPU fan speed using nvidia-settings (all fans of all controlled GPUs)
         Args:
             fan_speed: Fan speed value between 0-100
         """
         clamped_val = float(np.clip(fan_speed, 0.0, 100.0))
-        cmd = [
-            "nvidia-settings",
-            "--assign",
-            f"[fan:0]/GPUTargetFanSpeed={int(clamped_val)}"
-        ]
-        try:
-            subprocess.check_call(cmd, shell=False)
-        except subprocess.CalledProcessError as e:
-            print("[WARN] Setting fan speed failed?", e)
+        targets = {}
+        for fans in self.fan_ids:
+            for fan in (fans if isinstance(fans, (list, tuple)) else [fans]):
+                targets[fan] = int(clamped_val)
+        self.actuator.submit_fans(targets)
 
     def stress_gpu(self):
         """
-        Stress test the GPU using CUDA matrix operations
+        Stress test the GPU using CUDA matrix operations (blocking, 100 matmuls).
+        For controlled heat-up in the background use preconditioner.Preconditioner.
         """
         try:
-            import torch
-            # 創建大矩陣進行運算
-            size = 8192
-            a = torch.randn(size, size, device='cuda')
-            b = torch.randn(size, size, device='cuda')
-            
-            # 進行多次矩陣乘法運算
+            # 大矩陣只配置一次，重複呼叫不再每次 allocate
+            if self._stress_load is None:
+                self._stress_load = CudaMatmulWorkload(size=8192)
             for _ in range(100):  # 執行100次運算
-                c = torch.matmul(a, b)
-                torch.cuda.synchronize()  # 確保運算完成
+                self._stress_load.burst()
         except Exception as e:
             print("[WARN] GPU stress test failed?", e)
 
+    def _wait(self, seconds: float):
+        # 等待硬體反應；模擬環境覆寫成推進模擬時間
+        time.sleep(seconds)
+
+    def _clock(self) -> float:
+        # 排程用的 monotonic clock；模擬環境覆寫成模擬時間
+        return time.monotonic()
+
     def get_temp(self) -> float:
         """
         Get current GPU temperature
@@ -112,30 +281,122 @@ class GPUEnv(gym.Env):
         self.current_temp = obs_dict["temp"]
         return self.current_temp
 
+    def get_temps(self) -> np.ndarray:
+        """Current temperature of every GPU in gpu_ids."""
+        self.monitor.update_info()
+        temps = np.array([d["temp"] for d in self.monitor.get_observations()])
+        self.current_temp = float(temps[0])
+        return temps
+
     def step(self, action: np.ndarray):
+        if self.multi_gpu:
+            return self._step_multi(action)
+
         delta = float(action[0])
         pl_new = self.pl_old + delta
         pl_new = float(np.clip(pl_new, 100.0, 275.0))
+        spans = self.spans
 
+        t0 = spans.begin()
         self.set_power_limit(pl_new)
-        time.sleep(self.step_time)
+        spans.end("set_power_limit", t0)
+        # 致動在背景進行，與等待 deadline 重疊
+        timing = self.scheduler.wait()
 
         self.monitor.update_info()
+        t0 = spans.begin()
         obs_dict = self.monitor.get_observation()
+        obs_arr = self._build_obs(obs_dict)
+        if self._obs_history is not None:
+            obs_arr = self._push_history(obs_arr)
+        spans.end("build_obs", t0)
 
         temp = obs_dict["temp"]
         terminated = False
         truncated = False
 
-        reward = compute_reward(
+        t0 = spans.begin()
+        reward = self.reward_fn(
             temp=temp,
             pl_old=self.pl_old,
             pl_new=pl_new
         )
+        spans.end("compute_reward", t0)
 
         self.pl_old = pl_new
         self.terminated_flag = terminated
 
+        info = {
+            "telemetry": np.array(telemetry_row(obs_dict)),
+            "step_timing": timing._asdict()
+        }
+        if spans.enabled:
+            info["spans"] = spans.pop_step()
+            spans.maybe_export()
+        return obs_arr, reward, terminated, truncated, info
+
+    def _step_multi(self, action: np.ndarray):
+        deltas = np.asarray(action, dtype=np.float64).reshape(len(self.gpu_ids))
+        pl_new = np.clip(self.pl_old + deltas, 100.0, 275.0)
+        spans = self.spans
+
+        t0 = spans.begin()
+        self.set_power_limits(pl_new)
+        spans.end("set_power_limit", t0)
+        # 致動在背景進行，與等待 deadline 重疊
+        timing = self.scheduler.wait()
+
+        self.monitor.update_info()
+        t0 = spans.begin()
+        obs_dicts = self.monitor.get_observations()
+        obs_arr = self._build_obs_multi(obs_dicts)
+        if self._obs_history is not None:
+            obs_arr = self._push_history(obs_arr)
+        spans.end("build_obs", t0)
+
+        t0 = spans.begin()
+        rewards = [
+            float(self.reward_fn(temp=d["temp"], pl_old=old, pl_new=new))
+            for d, old, new in zip(obs_dicts, self.pl_old, pl_new)
+        ]
+        reward = float(np.mean(rewards))
+        spans.end("compute_reward", t0)
+
+        self.pl_old = pl_new
+        info = {
+            "rewards": rewards,
+            "telemetry": np.array([telemetry_row(d) for d in obs_dicts]),
+            "step_timing": timing._asdict()
+        }
+        if spans.enabled:
+            info["spans"] = spans.pop_step()
+            spans.maybe_export()
+        return obs_arr, reward, False, False, info
+
+    def _build_obs_multi(self, obs_dicts) -> np.ndarray:
+        # current_* 對應第一張卡
+        self._build_obs(obs_dicts[0])
+        return np.array([self._obs_values(d) for d in obs_dicts], dtype=np.float32)
+
+    def _obs_values(self, obs_dict) -> list:
+        values = [
+            obs_dict["temp"],
+            obs_dict["gpu_util"],
+            obs_dict["slope_3s"],
+            obs_dict["power_limit"],
+            obs_dict["actual_power_draw"],
+            obs_dict["eta"],
+            obs_dict["fan"]
+        ]
+        if self.trend_features:
+            values += [
+                obs_dict["slope_1s"],
+                obs_dict["slope_10s"],
+                obs_dict["temp_accel"]
+            ]
+        return values
+
+    def _build_obs(self, obs_dict) -> np.ndarray:
         self.current_temp        = obs_dict["temp"]
         self.current_slope_3s    = obs_dict["slope_3s"]
         self.current_power_limit = obs_dict["power_limit"]
@@ -143,48 +404,38 @@ class GPUEnv(gym.Env):
         self.current_eta         = obs_dict["eta"]
         self.current_fan         = obs_dict["fan"]
         self.current_utilization = obs_dict["gpu_util"]
-
-        obs_arr = np.array([
-            self.current_temp,
-            self.current_utilization,
-            self.current_slope_3s,
-            self.current_power_limit,
-            self.current_power_draw,
-            self.current_eta,
-            self.current_fan
-        ], dtype=np.float32)
-
-        return obs_arr, reward, terminated, truncated, {}
+        self.current_slope_1s    = obs_dict["slope_1s"]
+        self.current_slope_10s   = obs_dict["slope_10s"]
+        self.current_temp_accel  = obs_dict["temp_accel"]
+        return np.array(self._obs_values(obs_dict), dtype=np.float32)
 
     def reset(self, *, seed=None, options=None):
         super().reset(seed=seed)
         self.terminated_flag = False
-        self.monitor.temp_history.clear()
-
-        self.pl_old = 260.0
-        self.set_power_limit(self.pl_old)
-        time.sleep(1.0)
+        self.monitor.clear_history()
+
+        # options={"power_limit": W} 指定 reset 後的起始 PL (預設 260W)
+        pl_start = float((options or {}).get("power_limit", 260.0))
+        if self.multi_gpu:
+            self.pl_old = np.full(len(self.gpu_ids), pl_start)
+            self.set_power_limits(self.pl_old)
+        else:
+            self.pl_old = pl_start
+            self.set_power_limit(self.pl_old)
+        self._wait(1.0)
 
         self.monitor.update_info()
-        obs_dict = self.monitor.get_observation()
-
-        self.current_temp        = obs_dict["temp"]
-        self.current_slope_3s    = obs_dict["slope_3s"]
-        self.current_power_limit = obs_dict["power_limit"]
-        self.current_power_draw  = obs_dict["actual_power_draw"]
-        self.current_eta         = obs_dict["eta"]
-        self.current_fan         = obs_dict["fan"]
-        self.current_utilization = obs_dict["gpu_util"]
-
-        obs_arr = np.array([
-            self.current_temp,
-            self.current_utilization,
-            self.current_slope_3s,
-            self.current_power_limit,
-            self.current_power_draw,
-            self.current_eta,
-            self.current_fan
-        ], dtype=np.float32)
+        self.scheduler.start()
+        # reset 期間的 span 不算進第一步的 info["spans"]
+        self.spans.pop_step()
+        if self.multi_gpu:
+            obs_arr = self._build_obs_multi(self.monitor.get_observations())
+        else:
+            obs_arr = self._build_obs(self.monitor.get_observation())
+        if self._obs_history is not None:
+            # 新回合從空的 history 開始，以第一個觀測補滿 K 列
+            self._obs_history.clear()
+            obs_arr = self._push_history(obs_arr, repeat=self.history_len)
 
         return obs_arr, {}
 
@@ -192,5 +443,7 @@ class GPUEnv(gym.Env):
         pass
 
     def close(self):
-        pass
+        self.actuator.close()
+        self.monitor.close()
+        self.spans.close()
 
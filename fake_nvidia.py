@@ -0,0 +1,183 @@
+"""
+fake_nvidia.py
+可腳本化的 nvidia-smi / nvidia-settings 替身，給沒有 GPU 的機器 (CI) 跑完整的
+GPUEnv -> 子行程 -> 解析 路徑與效能量測。
+
+ - 狀態與設定放在 JSON 檔 (環境變數 FAKE_NVIDIA_STATE)，多個行程以 flock 互斥
+ - 每種呼叫可設定延遲 (latency: query / power_limit / settings，秒) 與抖動 (jitter，比例)
+ - 溫度依一階熱模型隨實際時間變化，util 可由 script 依時間切換
+ - fail_every: 每 N 次呼叫失敗一次 (exit 1)，測試錯誤路徑
+
+install(bin_dir, state_path) 會在 bin_dir 產生 nvidia-smi 與 nvidia-settings 兩個 wrapper，
+回傳要放進 subprocess 環境的 PATH / FAKE_NVIDIA_STATE。
+
+用法:
+    env = install("/tmp/fakebin", "/tmp/fake_state.json", n_gpus=1,
+                  latency={"query": 0.05, "power_limit": 0.1, "settings": 0.2})
+    os.environ.update(env)      # 之後 GPUEnv(telemetry_backend="nvidia-smi") 會呼叫替身
+"""
+import fcntl
+import json
+import math
+import os
+import random
+import re
+import stat
+import sys
+import time
+
+STATE_ENV = "FAKE_NVIDIA_STATE"
+
+DEFAULT_GPU = {
+    "temp": 45.0, "util": 100.0, "power_draw": 200.0, "power_limit": 260.0, "fan": 100.0,
+}
+
+DEFAULT_CONFIG = {
+    "latency": {"query": 0.0, "power_limit": 0.0, "settings": 0.0},
+    "jitter": 0.0,
+    "fail_every": 0,
+    # False: PL 寫入不印 "Power limit ... was set" (真的 nvidia-smi 會印，benchmark 時洗版)
+    "echo": True,
+    # 熱模型 (與 sim_env.ThermalModel 的預設值同一量級)
+    "t_ambient": 25.0, "r_fan_full": 0.157, "r_fan_off": 0.257, "tau": 40.0, "p_idle": 30.0, "p_max": 300.0,
+    # [{"at": 秒, "util": %}, ...]：從 install 起算的 util 變化
+    "script": [],
+}
+
+QUERY_FIELDS = {
+    "temperature.gpu": lambda g: f"{g['temp']:.0f}",
+    "utilization.gpu": lambda g: f"{g['util']:.0f}",
+    "power.draw": lambda g: f"{g['power_draw']:.2f}",
+    "power.limit": lambda g: f"{g['power_limit']:.2f}",
+    "fan.speed": lambda g: f"{g['fan']:.0f}",
+}
+
+
+def install(bin_dir, state_path, n_gpus=1, python=None, **config) -> dict:
+    """
+    Write the state file and the two wrapper executables.
+    Returns:
+        environment variables to add (PATH with bin_dir first, FAKE_NVIDIA_STATE)
+    """
+    os.makedirs(bin_dir, exist_ok=True)
+    cfg = json.loads(json.dumps(DEFAULT_CONFIG))
+    for key, value in config.items():
+        if isinstance(value, dict) and isinstance(cfg.get(key), dict):
+            cfg[key].update(value)
+        else:
+            cfg[key] = value
+    state = {
+        "config": cfg,
+        "start": time.time(),
+        "last": time.time(),
+        "calls": 0,
+        "gpus": [dict(DEFAULT_GPU) for _ in range(n_gpus)],
+    }
+    with open(state_path, "w") as f:
+        json.dump(state, f)
+
+    script = os.path.abspath(__file__)
+    for name in ("nvidia-smi", "nvidia-settings"):
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{python or sys.executable}" "{script}" {name} "$@"\n')
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return {
+        "PATH": os.path.abspath(bin_dir) + os.pathsep + os.environ.get("PATH", ""),
+        STATE_ENV: os.path.abspath(state_path),
+    }
+
+
+def _advance(state, now):
+    cfg = state["config"]
+    dt = max(now - state["last"], 0.0)
+    state["last"] = now
+    elapsed = now - state["start"]
+    for event in cfg["script"]:
+        if event["at"] <= elapsed:
+            for gpu in state["gpus"]:
+                gpu["util"] = float(event["util"])
+    decay = 1.0 - math.exp(-dt / cfg["tau"])
+    for gpu in state["gpus"]:
+        demand = cfg["p_idle"] + gpu["util"] / 100.0 * (cfg["p_max"] - cfg["p_idle"])
+        gpu["power_draw"] = min(demand, gpu["power_limit"])
+        r = cfg["r_fan_off"] + (cfg["r_fan_full"] - cfg["r_fan_off"]) * gpu["fan"] / 100.0
+        target = cfg["t_ambient"] + r * gpu["power_draw"]
+        gpu["temp"] += (target - gpu["temp"]) * decay
+
+
+def _ids(args, n):
+    for i, arg in enumerate(args):
+        value = None
+        if arg.startswith("--id="):
+            value = arg.split("=", 1)[1]
+        elif arg in ("-i", "--id") and i + 1 < len(args):
+            value = args[i + 1]
+        if value is not None:
+            return [int(x) for x in value.split(",")]
+    return list(range(n))
+
+
+def _smi(state, args):
+    gpus = state["gpus"]
+    ids = _ids(args, len(gpus))
+    for i, arg in enumerate(args):
+        if arg.startswith("--power-limit=") or arg in ("-pl", "--power-limit"):
+            watts = float(arg.split("=", 1)[1] if "=" in arg else args[i + 1])
+            out = []
+            for gid in ids:
+                old = gpus[gid]["power_limit"]
+                gpus[gid]["power_limit"] = watts
+                out.append(f"Power limit for GPU 00000000:{gid + 1:02X}:00.0 was set to "
+                           f"{watts:.2f} W from {old:.2f} W.")
+            return "power_limit", "\n".join(out) + "\nAll done.\n"
+        if arg.startswith("--query-gpu="):
+            fields = arg.split("=", 1)[1].split(",")
+            lines = [", ".join(QUERY_FIELDS[f](gpus[gid]) if f in QUERY_FIELDS else "[N/A]" for f in fields)
+                     for gid in ids]
+            return "query", "\n".join(lines) + "\n"
+    return "query", "fake nvidia-smi\n"
+
+
+def _settings(state, args):
+    gpus = state["gpus"]
+    for i, arg in enumerate(args):
+        if arg in ("--assign", "-a") and i + 1 < len(args):
+            m = re.match(r"\[fan:(\d+)\]/GPUTargetFanSpeed=(\d+)", args[i + 1])
+            if m and int(m.group(1)) < len(gpus):
+                gpus[int(m.group(1))]["fan"] = float(m.group(2))
+    return "settings", ""
+
+
+def main(argv):
+    tool, args = argv[0], argv[1:]
+    path = os.environ.get(STATE_ENV)
+    if not path:
+        print(f"{tool}: {STATE_ENV} is not set", file=sys.stderr)
+        return 9
+    with open(path, "r+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        state = json.load(f)
+        now = time.time()
+        _advance(state, now)
+        state["calls"] += 1
+        kind, output = _smi(state, args) if tool == "nvidia-smi" else _settings(state, args)
+        cfg = state["config"]
+        f.seek(0)
+        f.truncate()
+        json.dump(state, f)
+    # 延遲在鎖外模擬 (多個呼叫可以同時進行，如同真的 driver 查詢)
+    delay = cfg["latency"].get(kind, 0.0)
+    if delay:
+        jitter = cfg["jitter"]
+        time.sleep(max(delay * (1.0 + random.uniform(-jitter, jitter)), 0.0))
+    if cfg["fail_every"] and state["calls"] % cfg["fail_every"] == 0:
+        print(f"{tool}: simulated failure", file=sys.stderr)
+        return 1
+    if kind != "power_limit" or cfg["echo"]:
+        sys.stdout.write(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,373 @@
+"""
+load_playback.py
+訓練時的 GPU 負載回放：依使用率軌跡 (trace) 在背景行程產生忽高忽低的負載，
+讓策略在接近實際使用情境 (bursty load) 下訓練，而不是只有滿載 / 閒置。
+
+ - LoadTrace             : (時間, util%) 軌跡，來源為 training_log.csv / .npyc 的 util 欄、
+                           recorder.py 的 .bin trace，或合成波形 (square / sine / bursty / ramp)
+ - TracePlayer           : 背景行程 (spawn) 內的 DutyCycleWorker，duty = util(t) * intensity / 100；
+                           t 由 sync(position) 對齊 env 步數，兩次 sync 之間最多外推 hold_secs
+ - SimTracePlayer        : 模擬環境版本，直接設定 ThermalModel 的 util
+ - TracePlaybackWrapper  : 每次 step 前把 player 對齊到 step * step_time，info["load_util"] 為目標使用率
+
+用法:
+    trace = LoadTrace.from_log("training_log.csv")          # 或 LoadTrace.synthetic("bursty", 1800)
+    env = TracePlaybackWrapper(GPUEnv(step_time=2.0), TracePlayer(trace, intensity=0.8))
+
+    python load_playback.py --synthetic bursty --workload cpu   # 單獨以實際時間回放 (Ctrl+C 結束)
+"""
+import argparse
+import multiprocessing as mp
+import time
+
+import gymnasium as gym
+import numpy as np
+
+from workload import CPUWorkload, CudaMatmulWorkload, DutyCycleWorker
+
+WORKLOADS = {"cuda": CudaMatmulWorkload, "cpu": CPUWorkload}
+
+# 共享狀態欄位 (mp.Array 'd')
+_POSITION, _STAMP, _INTENSITY, _HOLD, _TARGET, _BUSY = range(6)
+
+
+class LoadTrace:
+    """
+    Piecewise-constant utilization profile.
+    Args:
+        times: start time (s) of every segment, increasing, first = 0
+        util: utilization (0..100) of every segment
+        duration: total length (default: last time + median segment length)
+        loop: wrap around at the end (otherwise hold the last value)
+    """
+
+    def __init__(self, times, util, duration=None, loop=True):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.util = np.clip(np.asarray(util, dtype=np.float64), 0.0, 100.0)
+        if len(self.times) == 0 or len(self.times) != len(self.util):
+            raise ValueError("times and util must be non-empty and the same length")
+        if duration is None:
+            step = float(np.median(np.diff(self.times))) if len(self.times) > 1 else 1.0
+            duration = float(self.times[-1]) + step
+        self.duration = float(duration)
+        self.loop = loop
+
+    def __len__(self):
+        return len(self.times)
+
+    def util_at(self, t):
+        """Utilization at time t (scalar or array)."""
+        t = np.asarray(t, dtype=np.float64)
+        t = np.mod(t, self.duration) if self.loop else t
+        idx = np.clip(np.searchsorted(self.times, t, side="right") - 1, 0, len(self.times) - 1)
+        values = self.util[idx]
+        return float(values) if values.ndim == 0 else values
+
+    def mean(self) -> float:
+        widths = np.diff(np.r_[self.times, self.duration])
+        return float(np.sum(widths * self.util) / self.duration)
+
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_log(cls, path, run=0, env=0, step_time=2.0, column="util") -> "LoadTrace":
+        """util column of a GPUControlCallback log (CSV or .npyc), one segment per logged step."""
+        from rescore import load_log
+        cols = load_log(path)
+        mask = cols["run"] == run
+        if "env" in cols:
+            mask &= cols["env"] == env
+        util = cols[column][mask]
+        if len(util) == 0:
+            raise ValueError(f"{path}: no rows for run {run}")
+        return cls(np.arange(len(util)) * step_time, util)
+
+    @classmethod
+    def from_trace(cls, path, gpu=0) -> "LoadTrace":
+        """gpu_util of a recorder.py trajectory file, timed by the recorded telemetry clock."""
+        from recorder import load_trace
+        records, _ = load_trace(path)
+        if len(records) == 0:
+            raise ValueError(f"{path}: empty trace")
+        t = np.asarray(records["time"], dtype=np.float64)
+        keep = np.r_[True, np.diff(t) > 0]     # 時鐘不前進的紀錄 (同一筆遙測) 只留一筆
+        return cls(t[keep] - t[0], np.asarray(records["gpu_util"][keep, gpu]))
+
+    @classmethod
+    def synthetic(cls, kind="bursty", duration=1800.0, dt=1.0, seed=None,
+                  low=0.0, high=100.0, period=120.0, duty=0.5, mean_on=30.0, mean_off=20.0) -> "LoadTrace":
+        """
+        Synthetic profile sampled every dt seconds.
+        Args:
+            kind: "constant" (high), "square" (period, duty), "sine" (period),
+                  "ramp" (low -> high over duration), "bursty" (random on/off phases
+                  with exponential lengths mean_on / mean_off and random levels)
+        """
+        t = np.arange(0.0, duration, dt)
+        if kind == "constant":
+            util = np.full(len(t), high)
+        elif kind == "square":
+            util = np.where(np.mod(t, period) < duty * period, high, low)
+        elif kind == "sine":
+            util = low + (high - low) * 0.5 * (1.0 - np.cos(2.0 * np.pi * t / period))
+        elif kind == "ramp":
+            util = low + (high - low) * t / duration
+        elif kind == "bursty":
+            rng = np.random.default_rng(seed)
+            util = np.empty(len(t))
+            i, on = 0, True
+            while i < len(t):
+                n = max(1, int(rng.exponential(mean_on if on else mean_off) / dt))
+                level = rng.uniform(0.6, 1.0) if on else rng.uniform(0.0, 0.3)
+                util[i:i + n] = low + (high - low) * level
+                i += n
+                on = not on
+        else:
+            raise ValueError(f"unknown synthetic profile {kind!r}")
+        return cls(t, util, duration=duration)
+
+
+def _player_main(times, util, duration, loop, workload, workload_kwargs, period, shared, stop_event):
+    # 子行程：在這裡才建立負載 (CUDA context 只存在於子行程)
+    trace = LoadTrace(times, util, duration, loop)
+    load = DutyCycleWorker(WORKLOADS[workload](**workload_kwargs), period=period)
+    load.start()
+    t_busy, b_busy = time.monotonic(), 0.0
+    try:
+        while not stop_event.is_set():
+            with shared.get_lock():
+                position, stamp, intensity, hold = shared[_POSITION], shared[_STAMP], shared[_INTENSITY], shared[_HOLD]
+            if position < 0.0:
+                target = 0.0                         # paused
+            else:
+                lead = time.monotonic() - stamp
+                if hold >= 0.0:
+                    lead = min(lead, hold)
+                target = min(trace.util_at(position + lead) * intensity, 100.0)
+            load.set_duty(target / 100.0)
+            now = time.monotonic()
+            if now - t_busy >= 1.0:
+                shared[_BUSY] = (load.busy_secs - b_busy) / (now - t_busy)
+                t_busy, b_busy = now, load.busy_secs
+            shared[_TARGET] = target
+            stop_event.wait(period)
+    finally:
+        load.close()
+
+
+class TracePlayer:
+    """
+    Replays a LoadTrace with a duty-cycled workload in a background process.
+    Args:
+        trace: LoadTrace
+        workload: "cuda" (CudaMatmulWorkload) or "cpu" (CPUWorkload)
+        workload_kwargs: forwarded to the workload class (e.g. size, device)
+        intensity: multiplier on the trace utilization
+        period: duty-cycle period in seconds
+        hold_secs: how far playback may run ahead of the last sync()
+                   (None = free-running in real time)
+    """
+
+    def __init__(self, trace: LoadTrace, workload="cuda", workload_kwargs=None, intensity=1.0,
+                 period=0.1, hold_secs=None):
+        if workload not in WORKLOADS:
+            raise ValueError(f"unknown workload {workload!r}, choose from {sorted(WORKLOADS)}")
+        self.trace = trace
+        self.workload = workload
+        self.workload_kwargs = dict(workload_kwargs or {})
+        self.period = period
+        self._ctx = mp.get_context("spawn")
+        self._shared = self._ctx.Array("d", 6)
+        self._shared[_POSITION] = -1.0
+        self._shared[_INTENSITY] = intensity
+        self._shared[_HOLD] = -1.0 if hold_secs is None else hold_secs
+        self._stop_event = self._ctx.Event()
+        self._process = None
+
+    @property
+    def intensity(self) -> float:
+        return self._shared[_INTENSITY]
+
+    @property
+    def hold_secs(self):
+        hold = self._shared[_HOLD]
+        return None if hold < 0.0 else hold
+
+    @property
+    def target(self) -> float:
+        """Utilization the worker is currently producing (%)."""
+        return self._shared[_TARGET]
+
+    @property
+    def busy(self) -> float:
+        """Measured busy fraction of the workload over the last second."""
+        return self._shared[_BUSY]
+
+    def start(self):
+        if self._process is not None:
+            return
+        self._stop_event.clear()
+        self._process = self._ctx.Process(
+            target=_player_main,
+            args=(self.trace.times, self.trace.util, self.trace.duration, self.trace.loop,
+                  self.workload, self.workload_kwargs, self.period, self._shared, self._stop_event),
+            name="load-playback",
+            daemon=True
+        )
+        self._process.start()
+
+    def sync(self, position: float):
+        """Trace time `position` is now."""
+        with self._shared.get_lock():
+            self._shared[_POSITION] = max(float(position), 0.0)
+            self._shared[_STAMP] = time.monotonic()
+
+    def pause(self):
+        with self._shared.get_lock():
+            self._shared[_POSITION] = -1.0
+
+    def set_intensity(self, intensity: float):
+        self._shared[_INTENSITY] = float(intensity)
+
+    def set_hold(self, hold_secs):
+        self._shared[_HOLD] = -1.0 if hold_secs is None else float(hold_secs)
+
+    def util_at(self, position: float) -> float:
+        return min(self.trace.util_at(position) * self.intensity, 100.0)
+
+    def stop(self):
+        if self._process is None:
+            return
+        self._stop_event.set()
+        self._process.join(timeout=10.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+
+    def close(self):
+        self.stop()
+
+
+class SimTracePlayer:
+    """TracePlayer interface for ThermalModel: sync() sets the simulated util directly."""
+
+    def __init__(self, model, trace: LoadTrace, intensity=1.0, index=None):
+        self.model = model
+        self.trace = trace
+        self.intensity = intensity
+        self.index = index
+        self.hold_secs = None
+        self.target = 0.0
+
+    @property
+    def busy(self) -> float:
+        return self.target / 100.0
+
+    def start(self):
+        pass
+
+    def sync(self, position: float):
+        self.target = self.util_at(position)
+        self.model.set_util(self.target, index=self.index)
+
+    def pause(self):
+        self.target = 0.0
+        self.model.set_util(0.0, index=self.index)
+
+    def set_intensity(self, intensity: float):
+        self.intensity = float(intensity)
+
+    def set_hold(self, hold_secs):
+        self.hold_secs = hold_secs
+
+    def util_at(self, position: float) -> float:
+        return min(self.trace.util_at(position) * self.intensity, 100.0)
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TracePlaybackWrapper(gym.Wrapper):
+    """
+    Keeps a TracePlayer aligned with the env: before step k the trace position is
+    offset + k * step_time, so every control step sees the load of its trace segment.
+    Args:
+        player: TracePlayer / SimTracePlayer (started here if needed)
+        step_time: seconds per step (default env.step_time)
+        rewind_on_reset: restart the trace on reset (otherwise it continues across episodes)
+        random_offset: start each rewind at a random trace position
+    """
+
+    def __init__(self, env, player, step_time=None, rewind_on_reset=False, random_offset=False, seed=None):
+        super().__init__(env)
+        self.player = player
+        self.step_time = float(step_time if step_time is not None else env.unwrapped.step_time)
+        self.rewind_on_reset = rewind_on_reset
+        self.random_offset = random_offset
+        self.rng = np.random.default_rng(seed)
+        self.position = 0.0
+        if self.player.hold_secs is None:
+            # 兩次 step 之間 (例如 PPO 更新時) 最多往前播一步，之後停在該段的負載
+            self.player.set_hold(self.step_time)
+        self.player.start()
+
+    def reset(self, **kwargs):
+        if self.rewind_on_reset or self.position == 0.0:
+            self.position = self.rng.uniform(0.0, self.player.trace.duration) if self.random_offset else 0.0
+        self.player.sync(self.position)
+        return self.env.reset(**kwargs)
+
+    def step(self, action):
+        self.player.sync(self.position)
+        load_util = self.player.util_at(self.position)
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        self.position += self.step_time
+        info["load_util"] = load_util
+        return obs, reward, terminated, truncated, info
+
+    def close(self):
+        self.player.close()
+        return self.env.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a GPU utilization trace as real load")
+    parser.add_argument("trace", nargs="?", default=None, help="training_log.csv / .npyc / recorder .bin")
+    parser.add_argument("--synthetic", default=None, help="constant / square / sine / ramp / bursty")
+    parser.add_argument("--duration", type=float, default=1800.0)
+    parser.add_argument("--step-time", type=float, default=2.0, help="seconds per logged step (CSV logs)")
+    parser.add_argument("--intensity", type=float, default=1.0)
+    parser.add_argument("--workload", default="cuda", choices=sorted(WORKLOADS))
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        trace = LoadTrace.synthetic(args.synthetic, args.duration, seed=args.seed)
+    elif args.trace is None:
+        parser.error("give a trace file or --synthetic")
+    elif args.trace.endswith(".bin"):
+        trace = LoadTrace.from_trace(args.trace)
+    else:
+        trace = LoadTrace.from_log(args.trace, step_time=args.step_time)
+    print(f"trace: {len(trace)} segments, {trace.duration:.0f}s, mean util {trace.mean():.1f}%")
+
+    player = TracePlayer(trace, workload=args.workload, intensity=args.intensity)
+    player.start()
+    player.sync(0.0)
+    t0 = time.monotonic()
+    try:
+        while True:
+            time.sleep(5.0)
+            t = time.monotonic() - t0
+            print(f"[{t:7.0f}s] trace util {player.util_at(t):5.1f}%  target {player.target:5.1f}%  "
+                  f"busy {player.busy:.2f}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        player.close()
+
+
+if __name__ == "__main__":
+    main()
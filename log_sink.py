@@ -0,0 +1,230 @@
+"""
+log_sink.py
+訓練紀錄的緩衝寫入 (取代每步 open/append/close CSV)。
+
+ - 檔案只開一次；資料列先寫進記憶體中的 numpy batch
+ - 滿 flush_rows 列或距上次寫出超過 flush_secs 秒才整批寫出
+ - background=True 時由背景執行緒寫檔，_on_step 不做 I/O
+ - CSVSink: 與原本 training_log.csv 相同欄位 (已存在的檔案不再重複寫 header；
+            header 與欄位不同時把舊檔改名保留，另開新檔)
+ - ChunkSink: 欄位式二進位 (.npyc，連續的 structured .npy chunk)，load_chunks() 一次讀回
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+CHUNK_EXT = ".npyc"
+
+
+class LogSink:
+    """
+    Buffered row sink with size- and time-based flushing.
+    Args:
+        columns: column names (every row is a sequence of numbers in this order)
+        flush_rows: rows per batch; a full batch is handed to the writer
+        flush_secs: a partial batch older than this is written as well
+        background: write batches on a background thread
+    """
+
+    def __init__(self, path, columns, flush_rows=256, flush_secs=5.0, background=True):
+        self.path = path
+        self.columns = tuple(columns)
+        self.flush_rows = int(flush_rows)
+        self.flush_secs = float(flush_secs)
+        self.background = background
+        self.rows_written = 0
+        self.flushes = 0
+
+        self._buf = np.empty((self.flush_rows, len(self.columns)), dtype=np.float64)
+        self._n = 0
+        self._last_flush = time.monotonic()
+        self._queue = deque()              # 待寫出的 (batch, rows)
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()   # 保持 batch 寫出順序
+        self._closed = False
+        self._open()
+
+        self._worker = None
+        if background:
+            self._worker = threading.Thread(target=self._worker_loop, name="log-sink", daemon=True)
+            self._worker.start()
+
+    # 子類別實作 ----------------------------------------------------------
+    def _open(self):
+        raise NotImplementedError
+
+    def _write_batch(self, batch: np.ndarray):
+        raise NotImplementedError
+
+    def _close_file(self):
+        self._file.close()
+
+    # --------------------------------------------------------------------
+    def write(self, row):
+        """Append one row (no I/O unless background=False and a flush is due)."""
+        with self._cond:
+            if self._closed:
+                raise ValueError("write to closed log sink")
+            self._buf[self._n] = row
+            self._n += 1
+            due = self._n == self.flush_rows or time.monotonic() - self._last_flush >= self.flush_secs
+            if due:
+                self._swap()
+                self._cond.notify()
+        if due and not self.background:
+            self._drain()
+
+    def write_many(self, rows):
+        """Append a (n, len(columns)) block of rows."""
+        rows = np.asarray(rows, dtype=np.float64)
+        if len(rows) == 1:
+            self.write(rows[0])
+            return
+        due = False
+        with self._cond:
+            if self._closed:
+                raise ValueError("write to closed log sink")
+            start = 0
+            while start < len(rows):
+                k = min(self.flush_rows - self._n, len(rows) - start)
+                self._buf[self._n:self._n + k] = rows[start:start + k]
+                self._n += k
+                start += k
+                if self._n == self.flush_rows:
+                    self._swap()
+                    due = True
+            if time.monotonic() - self._last_flush >= self.flush_secs:
+                self._swap()
+                due = True
+            if due:
+                self._cond.notify()
+        if due and not self.background:
+            self._drain()
+
+    def _swap(self):
+        # 呼叫端需持有 _cond；把目前 batch 交給寫出端，換一個新的
+        if self._n:
+            self._queue.append((self._buf, self._n))
+            self._buf = np.empty_like(self._buf)
+            self._n = 0
+        self._last_flush = time.monotonic()
+
+    def _drain(self):
+        with self._io_lock:
+            while True:
+                with self._cond:
+                    if not self._queue:
+                        return
+                    batch, n = self._queue.popleft()
+                self._write_batch(batch[:n])
+                self.rows_written += n
+                self.flushes += 1
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._closed, timeout=self.flush_secs)
+                if not self._queue and self._n and time.monotonic() - self._last_flush >= self.flush_secs:
+                    # 訓練停在別處 (例如 PPO 更新) 時也把殘留的資料寫出
+                    self._swap()
+                closed = self._closed
+            self._drain()
+            if closed:
+                return
+
+    def flush(self):
+        """Write everything buffered so far (blocks until it is on disk)."""
+        with self._cond:
+            self._swap()
+        self._drain()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._swap()
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+        self._drain()
+        self._close_file()
+
+
+class CSVSink(LogSink):
+    """
+    CSV with one header line; int_columns are written without decimals.
+    Appends to an existing file only if its header matches columns; otherwise the
+    old file is renamed to <name>.<n><ext> and a new one is started.
+    """
+
+    def __init__(self, path, columns, int_columns=("timestep",), **kw):
+        self._fmt = ["%d" if c in int_columns else "%s" for c in columns]
+        super().__init__(path, columns, **kw)
+
+    def _open(self):
+        header = ",".join(self.columns)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, newline="") as f:
+                existing = f.readline().rstrip("\r\n")
+            if existing != header:
+                rotated = _rotated_path(self.path)
+                os.replace(self.path, rotated)
+                print(f"[WARN] {self.path}: header does not match the log columns, "
+                      f"moved the old log to {rotated}")
+        self._file = open(self.path, "a", newline="")
+        if self._file.tell() == 0:
+            self._file.write(header + "\n")
+            self._file.flush()
+
+    def _write_batch(self, batch):
+        np.savetxt(self._file, batch, delimiter=",", fmt=self._fmt)
+        self._file.flush()
+
+
+def _rotated_path(path) -> str:
+    # training_log.csv -> training_log.1.csv (第一個不存在的編號)
+    stem, ext = os.path.splitext(path)
+    n = 1
+    while os.path.exists(f"{stem}.{n}{ext}"):
+        n += 1
+    return f"{stem}.{n}{ext}"
+
+
+class ChunkSink(LogSink):
+    """Columnar binary log: each flush appends one structured .npy array (float64 per column)."""
+
+    def _open(self):
+        self._dtype = np.dtype([(c, "<f8") for c in self.columns])
+        self._file = open(self.path, "ab")
+
+    def _write_batch(self, batch):
+        np.save(self._file, np.ascontiguousarray(batch).view(self._dtype).reshape(-1))
+        self._file.flush()
+
+
+def load_chunks(path) -> np.ndarray:
+    """Read every chunk of a ChunkSink file into one structured array."""
+    chunks = []
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        f.seek(0)
+        while f.tell() < size:
+            chunks.append(np.load(f))
+    if not chunks:
+        raise ValueError(f"{path}: empty log")
+    return np.concatenate(chunks)
+
+
+def make_sink(path, columns, log_format=None, **kw) -> LogSink:
+    """log_format: "csv" / "npyc"; default from the file extension."""
+    if log_format is None:
+        log_format = "npyc" if path.endswith(CHUNK_EXT) else "csv"
+    if log_format == "csv":
+        return CSVSink(path, columns, **kw)
+    if log_format == "npyc":
+        return ChunkSink(path, columns, **kw)
+    raise ValueError(f"unknown log format {log_format!r}")
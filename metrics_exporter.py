@@ -0,0 +1,223 @@
+"""
+metrics_exporter.py
+推理 / 控制迴圈的 Prometheus (text 0.0.4) / OpenMetrics 端點，讓機群監控直接 scrape。
+
+ - ControllerMetrics : 控制迴圈每步呼叫 observe_step()，在記憶體中累計 (gauge / counter / histogram)，
+                       最後把所有數值組成一個不可變的 tuple 整組替換 (與 TrendEstimator.result 相同做法)
+ - MetricsServer     : 背景執行緒的 HTTP server，scrape 時只讀最後發佈的 tuple 來產生文字，
+                       與控制迴圈之間沒有鎖，scrape 再慢也不會卡住控制
+
+每張卡 (label gpu="<id>") 的指標:
+    gpu_controller_temperature_celsius / power_limit_watts (回讀的實際 PL) / power_draw_watts /
+    power_ratio (eta) / fan_speed_percent / utilization_percent / action_watts (PL 變化量) / reward /
+    actuation_failures_total{kind="power_limit"|"fan"}
+整個迴圈:
+    gpu_controller_steps_total / step_overruns_total / step_latency_seconds (histogram，不含排程等待) /
+    last_step_timestamp_seconds
+
+用法:
+    metrics = ControllerMetrics(env.gpu_ids, actuator=env.actuator)
+    server = MetricsServer(metrics, port=9400).start()     # http://<host>:9400/metrics
+    ...
+    obs, reward, terminated, truncated, info = env.step(action)
+    metrics.observe_step(info, action, reward, latency=info["step_timing"]["busy"])
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# info["telemetry"] 欄位 (env.TELEMETRY_KEYS) -> (指標名稱, 說明)；slope_3s 不輸出
+_TELEMETRY_GAUGES = (
+    (0, "temperature_celsius", "GPU temperature."),
+    (2, "power_limit_watts", "Applied power limit (read back from the driver)."),
+    (3, "power_draw_watts", "Power draw."),
+    (4, "power_ratio", "Power draw / power limit (eta)."),
+    (5, "fan_speed_percent", "Fan speed."),
+    (6, "utilization_percent", "GPU utilization."),
+)
+# 控制迴圈一步的延遲分箱 (秒)
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+CONTENT_TYPE_OPENMETRICS = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _fmt(value) -> str:
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class ControllerMetrics:
+    """
+    Pre-aggregated controller metrics.
+    Args:
+        gpu_ids: GPUs of the env (label values, in info["telemetry"] row order)
+        actuator: optional env.actuator; its per-GPU failure counts are exported
+        prefix: metric name prefix
+        latency_buckets: upper bounds (seconds) of the step latency histogram
+    """
+
+    def __init__(self, gpu_ids, actuator=None, prefix="gpu_controller",
+                 latency_buckets=DEFAULT_LATENCY_BUCKETS, clock=time.time):
+        self.gpu_ids = list(gpu_ids)
+        self.actuator = actuator
+        self.prefix = prefix
+        self.latency_buckets = tuple(float(b) for b in latency_buckets)
+        self.clock = clock
+        self.steps = 0
+        self.overruns = 0
+        self._latency_counts = [0] * (len(self.latency_buckets) + 1)
+        self._latency_sum = 0.0
+        self._latency_count = 0
+        # 發佈給 scrape 端的不可變快照 (整組替換)
+        self.snapshot = None
+
+    def observe_step(self, info, action, reward, latency=None):
+        """
+        Record one control step.
+        Args:
+            info: step info (uses "telemetry", "rewards" and "step_timing")
+            action: PL deltas, one per GPU
+            reward: step reward (per-GPU values are taken from info["rewards"] if present)
+            latency: compute seconds of this iteration (policy + env.step work, excluding the
+                     scheduler's sleep, e.g. info["step_timing"]["busy"]), None = not measured
+        """
+        telemetry = np.atleast_2d(info["telemetry"]).tolist()
+        n = len(telemetry)
+        actions = np.ravel(action).tolist()
+        if len(actions) != n:
+            actions = (actions * n)[:n]
+        rewards = info.get("rewards")
+        rewards = [float(r) for r in rewards] if rewards is not None else [float(reward)] * n
+
+        self.steps += 1
+        timing = info.get("step_timing")
+        if timing is not None and timing.get("overrun"):
+            self.overruns += 1
+        if latency is not None:
+            k = 0
+            buckets = self.latency_buckets
+            while k < len(buckets) and latency > buckets[k]:
+                k += 1
+            self._latency_counts[k] += 1
+            self._latency_sum += latency
+            self._latency_count += 1
+
+        failures = dict(self.actuator.failures) if self.actuator is not None else {}
+        gauges = tuple(
+            tuple(row[col] for col, _, _ in _TELEMETRY_GAUGES) + (actions[i], rewards[i])
+            for i, row in enumerate(telemetry)
+        )
+        self.snapshot = (
+            self.clock(), self.steps, self.overruns, gauges,
+            tuple(self._latency_counts), self._latency_sum, self._latency_count, failures
+        )
+
+    def render(self, openmetrics=False) -> str:
+        """Exposition text of the last published snapshot."""
+        snapshot = self.snapshot
+        p = self.prefix
+        lines = []
+
+        def family(name, kind, help_text):
+            # OpenMetrics: counter 的 family 名稱不含 _total；0.0.4 則沿用樣本名稱
+            type_name = name[:-len("_total")] if openmetrics and kind == "counter" else name
+            lines.append(f"# HELP {p}_{type_name} {help_text}")
+            lines.append(f"# TYPE {p}_{type_name} {kind}")
+
+        if snapshot is None:
+            family("steps_total", "counter", "Control steps observed.")
+            lines.append(f"{p}_steps_total 0")
+        else:
+            stamp, steps, overruns, gauges, counts, lat_sum, lat_count, failures = snapshot
+            labels = [f'gpu="{gid}"' for gid in self.gpu_ids]
+            names = [(name, help_text) for _, name, help_text in _TELEMETRY_GAUGES] + [
+                ("action_watts", "Last power limit delta chosen by the policy."),
+                ("reward", "Last step reward."),
+            ]
+            for k, (name, help_text) in enumerate(names):
+                family(name, "gauge", help_text)
+                for label, values in zip(labels, gauges):
+                    lines.append(f"{p}_{name}{{{label}}} {_fmt(values[k])}")
+
+            family("actuation_failures_total", "counter", "Failed power limit / fan writes.")
+            for gid, label in zip(self.gpu_ids, labels):
+                for kind in ("power_limit", "fan"):
+                    lines.append(f'{p}_actuation_failures_total{{{label},kind="{kind}"}} '
+                                 f'{failures.get((kind, gid), 0)}')
+
+            family("steps_total", "counter", "Control steps observed.")
+            lines.append(f"{p}_steps_total {steps}")
+            family("step_overruns_total", "counter", "Steps that started after their deadline.")
+            lines.append(f"{p}_step_overruns_total {overruns}")
+
+            family("step_latency_seconds", "histogram", "Compute time per control step (policy + env.step, excluding the scheduler sleep).")
+            cumulative = 0
+            for bound, count in zip(self.latency_buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f'{p}_step_latency_seconds_bucket{{le="{_fmt(bound)}"}} {cumulative}')
+            lines.append(f"{p}_step_latency_seconds_sum {_fmt(lat_sum)}")
+            lines.append(f"{p}_step_latency_seconds_count {lat_count}")
+
+            family("last_step_timestamp_seconds", "gauge", "Unix time of the last observed step.")
+            lines.append(f"{p}_last_step_timestamp_seconds {_fmt(stamp)}")
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Serves ControllerMetrics.render() on http://host:port/metrics from a daemon thread.
+    Args:
+        port: 0 picks a free port (see .port after start())
+    """
+
+    def __init__(self, metrics: ControllerMetrics, host="0.0.0.0", port=9400, path="/metrics"):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.path = path
+        self._server = None
+        self._thread = None
+
+    def start(self) -> "MetricsServer":
+        metrics, path = self.metrics, self.path
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != path:
+                    self.send_error(404)
+                    return
+                openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+                body = metrics.render(openmetrics).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE_OPENMETRICS if openmetrics
+                                 else CONTENT_TYPE_PROMETHEUS)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                # 不在控制迴圈的終端機印每次 scrape
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
@@ -1,112 +1,231 @@
 """
 monitor.py
-讀取 GPU 資訊 (nvidia-smi)，供環境使用。
+讀取 GPU 資訊 (NVML / nvidia-smi，見 telemetry.py)，供環境使用。
+
+預設在 update_info() 時同步讀取一次；呼叫 start_sampler(rate_hz) 後改由背景執行緒
+以固定頻率取樣，寫入預先配置的 RingBuffer，get_observation() 直接讀最新一筆 (不阻塞)。
+
+多卡模式 (gpu_ids=[0, 1, ...])：每次取樣只呼叫一次 backend.read_all()，
+每張卡各有自己的 history / trend；current_* 與 get_observation() 預設對應第一張卡。
+
+backend="shm" (telemetry_bus.py 的 daemon 在跑時 "auto" 也會選它)：不自己取樣，
+history 直接是 shared memory 的唯讀 view，update_info() 只更新趨勢與最新值。
 """
-import subprocess
+import threading
 import time
-from collections import deque
+
+import numpy as np
+
+from ring_buffer import RingBuffer
+from spans import Spans
+from telemetry import make_backend
+from trend import TrendEstimator
+
+# history 每一列的欄位
+HISTORY_FIELDS = ("time", "temp", "gpu_util", "power_draw", "power_limit", "fan_speed")
+COL_TIME = 0
+COL_TEMP = 1
+
+# 趨勢特徵的時間視窗 (秒)；get_observation() 會輸出 slope_1s / slope_3s / slope_10s
+TREND_HORIZONS = (1.0, 3.0, 10.0)
 
 class GPUInfoMonitor:
-    def __init__(self, gpu_id=0):
-        self.gpu_id = gpu_id
+    def __init__(self, gpu_id=0, backend="auto", history_capacity=1024, clock=time.time,
+                 gpu_ids=None, spans=None):
+        self.gpu_ids = list(gpu_ids) if gpu_ids is not None else [gpu_id]
+        self.gpu_id = self.gpu_ids[0]
+        # clock: 取樣時間戳來源 (模擬環境會換成模擬時間)
+        self.clock = clock
+        # backend: "auto" / "nvml" / "nvidia-smi" / "fake" 或 TelemetryBackend 實例
+        if isinstance(backend, str):
+            backend = make_backend(backend, gpu_id=self.gpu_id, gpu_ids=self.gpu_ids)
+        self.backend = backend
+        # 共用 telemetry bus：history 由 daemon 寫入，本行程只讀
+        self.bus_attached = hasattr(backend, "rings")
+        # 計時 span (預設關閉)；GPUEnv 會換成與自己共用的 Spans
+        self.spans = spans if spans is not None else Spans()
         self.history_secs = 10.0
-        self.temp_history = deque()
+        self._make_histories(history_capacity)
 
         self.current_temp = 0.0
         self.current_gpu_util = 0.0
         self.current_power_draw = 0.0
         self.current_power_limit = 150.0
         self.current_fan_speed = 0.0
+        # 每張卡最新的 (temp, util, power_draw, power_limit, fan)
+        self.current = np.zeros((len(self.gpu_ids), len(HISTORY_FIELDS) - 1))
+        self.current[:, 3] = 150.0
 
-    def _parse_nvidia_smi(self):
-        command = [
-            "nvidia-smi",
-            f"--query-gpu=temperature.gpu,utilization.gpu,power.draw,power.limit,fan.speed",
-            "--format=csv,noheader,nounits",
-            f"--id={self.gpu_id}"
+        self._sampler = None
+        self._stop_event = threading.Event()
+
+    def _make_histories(self, capacity):
+        # 每張卡一個 (time, temp, util, power_draw, power_limit, fan) 環形緩衝區
+        if self.bus_attached:
+            self.histories = self.backend.rings()
+        else:
+            self.histories = [RingBuffer(capacity, len(HISTORY_FIELDS)) for _ in self.gpu_ids]
+        self.trends = [
+            TrendEstimator(h, COL_TIME, COL_TEMP, horizons=TREND_HORIZONS)
+            for h in self.histories
         ]
-        try:
-            output = subprocess.check_output(command, universal_newlines=True)
-        except Exception as e:
-            print(f"[WARN] Could not parse nvidia-smi: {e}")
-            return (0.0, 0.0, 0.0, 150.0, 0.0)
-
-        line = output.strip()
-        parts = [x.strip() for x in line.split(",")]
-        if len(parts) < 5:
-            print(f"[WARN] nvidia-smi 回傳格式不足: {line}")
-            return (0.0, 0.0, 0.0, 150.0, 0.0)
-
-        try:
-            temp = float(parts[0])
-            gpu_util = float(parts[1])
-            power_draw = float(parts[2])
-            power_limit = float(parts[3])
-            fan_speed = float(parts[4])
-        except ValueError as ve:
-            print(f"[WARN] 解析 nvidia-smi 輸出失敗: {ve}")
-            return (0.0, 0.0, 0.0, 150.0, 0.0)
-
-        return temp, gpu_util, power_draw, power_limit, fan_speed
 
-    def update_info(self):
-        now = time.time()
-        temp, gpu_util, power_draw, power_limit, fan_speed = self._parse_nvidia_smi()
+    @property
+    def history(self) -> RingBuffer:
+        return self.histories[0]
+
+    @property
+    def trend(self) -> TrendEstimator:
+        return self.trends[0]
+
+    def _parse_nvidia_smi(self):
+        # 名稱沿用舊版；實際讀取交給 telemetry backend (NVML / nvidia-smi / fake)
+        # 回傳 gpu_ids 每張卡一筆 GPUSample
+        t0 = self.spans.begin()
+        samples = self.backend.read_all()
+        self.spans.end("parse_nvidia_smi", t0)
+        return samples
+
+    @property
+    def sampling(self) -> bool:
+        return self._sampler is not None
 
-        self.temp_history.append((now, temp))
-        while len(self.temp_history) > 0:
-            oldest_time = self.temp_history[0][0]
-            if now - oldest_time > self.history_secs:
-                self.temp_history.popleft()
-            else:
-                break
+    def start_sampler(self, rate_hz=20.0):
+        """
+        Start a background thread polling the backend at rate_hz.
+        The history buffer must hold at least history_secs of samples.
+        """
+        if self._sampler is not None or self.bus_attached:
+            # bus 模式已由 daemon 取樣
+            return
+        needed = int(np.ceil(self.history_secs * rate_hz)) + 1
+        if needed > self.history.capacity:
+            self._make_histories(needed)
+        self._stop_event.clear()
+        self._sampler = threading.Thread(
+            target=self._sample_loop,
+            args=(1.0 / rate_hz,),
+            name=f"gpu{self.gpu_id}-sampler",
+            daemon=True
+        )
+        self._sampler.start()
 
+    def stop_sampler(self):
+        if self._sampler is None:
+            return
+        self._stop_event.set()
+        self._sampler.join()
+        self._sampler = None
+
+    def _sample_loop(self, period):
+        next_t = time.monotonic()
+        while not self._stop_event.is_set():
+            self._sample_once()
+            next_t += period
+            delay = next_t - time.monotonic()
+            if delay < 0.0:
+                # 讀取比 period 還慢 => 不追趕，從現在重新對齊
+                next_t = time.monotonic()
+                delay = 0.0
+            self._stop_event.wait(delay)
+
+    def _sample_once(self):
+        now = self.clock()
+        samples = self._parse_nvidia_smi()
+        for history, trend, sample in zip(self.histories, self.trends, samples):
+            history.append((now,) + tuple(sample))
+            trend.update()
+
+    def _refresh_current(self):
+        if self.bus_attached:
+            # seqlock 快照：所有卡同一次取樣
+            _, rows = self.backend.snapshot()
+            if rows is not None:
+                self.current[:] = rows[:, 1:]
+        else:
+            for k, history in enumerate(self.histories):
+                row = history.latest()
+                if row is not None:
+                    self.current[k] = row[1:]
+        # 單筆複製後再拆欄位，避免讀到寫入中的列
+        temp, gpu_util, power_draw, power_limit, fan_speed = self.current[0].tolist()
         self.current_temp = temp
         self.current_gpu_util = gpu_util
         self.current_power_draw = power_draw
         self.current_power_limit = power_limit
         self.current_fan_speed = fan_speed
 
-    def get_slope_3s(self):
-        now = time.time()
-        target_time = now - 3.0
-        if len(self.temp_history) < 2:
-            return 0.0
-
-        reversed_history = reversed(self.temp_history)
-        candidate = None
-        for tstamp, ttemp in reversed_history:
-            if tstamp <= target_time:
-                candidate = (tstamp, ttemp)
-                break
-        if candidate is None:
-            return 0.0
-
-        older_time, older_temp = candidate
-        current_temp = self.current_temp
-        dt = now - older_time
-        if dt < 1e-6:
-            return 0.0
-        slope = (current_temp - older_temp) / dt
-        return slope
-
-    def get_observation(self):
-        slope_3s = self.get_slope_3s()
-        if self.current_power_limit > 1e-6:
-            eta = self.current_power_draw / self.current_power_limit
+    def clear_history(self):
+        # 背景取樣中 history 仍是連續有效的資料，不清除 (也避免與寫入端競爭)
+        if self._sampler is None and not self.bus_attached:
+            for history, trend in zip(self.histories, self.trends):
+                history.clear()
+                trend.reset()
+
+    def close(self):
+        self.stop_sampler()
+        self.backend.close()
+
+    def update_info(self):
+        t0 = self.spans.begin()
+        if self.bus_attached:
+            for trend in self.trends:
+                trend.update()
+        elif self._sampler is None:
+            self._sample_once()
+        self._refresh_current()
+        self.spans.end("update_info", t0)
+
+    def get_slope_3s(self, index=0):
+        # 3 秒視窗的最小平方斜率 (°C/s)，由 TrendEstimator 增量維護
+        return self.get_trend(index)["slope_3s"]
+
+    def get_trend(self, index=0):
+        """
+        Latest least-squares temperature trend of GPU gpu_ids[index].
+        Returns:
+            dict: slope_<h>s for every horizon (°C/s) and temp_accel (°C/s^2)
+        """
+        trend_est = self.trends[index]
+        slopes, accel = trend_est.result
+        trend = {
+            f"slope_{h:g}s": float(v)
+            for h, v in zip(trend_est.horizons, slopes)
+        }
+        trend["temp_accel"] = accel
+        return trend
+
+    def get_observation(self, index=0):
+        if self._sampler is not None:
+            self._refresh_current()
+        return self._build_observation(index)
+
+    def get_observations(self):
+        """One observation dict per GPU in gpu_ids."""
+        if self._sampler is not None:
+            self._refresh_current()
+        return [self._build_observation(k) for k in range(len(self.gpu_ids))]
+
+    def _build_observation(self, index):
+        trend = self.get_trend(index)
+        temp, gpu_util, power_draw, power_limit, fan_speed = self.current[index].tolist()
+        if power_limit > 1e-6:
+            eta = power_draw / power_limit
         else:
             eta = 0.0
         if eta > 1.0:
             eta = 1.0
 
         obs = {
-            "temp": self.current_temp,
-            "gpu_util": self.current_gpu_util,
-            "slope_3s": slope_3s,
-            "power_limit": self.current_power_limit,
-            "actual_power_draw": self.current_power_draw,
+            "temp": temp,
+            "gpu_util": gpu_util,
+            "slope_3s": trend["slope_3s"],
+            "power_limit": power_limit,
+            "actual_power_draw": power_draw,
             "eta": eta,
-            "fan": self.current_fan_speed
+            "fan": fan_speed
         }
+        # 額外的趨勢特徵 (slope_1s, slope_10s, temp_accel ...)
+        for key, value in trend.items():
+            obs.setdefault(key, value)
         return obs
-
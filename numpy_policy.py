@@ -0,0 +1,188 @@
+"""
+numpy_policy.py
+把 SB3 PPO 模型 (.zip) 的 actor 匯出成純 numpy 權重檔 (.npz)，推理時不需要 torch / SB3。
+
+ - export_policy : 讀 PPO zip (需要 torch + SB3，只在匯出時)，存成 .npz (不含 pickle)
+ - NumpyPolicy   : 只依賴 numpy 的決定性策略，predict() 與
+                   model.predict(obs, deterministic=True) 相同介面與結果
+                   (float32 運算；與 torch 的差異只在矩陣乘法的累加順序，約 1e-6)
+
+用法:
+    python numpy_policy.py modelA_B_C_D.zip                 # -> modelA_B_C_D.npz 並驗證
+    python numpy_policy.py modelA_B_C_D.zip -o policy.npz --verify 100000
+"""
+import argparse
+import json
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+_ACTIVATIONS = {
+    "tanh": np.tanh,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "identity": lambda x: x,
+}
+
+
+class NumpyPolicy:
+    """
+    Deterministic MLP policy: obs -> [Linear -> act]* -> action_net -> clip.
+    Args:
+        layers: list of (weight (out, in), bias (out,)) for the policy net
+        action_layer: (weight, bias) of action_net
+        activation: "tanh" / "relu" / "identity"
+        obs_shape: observation shape (flattened before the first layer)
+        action_low / action_high: Box bounds used to clip actions
+        squash_output: actions are tanh-squashed and rescaled instead of clipped
+    """
+
+    def __init__(self, layers, action_layer, activation, obs_shape, action_low, action_high,
+                 squash_output=False):
+        # 存成 (in, out) 以便 x @ W
+        self.layers = [(np.ascontiguousarray(w.T, dtype=np.float32), b.astype(np.float32)) for w, b in layers]
+        w, b = action_layer
+        self.action_layer = (np.ascontiguousarray(w.T, dtype=np.float32), b.astype(np.float32))
+        self.activation = activation
+        self._act = _ACTIVATIONS[activation]
+        self.obs_shape = tuple(obs_shape)
+        self.action_low = np.asarray(action_low, dtype=np.float32)
+        self.action_high = np.asarray(action_high, dtype=np.float32)
+        self.squash_output = squash_output
+
+    # ------------------------------------------------------------------
+    @classmethod
+    def load(cls, path) -> "NumpyPolicy":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["version"] != FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported policy format {meta['version']}")
+            layers = [(data[f"w{i}"], data[f"b{i}"]) for i in range(meta["n_layers"])]
+            return cls(
+                layers, (data["action_w"], data["action_b"]), meta["activation"],
+                meta["obs_shape"], data["action_low"], data["action_high"], meta["squash_output"]
+            )
+
+    def save(self, path):
+        meta = {
+            "version": FORMAT_VERSION,
+            "n_layers": len(self.layers),
+            "activation": self.activation,
+            "obs_shape": list(self.obs_shape),
+            "squash_output": self.squash_output,
+        }
+        arrays = {"meta": np.array(json.dumps(meta))}
+        for i, (w, b) in enumerate(self.layers):
+            arrays[f"w{i}"] = w.T
+            arrays[f"b{i}"] = b
+        arrays["action_w"] = self.action_layer[0].T
+        arrays["action_b"] = self.action_layer[1]
+        arrays["action_low"] = self.action_low
+        arrays["action_high"] = self.action_high
+        np.savez(path, **arrays)
+
+    # ------------------------------------------------------------------
+    def forward(self, obs) -> np.ndarray:
+        """Raw action_net output (before clipping) for a batch of observations."""
+        x = np.asarray(obs, dtype=np.float32).reshape(-1, int(np.prod(self.obs_shape)))
+        for w, b in self.layers:
+            x = self._act(x @ w + b)
+        w, b = self.action_layer
+        return x @ w + b
+
+    def predict(self, obs, state=None, episode_start=None, deterministic=True):
+        """
+        Same contract as BasePolicy.predict(deterministic=True): a single obs
+        returns an action of shape action_space.shape, a batch returns (n, ...).
+        """
+        obs = np.asarray(obs, dtype=np.float32)
+        single = obs.shape == self.obs_shape
+        actions = self.forward(obs)
+        if self.squash_output:
+            actions = self.action_low + 0.5 * (np.tanh(actions) + 1.0) * (self.action_high - self.action_low)
+        else:
+            actions = np.clip(actions, self.action_low, self.action_high)
+        actions = actions.reshape((-1,) + self.action_low.shape)
+        return (actions[0] if single else actions), state
+
+
+def export_policy(model_path, out_path=None) -> NumpyPolicy:
+    """
+    Extract the deterministic actor of a saved PPO model (MlpPolicy, Box actions).
+    Returns the NumpyPolicy; writes it to out_path when given.
+    """
+    import torch.nn as nn
+    from stable_baselines3 import PPO
+
+    # 匯出只需要網路權重，schedule 物件不必還原
+    model = PPO.load(model_path, device="cpu", custom_objects={"lr_schedule": 0.0, "clip_range": 0.0})
+    policy = model.policy
+    if policy.use_sde:
+        raise ValueError("gSDE policies are not supported")
+    if type(policy.pi_features_extractor).__name__ != "FlattenExtractor":
+        raise ValueError("only MlpPolicy (FlattenExtractor) is supported")
+
+    layers, activation = [], "identity"
+    for module in policy.mlp_extractor.policy_net:
+        if isinstance(module, nn.Linear):
+            layers.append((module.weight.detach().numpy(), module.bias.detach().numpy()))
+        elif isinstance(module, nn.Tanh):
+            activation = "tanh"
+        elif isinstance(module, nn.ReLU):
+            activation = "relu"
+        else:
+            raise ValueError(f"unsupported layer {module!r}")
+    action_net = policy.action_net
+    result = NumpyPolicy(
+        layers,
+        (action_net.weight.detach().numpy(), action_net.bias.detach().numpy()),
+        activation,
+        model.observation_space.shape,
+        model.action_space.low,
+        model.action_space.high,
+        squash_output=policy.squash_output,
+    )
+    if out_path is not None:
+        result.save(out_path)
+    return result
+
+
+def load_policy(path):
+    """NumpyPolicy for .npz exports, otherwise the full SB3 PPO model (both have predict())."""
+    if path.endswith(".npz"):
+        return NumpyPolicy.load(path)
+    from stable_baselines3 import PPO
+    return PPO.load(path)
+
+
+def verify(model_path, policy: NumpyPolicy, n=10000, seed=0) -> float:
+    """Max |action| difference to model.predict(deterministic=True) over n random observations."""
+    from stable_baselines3 import PPO
+
+    model = PPO.load(model_path, device="cpu", custom_objects={"lr_schedule": 0.0, "clip_range": 0.0})
+    space = model.observation_space
+    space.seed(seed)
+    obs = np.stack([space.sample() for _ in range(n)])
+    expected, _ = model.predict(obs, deterministic=True)
+    actual, _ = policy.predict(obs)
+    return float(np.max(np.abs(expected - actual)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a PPO zip to a torch-free numpy policy")
+    parser.add_argument("model", help="SB3 PPO .zip")
+    parser.add_argument("-o", "--out", default=None, help="output .npz (default: <model>.npz)")
+    parser.add_argument("--verify", type=int, default=10000, help="random observations to compare (0 = skip)")
+    args = parser.parse_args()
+
+    out = args.out or args.model.rsplit(".", 1)[0] + ".npz"
+    policy = export_policy(args.model, out)
+    print(f"exported {args.model} -> {out} "
+          f"({len(policy.layers)} x {policy.activation} layers, obs {policy.obs_shape})")
+    if args.verify:
+        err = verify(args.model, policy, args.verify)
+        print(f"max |action - model.predict| over {args.verify} observations: {err:.3g}")
+
+
+if __name__ == "__main__":
+    main()
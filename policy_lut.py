@@ -0,0 +1,288 @@
+"""
+policy_lut.py
+把策略 (NumpyPolicy / SB3 模型) 編譯成觀測空間上的查表 (規則網格 + 單形內插)。
+
+ - 每一維可設定範圍與格點數；只有 1 個格點的維度視為固定值 (例如 fan=100)
+ - 推理: 算格子索引，f 排序後取 d+1 個角點加權平均 (Kuhn 單形內插)，沒有網路的矩陣乘法
+ - 編譯後以隨機點與格子中點抽樣比對，回報抽樣到的最大誤差 (經驗值)；
+   NumpyPolicy 另外以網路的 Lipschitz 常數 L 算出格子內保證成立的上界 L * |格子對角線| / 2
+   (範圍外的輸入會被夾到邊界，上界只對格子範圍內的輸入成立)
+ - target_error: 自適應加密，每輪把內插誤差最大的維度格點加倍 (直到誤差或大小上限)
+
+用法:
+    python policy_lut.py modelA_B_C_D.npz -o modelA_B_C_D_lut.npz \
+        --range temp=30:95 util=0:100 fan=30:100 --points 14 3 9 12 12 5 3 --target-error 0.5
+"""
+import argparse
+import json
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+OBS_NAMES = ("temp", "util", "slope_3s", "power_limit", "power_draw", "eta", "fan",
+             "slope_1s", "slope_10s", "temp_accel")
+
+
+class PolicyLUT:
+    """
+    Lookup table over a regular grid with simplex (Kuhn) interpolation:
+    exact on grid nodes, continuous, d+1 table reads per observation.
+    Args:
+        lo, hi: grid bounds per observation dimension
+        table: action values, shape (points_0, ..., points_{d-1}) + action_shape
+    """
+
+    def __init__(self, lo, hi, table, meta=None):
+        self.lo = np.asarray(lo, dtype=np.float64)
+        self.hi = np.asarray(hi, dtype=np.float64)
+        self.points = np.array(table.shape[:len(self.lo)])
+        self.action_shape = table.shape[len(self.lo):]
+        self.table = np.ascontiguousarray(table, dtype=np.float32)
+        self.meta = dict(meta or {})
+
+        n_act = int(np.prod(self.action_shape))
+        self._flat = self.table.reshape(-1, n_act)
+        strides = np.cumprod(np.r_[1, self.points[:0:-1]])[::-1]     # C order
+        self._active = np.flatnonzero(self.points > 1)
+        self._step = np.where(self.points > 1, (self.hi - self.lo) / np.maximum(self.points - 1, 1), 1.0)
+        self._inv_step = 1.0 / self._step
+        self._max_index = np.maximum(self.points - 2, 0)
+        self._strides = strides
+        self._active_strides = strides[self._active]
+        self._py = None
+
+    @property
+    def entries(self) -> int:
+        return int(np.prod(self.points))
+
+    def predict(self, obs, state=None, episode_start=None, deterministic=True):
+        """Same contract as NumpyPolicy.predict (single obs or a batch)."""
+        obs = np.asarray(obs, dtype=np.float64)
+        if obs.ndim == 1:
+            return self._predict_one(obs), state
+        x = obs.reshape(-1, len(self.lo))
+        u = (np.clip(x, self.lo, self.hi) - self.lo) * self._inv_step
+        i = np.minimum(u.astype(np.int64), self._max_index)
+        f = (u - i)[:, self._active]
+        # 單形 (Kuhn) 內插：f 由大到小排序，沿排序後的維度走 d+1 個角點
+        order = np.argsort(-f, axis=1)
+        fs = np.take_along_axis(f, order, axis=1)
+        idx = np.empty((len(x), len(self._active) + 1), dtype=np.int64)
+        idx[:, 0] = i @ self._strides
+        idx[:, 1:] = idx[:, :1] + np.cumsum(self._active_strides[order], axis=1)
+        ones = np.ones((len(x), 1))
+        w = np.concatenate([ones, fs], axis=1) - np.concatenate([fs, 0 * ones], axis=1)
+        actions = np.einsum("bc,bca->ba", w, self._flat[idx]).astype(np.float32)
+        return actions.reshape((-1,) + self.action_shape), state
+
+    def _predict_one(self, x):
+        # 單筆走純 Python (d 只有 7~10)，避免十幾次小 numpy 呼叫的固定開銷
+        if self._py is None:
+            self._py = (self.lo.tolist(), self.hi.tolist(), self._inv_step.tolist(), self._max_index.tolist(),
+                        self._strides.tolist(), self._active.tolist(), self._flat.tolist())
+        lo, hi, inv_step, max_index, strides, active, flat = self._py
+        base, fracs = 0, []
+        for k, v in enumerate(x.tolist()):
+            u = (min(max(v, lo[k]), hi[k]) - lo[k]) * inv_step[k]
+            i = min(int(u), max_index[k])
+            base += i * strides[k]
+            if k in active:
+                fracs.append((u - i, strides[k]))
+        fracs.sort(reverse=True)
+        prev, idx = 1.0, base
+        out = [0.0] * len(flat[0])
+        for f, stride in fracs + [(0.0, 0)]:
+            w = prev - f
+            row = flat[idx]
+            for a in range(len(out)):
+                out[a] += w * row[a]
+            prev, idx = f, idx + stride
+        return np.array(out, dtype=np.float32).reshape(self.action_shape)
+
+    # ------------------------------------------------------------------
+    def save(self, path):
+        meta = dict(self.meta, version=FORMAT_VERSION)
+        np.savez_compressed(path, lo=self.lo, hi=self.hi, table=self.table, meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path) -> "PolicyLUT":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported LUT format {meta.get('version')}")
+            return cls(data["lo"], data["hi"], data["table"], meta)
+
+
+def _grid_axes(lo, hi, points):
+    return [np.linspace(a, b, n) if n > 1 else np.array([a]) for a, b, n in zip(lo, hi, points)]
+
+
+def build_lut(predict_fn, lo, hi, points, batch=65536) -> PolicyLUT:
+    """Evaluate predict_fn(obs_batch) -> actions on every grid node."""
+    axes = _grid_axes(lo, hi, points)
+    shape = tuple(len(a) for a in axes)
+    n = int(np.prod(shape))
+    out = None
+    for start in range(0, n, batch):
+        idx = np.unravel_index(np.arange(start, min(start + batch, n)), shape)
+        obs = np.stack([axes[k][idx[k]] for k in range(len(axes))], axis=1).astype(np.float32)
+        actions = np.asarray(predict_fn(obs), dtype=np.float32).reshape(len(obs), -1)
+        if out is None:
+            out = np.empty((n, actions.shape[1]), dtype=np.float32)
+        out[start:start + len(obs)] = actions
+    return PolicyLUT(lo, hi, out.reshape(shape + (out.shape[1],)))
+
+
+def verify_lut(lut: PolicyLUT, predict_fn, n=100000, seed=0) -> dict:
+    """
+    Compare the LUT with predict_fn on n uniform random observations inside the
+    grid box plus n cell centres (where interpolation error peaks).
+    The errors are empirical: max_error is the largest error among the sampled
+    points, not a bound over the whole box.
+    Returns:
+        {"max_error", "mean_error", "p99_error", "samples"}
+    """
+    rng = np.random.default_rng(seed)
+    d = len(lut.lo)
+    uniform = rng.uniform(lut.lo, lut.hi, size=(n, d))
+    cells = rng.integers(0, np.maximum(lut.points - 1, 1), size=(n, d))
+    centres = lut.lo + (cells + 0.5 * (lut.points > 1)) * lut._step
+    obs = np.concatenate([uniform, centres]).astype(np.float32)
+    expected = np.asarray(predict_fn(obs), dtype=np.float64).reshape(len(obs), -1)
+    actual = lut.predict(obs)[0].reshape(len(obs), -1)
+    err = np.abs(expected - actual).max(axis=1)
+    return {
+        "max_error": float(err.max()),
+        "mean_error": float(err.mean()),
+        "p99_error": float(np.percentile(err, 99)),
+        "samples": int(len(obs)),
+    }
+
+
+def policy_lipschitz(policy) -> float:
+    """
+    Upper bound of the L2 Lipschitz constant of a NumpyPolicy (W per observation unit):
+    product of the layers' spectral norms; tanh / relu and clipping are 1-Lipschitz.
+    """
+    lipschitz = 1.0
+    for w, _ in policy.layers + [policy.action_layer]:
+        lipschitz *= float(np.linalg.norm(w.astype(np.float64), 2))
+    if policy.squash_output:
+        lipschitz *= float(np.max(policy.action_high - policy.action_low)) / 2.0
+    return lipschitz
+
+
+def error_bound(lut: PolicyLUT, lipschitz: float) -> float:
+    """
+    Worst-case interpolation error inside the grid box for an L-Lipschitz policy.
+    Kuhn simplices lie in one cell, so |f(x) - sum_i w_i f(v_i)| <= L sqrt(sum_i w_i |x - v_i|^2)
+    <= L * (cell diagonal) / 2; float32 rounding of the table is added on top.
+    """
+    h = np.where(lut.points > 1, lut._step, 0.0)
+    rounding = 2.0 * float(np.abs(lut.table).max()) * float(np.finfo(np.float32).eps)
+    return lipschitz * float(np.linalg.norm(h)) / 2.0 + rounding
+
+
+def _dimension_errors(lut: PolicyLUT, predict_fn, n=4096, seed=1):
+    """Interpolation error along each active dimension alone (other coordinates on grid nodes)."""
+    rng = np.random.default_rng(seed)
+    d = len(lut.lo)
+    errors = np.zeros(d)
+    nodes = rng.integers(0, np.maximum(lut.points - 1, 1), size=(n, d))
+    for k in np.flatnonzero(lut.points > 1):
+        offset = np.zeros(d)
+        offset[k] = 0.5
+        obs = (lut.lo + (nodes + offset) * lut._step).astype(np.float32)
+        expected = np.asarray(predict_fn(obs), dtype=np.float64).reshape(n, -1)
+        actual = lut.predict(obs)[0].reshape(n, -1)
+        errors[k] = np.abs(expected - actual).max()
+    return errors
+
+
+def compile_lut(predict_fn, lo, hi, points, target_error=None, max_entries=5_000_000,
+                verify_samples=100000, verbose=True, lipschitz=None) -> PolicyLUT:
+    """
+    Build a LUT, optionally refining the worst dimension until the sampled
+    max_error <= target_error.
+    Args:
+        lipschitz: Lipschitz constant of predict_fn (see policy_lipschitz); adds the
+                   guaranteed "bound" to the report
+    Returns the LUT with its verification report in lut.meta["verify"].
+    """
+    points = np.array(points, dtype=np.int64)
+    while True:
+        lut = build_lut(predict_fn, lo, hi, points)
+        report = verify_lut(lut, predict_fn, verify_samples)
+        if lipschitz is not None:
+            report["bound"] = error_bound(lut, lipschitz)
+        if verbose:
+            print(f"grid {points.tolist()} ({lut.entries} entries): "
+                  f"sampled max err {report['max_error']:.4g}, p99 {report['p99_error']:.4g}"
+                  + (f", bound {report['bound']:.4g}" if lipschitz is not None else ""))
+        if target_error is None or report["max_error"] <= target_error:
+            break
+        errors = _dimension_errors(lut, predict_fn)
+        k = int(np.argmax(errors))
+        refined = points.copy()
+        refined[k] = 2 * points[k] - 1       # 保留原格點，每格中間加一點
+        if np.prod(refined) > max_entries:
+            if verbose:
+                print(f"stop: refining dim {k} would exceed max_entries={max_entries}")
+            break
+        points = refined
+    lut.meta.update({"verify": report, "target_error": target_error})
+    return lut
+
+
+def _parse_ranges(items, names, lo, hi):
+    for item in items or []:
+        name, span = item.split("=")
+        a, b = (float(v) for v in span.split(":"))
+        k = names.index(name)
+        lo[k], hi[k] = a, b
+    return lo, hi
+
+
+def main():
+    from env import make_spaces
+    from numpy_policy import NumpyPolicy, export_policy
+
+    parser = argparse.ArgumentParser(description="Compile a policy into an interpolated lookup table")
+    parser.add_argument("policy", help="NumpyPolicy .npz or SB3 PPO .zip")
+    parser.add_argument("-o", "--out", default=None, help="output .npz (default: <policy>_lut.npz)")
+    parser.add_argument("--range", nargs="*", default=None, help="name=lo:hi overrides, e.g. temp=30:95")
+    parser.add_argument("--points", nargs="*", type=int, default=None, help="grid points per dimension")
+    parser.add_argument("--target-error", type=float, default=None, help="refine until the sampled max error <= this (W)")
+    parser.add_argument("--max-entries", type=float, default=5e6)
+    parser.add_argument("--verify", type=int, default=100000, help="random + cell-centre samples each")
+    args = parser.parse_args()
+
+    if args.policy.endswith(".zip"):
+        policy = export_policy(args.policy)
+    else:
+        policy = NumpyPolicy.load(args.policy)
+    if len(policy.obs_shape) != 1:
+        raise SystemExit("only flat (single GPU) observations can be tabulated")
+    d = policy.obs_shape[0]
+    _, space = make_spaces(trend_features=d > 7)
+    lo, hi = _parse_ranges(args.range, OBS_NAMES[:d], space.low.astype(np.float64), space.high.astype(np.float64))
+    points = args.points or [9] * d
+
+    def predict_fn(obs):
+        return policy.predict(obs)[0]
+
+    lipschitz = policy_lipschitz(policy)
+    lut = compile_lut(predict_fn, lo, hi, points, args.target_error, int(args.max_entries), args.verify,
+                      lipschitz=lipschitz)
+    lut.meta.update({"source": args.policy, "names": list(OBS_NAMES[:d])})
+    out = args.out or args.policy.rsplit(".", 1)[0] + "_lut.npz"
+    lut.save(out)
+    r = lut.meta["verify"]
+    print(f"saved {out}: {lut.entries} entries, empirical max error {r['max_error']:.4g} "
+          f"(mean {r['mean_error']:.3g}) over {r['samples']} samples inside the grid box; "
+          f"guaranteed bound {r['bound']:.4g} (Lipschitz {lipschitz:.4g})")
+
+
+if __name__ == "__main__":
+    main()
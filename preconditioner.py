@@ -0,0 +1,182 @@
+"""
+preconditioner.py
+訓練前的升溫 / 預熱 (preconditioning)：背景負載 + 閉迴路控制到目標溫度。
+
+原本 `while get_temp() <= target: stress_gpu()` 在主執行緒滿載燒機，會衝過頭、
+不能和其他工作重疊。這裡改成：
+ - 負載在 DutyCycleWorker (workload.py) 背景執行，duty 0..1 可調
+ - 控制器每 sample_secs 讀一次溫度，以「溫度 + 斜率 * lead_secs」(預估溫度) 做 PI 控制，
+   離目標很遠時滿載，接近時提早降載，避免熱慣性造成的過衝
+ - |溫度 - 目標| <= tolerance 且 |斜率| <= max_slope 連續 stable_secs 秒 => ready (threading.Event)
+ - 滿載仍停在目標以下 (穩態達不到目標) 連續 3 * stable_secs 秒 => "saturated"，不再空等
+ - start() 立即返回 (背景執行緒)，run() 為同步版本 (模擬環境以模擬時間執行)
+
+用法:
+    pre = Preconditioner(env.get_temp, DutyCycleWorker(CudaMatmulWorkload()), target_temp=65)
+    pre.start()
+    ...                       # 建立模型、callback 等
+    pre.wait_ready(timeout=1800)
+    pre.close()
+"""
+import threading
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from ring_buffer import RingBuffer
+from trend import TrendEstimator
+
+
+class PreconditionStatus(NamedTuple):
+    elapsed: float
+    temp: float
+    slope: float       # °C/s
+    duty: float
+    ready: bool
+    state: str         # "heating" / "settling" / "ready" / "holding" / "saturated" / "timeout" / "stopped"
+
+
+class Preconditioner:
+    """
+    Drives the GPU temperature to target_temp with an adjustable background load.
+    Args:
+        read_temp: callable returning the current temperature (e.g. env.get_temp)
+        load: object with set_duty(d), start(), stop() (DutyCycleWorker, SimLoad)
+        target_temp: setpoint in °C
+        tolerance / max_slope / stable_secs: readiness criterion
+        kp: duty per °C of predicted error; ki: duty per °C·s
+        lead_secs: look-ahead used for the predicted temperature
+        hold: keep regulating after ready until stop() (otherwise the load stops at ready)
+        max_secs: give up (state "timeout") after this long
+        clock / sleep: injectable for simulated time
+    """
+
+    def __init__(self, read_temp, load, target_temp=65.0, tolerance=1.0, max_slope=0.1,
+                 stable_secs=20.0, kp=0.15, ki=0.004, lead_secs=15.0, sample_secs=1.0,
+                 hold=False, max_secs=3600.0, clock=time.monotonic, sleep=time.sleep, verbose=1):
+        self.read_temp = read_temp
+        self.load = load
+        self.target_temp = float(target_temp)
+        self.tolerance = tolerance
+        self.max_slope = max_slope
+        self.stable_secs = stable_secs
+        self.kp = kp
+        self.ki = ki
+        self.lead_secs = lead_secs
+        self.sample_secs = sample_secs
+        self.hold = hold
+        self.max_secs = max_secs
+        self.clock = clock
+        self.sleep = sleep
+        self.verbose = verbose
+
+        self.ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        # (time, temp)；斜率用 30 秒視窗最小平方 (nvidia-smi 溫度為整數，短視窗太吵)
+        self._history = RingBuffer(512, 2)
+        self._trend = TrendEstimator(self._history, horizons=(30.0,), rebase_every=64)
+        self._integral = 0.0
+        self.status = PreconditionStatus(0.0, float("nan"), 0.0, 0.0, False, "stopped")
+
+    # ------------------------------------------------------------------
+    def start(self):
+        """Start heating in a background thread and return immediately."""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run, name="preconditioner", daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout=None) -> bool:
+        """Block until ready (True) or until timeout / the controller gave up (False)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.ready.wait(0.5):
+            if self._thread is None or not self._thread.is_alive():
+                return self.ready.is_set()
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return True
+
+    def stop(self):
+        """Stop the controller and the load."""
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+            self._thread = None
+        self.load.stop()
+
+    def close(self):
+        """stop() and release the workload (e.g. the CUDA tensors)."""
+        self.stop()
+        self.load.close()
+
+    # ------------------------------------------------------------------
+    def run(self) -> bool:
+        """Synchronous control loop; returns True once ready (or when stopped while holding)."""
+        self.ready.clear()
+        self._history.clear()
+        self._integral = 0.0
+        # 先 start 再設 duty：SimLoad.start() 記下的是升溫前的負載，stop() 才能還原
+        self.load.start()
+        self.load.set_duty(1.0)
+        t_start = self.clock()
+        stable_since = saturated_since = None
+        next_report = 0.0
+        while not self._stop_event.is_set():
+            now = self.clock()
+            elapsed = now - t_start
+            temp = float(self.read_temp())
+            self._history.append((now, temp))
+            slope = float(self._trend.update()[0][0])
+
+            duty = self._control(temp, slope)
+            self.load.set_duty(duty)
+
+            error = temp - self.target_temp
+            flat = abs(slope) <= self.max_slope
+            if abs(error) <= self.tolerance and flat:
+                stable_since = now if stable_since is None else stable_since
+                if now - stable_since >= self.stable_secs:
+                    self.ready.set()
+            else:
+                stable_since = None
+            if duty >= 1.0 and error < -self.tolerance and flat:
+                saturated_since = now if saturated_since is None else saturated_since
+            else:
+                saturated_since = None
+
+            if self.ready.is_set():
+                state = "holding" if self.hold else "ready"
+            elif saturated_since is not None and now - saturated_since >= 3.0 * self.stable_secs:
+                state = "saturated"
+            elif elapsed >= self.max_secs:
+                state = "timeout"
+            else:
+                state = "settling" if abs(error) <= 3.0 * self.tolerance else "heating"
+            self.status = PreconditionStatus(elapsed, temp, slope, duty, self.ready.is_set(), state)
+
+            done = state in ("ready", "saturated", "timeout")
+            if self.verbose and (elapsed >= next_report or done):
+                print(f"[precondition] {state}: target {self.target_temp:.1f}, temp {temp:.1f}, "
+                      f"slope {slope:+.3f}/s, duty {duty:.2f}, {elapsed:.0f}s")
+                next_report = elapsed + 30.0
+            if done:
+                break
+            self.sleep(self.sample_secs)
+
+        if self._stop_event.is_set():
+            self.status = self.status._replace(state="stopped")
+        if not self.hold or not self.ready.is_set():
+            self.load.stop()
+        return self.ready.is_set()
+
+    def _control(self, temp, slope) -> float:
+        # PI on the predicted temperature (lead compensation for the thermal lag)
+        error = self.target_temp - (temp + slope * self.lead_secs)
+        duty = self._integral + self.kp * error
+        # anti-windup: 只在未飽和 (或誤差把輸出拉回範圍內) 時積分
+        if 0.0 < duty < 1.0 or (duty >= 1.0 and error < 0.0) or (duty <= 0.0 and error > 0.0):
+            self._integral = float(np.clip(self._integral + self.ki * error * self.sample_secs, 0.0, 1.0))
+        return float(np.clip(duty, 0.0, 1.0))
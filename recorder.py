@@ -0,0 +1,344 @@
+"""
+recorder.py
+實機軌跡記錄 / 離線重播。
+
+ - TrajectoryRecorder : gym.Wrapper，把每一筆 transition (原始遙測、obs、action、
+                        PL 目標、reward、時間戳) 串流寫入 append-only 二進位檔
+ - load_trace         : 以 np.memmap 開啟 (零複製、可在寫入中讀取)
+ - ReplayGPUEnv       : 以 CPU 全速重播軌跡，用來測試新的 reward / observation
+
+檔案格式: 4096 bytes header ("GPUTRAJ1" + JSON metadata，含 numpy dtype)，
+之後為固定長度的 structured record，最後一筆不完整的 record (例如當機) 會被忽略。
+"""
+import json
+import os
+import time
+
+import gymnasium as gym
+import numpy as np
+
+from env import GPUEnv, telemetry_row
+from monitor import GPUInfoMonitor
+from telemetry import GPUSample, TelemetryBackend
+
+MAGIC = b"GPUTRAJ1"
+HEADER_SIZE = 4096
+
+EVENT_RESET = 0
+EVENT_STEP = 1
+
+# 原始遙測欄位 (與 GPUSample 相同順序)
+TELEMETRY_FIELDS = GPUSample._fields
+
+
+def make_record_dtype(n_gpus, obs_shape, act_shape) -> np.dtype:
+    fields = [
+        ("event", "u1"),
+        ("episode", "<i4"),
+        ("step", "<i8"),
+        ("time", "<f8"),          # 遙測取樣時間 (monitor clock)
+        ("wall_time", "<f8"),
+    ]
+    fields += [(name, "<f4", (n_gpus,)) for name in TELEMETRY_FIELDS]
+    fields += [
+        ("obs", "<f4", tuple(obs_shape)),
+        ("action", "<f4", tuple(act_shape)),
+        ("pl_target", "<f4", (n_gpus,)),
+        ("reward", "<f4"),
+        ("terminated", "?"),
+        ("truncated", "?"),
+    ]
+    return np.dtype(fields)
+
+
+class TrajectoryWriter:
+    """Append-only writer with an in-memory batch of flush_every records."""
+
+    def __init__(self, path, n_gpus, obs_shape, act_shape, metadata=None, flush_every=64):
+        self.path = path
+        self.dtype = make_record_dtype(n_gpus, obs_shape, act_shape)
+        meta = dict(metadata or {})
+        meta.update({
+            "n_gpus": n_gpus,
+            "obs_shape": list(obs_shape),
+            "act_shape": list(act_shape),
+            "dtype": self.dtype.descr,
+        })
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            old_meta = read_header(path)
+            if old_meta["dtype"] != json.loads(json.dumps(self.dtype.descr)):
+                raise ValueError(f"{path}: existing trace has a different record layout")
+            self._truncate_partial(path)
+            self._file = open(path, "ab")
+        else:
+            self._file = open(path, "wb")
+            header = MAGIC + json.dumps(meta).encode()
+            if len(header) > HEADER_SIZE:
+                raise ValueError("trace metadata too large")
+            self._file.write(header.ljust(HEADER_SIZE, b"\0"))
+        self._buf = np.zeros(flush_every, dtype=self.dtype)
+        self._n = 0
+
+    def _truncate_partial(self, path):
+        # 上次異常結束留下的不完整 record 要切掉，否則之後的對齊會錯
+        body = os.path.getsize(path) - HEADER_SIZE
+        extra = body % self.dtype.itemsize
+        if extra:
+            with open(path, "r+b") as f:
+                f.truncate(HEADER_SIZE + body - extra)
+
+    def next_record(self):
+        """Slot for the next record (a numpy void to fill in place)."""
+        if self._n == len(self._buf):
+            self.flush()
+        rec = self._buf[self._n]
+        self._n += 1
+        return rec
+
+    def flush(self):
+        if self._n:
+            self._file.write(self._buf[:self._n].tobytes())
+            self._file.flush()
+            self._n = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def read_header(path) -> dict:
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if not header.startswith(MAGIC):
+        raise ValueError(f"{path}: not a GPU trajectory file")
+    return json.loads(header[len(MAGIC):].rstrip(b"\0").decode())
+
+
+def load_trace(path):
+    """
+    Memory-map a trajectory file.
+    Returns:
+        (records, metadata): records is a read-only np.memmap of structured records
+    """
+    meta = read_header(path)
+    dtype = np.dtype([tuple(f) if len(f) == 2 else (f[0], f[1], tuple(f[2])) for f in meta["dtype"]])
+    count = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=dtype), meta
+    records = np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(count,))
+    return records, meta
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """
+    Records every reset / step of a GPUEnv (or SimGPUEnv) to `path`.
+    Args:
+        flush_every: records buffered in memory before one write
+    """
+
+    def __init__(self, env, path, flush_every=64, metadata=None):
+        super().__init__(env)
+        base = env.unwrapped
+        self.n_gpus = len(base.gpu_ids)
+        meta = {"step_time": base.step_time, "gpu_ids": base.gpu_ids,
+                "trend_features": base.trend_features, "multi_gpu": base.multi_gpu,
+                "history_len": getattr(base, "history_len", None),
+                "history_features": getattr(base, "history_features", None)}
+        meta.update(metadata or {})
+        self.writer = TrajectoryWriter(
+            path, self.n_gpus,
+            env.observation_space.shape, env.action_space.shape,
+            metadata=meta, flush_every=flush_every
+        )
+        self.episode = -1
+        self.steps = 0
+
+    def reset(self, **kwargs):
+        obs, info = self.env.reset(**kwargs)
+        self.episode += 1
+        self._record(EVENT_RESET, obs, None, 0.0, False, False)
+        return obs, info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        self.steps += 1
+        self._record(EVENT_STEP, obs, action, reward, terminated, truncated)
+        return obs, reward, terminated, truncated, info
+
+    def _record(self, event, obs, action, reward, terminated, truncated):
+        base = self.env.unwrapped
+        monitor = base.monitor
+        rec = self.writer.next_record()
+        rec["event"] = event
+        rec["episode"] = self.episode
+        rec["step"] = self.steps
+        latest = monitor.history.latest()
+        rec["time"] = latest[0] if latest is not None else monitor.clock()
+        rec["wall_time"] = time.time()
+        current = monitor.current
+        for k, name in enumerate(TELEMETRY_FIELDS):
+            rec[name] = current[:, k]
+        rec["obs"] = obs
+        rec["action"] = 0.0 if action is None else np.asarray(action, dtype=np.float32).reshape(rec["action"].shape)
+        rec["pl_target"] = np.atleast_1d(base.pl_old)
+        rec["reward"] = reward
+        rec["terminated"] = terminated
+        rec["truncated"] = truncated
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+        super().close()
+
+
+class TraceBackend(TelemetryBackend):
+    """Telemetry backend returning the raw telemetry of the replay cursor."""
+    name = "trace"
+
+    def __init__(self, records, gpu_ids):
+        super().__init__(gpu_ids[0], gpu_ids)
+        self.records = records
+        self.cursor = 0
+
+    def read_all(self):
+        rec = self.records[self.cursor]
+        cols = [rec[name].tolist() for name in TELEMETRY_FIELDS]
+        return [GPUSample(*(col[k] for col in cols)) for k in range(len(self.gpu_ids))]
+
+
+class ReplayGPUEnv(GPUEnv):
+    """
+    Replays a recorded trajectory at full CPU speed.
+
+    Telemetry always follows the recording, i.e. the actions that were taken
+    on the hardware. By default rewards are recomputed with the env's current
+    reward_fn using the recorded PL targets, so reward variants can be
+    re-scored exactly; follow_recorded_actions=False uses the agent's action
+    for pl_new instead (counterfactual on the PL term only).
+    Args:
+        rebuild_obs: rebuild observations from raw telemetry with the current
+                     monitor / feature code instead of returning recorded obs
+        loop: wrap around to the first episode at the end of the trace
+    """
+
+    def __init__(self, path, rebuild_obs=False, follow_recorded_actions=True, loop=True,
+                 trend_features=None):
+        self.records, self.meta = load_trace(path)
+        if len(self.records) == 0:
+            raise ValueError(f"{path}: empty trace")
+        self.rebuild_obs = rebuild_obs
+        self.follow_recorded_actions = follow_recorded_actions
+        self.loop = loop
+        self.cursor = -1
+        gpu_ids = list(range(self.meta["n_gpus"]))
+        self.backend = TraceBackend(self.records, gpu_ids)
+        monitor = GPUInfoMonitor(
+            gpu_ids=gpu_ids, backend=self.backend,
+            clock=lambda: float(self.records[self.backend.cursor]["time"])
+        )
+        if trend_features is None:
+            trend_features = self.meta.get("trend_features", False)
+        # obs_shape 不能用來判斷 (單卡 history 觀測也是 2 維)；舊的 trace 沒有 multi_gpu
+        multi = self.meta.get("multi_gpu", self.meta["n_gpus"] > 1)
+        super().__init__(
+            step_time=self.meta.get("step_time", 2.0),
+            trend_features=trend_features,
+            monitor=monitor,
+            gpu_ids=gpu_ids if multi else None,
+            history_len=self.meta.get("history_len"),
+            history_features=self.meta.get("history_features")
+        )
+        # GPUEnv.__init__ 已經 reset 過一次；第一次 reset() 仍從第一個回合開始
+        self.cursor = -1
+
+    def set_power_limits(self, pl_values):
+        pass
+
+    def set_fan_speed(self, fan_speed: float):
+        pass
+
+    def _wait(self, seconds: float):
+        pass
+
+    def _goto(self, index):
+        self.cursor = index
+        self.backend.cursor = index
+        self.monitor.update_info()
+
+    def _observation(self, repeat=1):
+        if self.multi_gpu:
+            self._obs_dicts = self.monitor.get_observations()
+            obs = self._build_obs_multi(self._obs_dicts)
+        else:
+            self._obs_dicts = [self.monitor.get_observation()]
+            obs = self._build_obs(self._obs_dicts[0])
+        if not self.rebuild_obs:
+            return np.array(self.records[self.cursor]["obs"], dtype=np.float32)
+        if self._obs_history is not None:
+            obs = np.array(self._push_history(obs, repeat=repeat))
+        return obs
+
+    def reset(self, *, seed=None, options=None):
+        gym.Env.reset(self, seed=seed)
+        events = self.records["event"]
+        nxt = self.cursor + 1
+        while nxt < len(self.records) and events[nxt] != EVENT_RESET:
+            nxt += 1
+        if nxt >= len(self.records):
+            if not self.loop and self.cursor >= 0:
+                raise EOFError("end of trace")
+            nxt = 0
+        self.monitor.clear_history()
+        self._goto(nxt)
+        self.pl_old = self._recorded_pl(nxt)
+        if self._obs_history is not None:
+            self._obs_history.clear()
+        return self._observation(repeat=self.history_len or 1), {"trace_index": nxt}
+
+    def _recorded_pl(self, index):
+        pl = np.array(self.records[index]["pl_target"], dtype=np.float64)
+        return pl if self.multi_gpu else float(pl[0])
+
+    def step(self, action):
+        nxt = self.cursor + 1
+        if nxt >= len(self.records) or self.records["event"][nxt] != EVENT_STEP:
+            raise RuntimeError("episode finished, call reset()")
+        self._goto(nxt)
+        rec = self.records[nxt]
+
+        if self.follow_recorded_actions:
+            pl_new = self._recorded_pl(nxt)
+        else:
+            delta = np.asarray(action, dtype=np.float64).reshape(-1)
+            pl_new = np.clip(self.pl_old + (delta if self.multi_gpu else delta[0]), 100.0, 275.0)
+
+        obs = self._observation()
+        if self.multi_gpu:
+            temps = rec["temp"]
+            rewards = [
+                float(self.reward_fn(temp=float(t), pl_old=float(o), pl_new=float(n)))
+                for t, o, n in zip(temps, self.pl_old, pl_new)
+            ]
+            reward = float(np.mean(rewards))
+        else:
+            rewards = None
+            reward = self.reward_fn(temp=float(rec["temp"][0]), pl_old=self.pl_old, pl_new=float(pl_new))
+        self.pl_old = pl_new
+
+        # 下一筆不是 step (新回合或檔尾) => 以 truncated 結束本回合
+        last = nxt + 1 >= len(self.records) or self.records["event"][nxt + 1] != EVENT_STEP
+        terminated = bool(rec["terminated"])
+        truncated = bool(rec["truncated"]) or bool(last and not terminated)
+        telemetry = np.array([telemetry_row(d) for d in self._obs_dicts])
+        info = {
+            "telemetry": telemetry if self.multi_gpu else telemetry[0],
+            "trace_index": nxt,
+            "recorded_action": np.array(rec["action"]),
+            "recorded_reward": float(rec["reward"]),
+        }
+        if rewards is not None:
+            info["rewards"] = rewards
+        return obs, reward, terminated, truncated, info
@@ -0,0 +1,188 @@
+"""
+rescore.py
+用已登錄的獎勵變體 (reward.REWARD_VARIANTS) 重新計算過去的訓練紀錄。
+
+ - 輸入: GPUControlCallback 的 training_log.csv / .npyc，或 recorder.py 的軌跡檔 (.bin)
+ - 每個變體一次向量化計算整份紀錄
+ - 重新評分用的是紀錄中的狀態 (溫度、PL)，不是反事實模擬
+
+用法:
+    python rescore.py training_log.csv
+    python rescore.py fast/training_log.csv --variants default fast --out rescored.npz
+    python rescore.py trace.bin --import my_rewards   # my_rewards.py 內呼叫 register_reward(...)
+"""
+import argparse
+import importlib
+import time
+
+import numpy as np
+
+from log_sink import CHUNK_EXT, load_chunks
+from reward import REWARD_VARIANTS, get_reward
+
+CSV_COLUMNS = ("timestep", "temp", "power_limit", "reward", "slope_3s", "power_draw", "eta", "fan", "util")
+
+
+def load_log(path):
+    """
+    Load a training_log.csv (or a .npyc GPUControlCallback log) into columns.
+    Repeated header lines (one per appended run) and timestep resets start a new run.
+    Returns:
+        dict of float64 arrays (CSV_COLUMNS) plus "run" (int64 run index per row)
+    """
+    if path.endswith(CHUNK_EXT):
+        data = load_chunks(path)
+        cols = {name: np.asarray(data[name]) for name in data.dtype.names}
+        new_run = np.ones(len(data), dtype=bool)
+        new_run[1:] = _timestep_reset(cols)
+        cols["run"] = np.cumsum(new_run) - 1
+        return cols
+
+    rows, starts = [], []
+    columns = CSV_COLUMNS
+    with open(path) as f:
+        for line in f:
+            if line.startswith("timestep"):
+                # header 之後的第一筆資料是新的 run
+                starts.append(len(rows))
+                columns = tuple(line.strip().split(","))
+            elif line.strip():
+                rows.append(line)
+    if not rows:
+        raise ValueError(f"{path}: no data rows")
+    data = np.loadtxt(rows, delimiter=",", dtype=np.float64, ndmin=2)
+    cols = {name: data[:, k] for k, name in enumerate(columns[:data.shape[1]])}
+
+    new_run = np.zeros(len(rows), dtype=bool)
+    new_run[0] = True
+    new_run[[i for i in starts if i < len(rows)]] = True
+    new_run[1:] |= _timestep_reset(cols)
+    cols["run"] = np.cumsum(new_run) - 1
+    return cols
+
+
+def _timestep_reset(cols):
+    # 多 env 的紀錄同一步有多列 (相同 timestep)，只有 timestep 倒退才算新的 run
+    t = cols["timestep"]
+    if "env" in cols:
+        return t[1:] < t[:-1]
+    return t[1:] <= t[:-1]
+
+
+def load_trace_steps(path):
+    """
+    Step records of a recorder.py trace as (temp, pl_old, pl_new, reward, run); shapes (T, n_gpus).
+    """
+    from recorder import EVENT_STEP, load_trace
+    records, _ = load_trace(path)
+    pl = np.asarray(records["pl_target"], dtype=np.float64)
+    steps = np.flatnonzero(records["event"] == EVENT_STEP)
+    # 每一筆 step 的前一筆 (reset 或 step) 就是 pl_old
+    steps = steps[steps > 0]
+    return {
+        "temp": np.asarray(records["temp"][steps], dtype=np.float64),
+        "pl_old": pl[steps - 1],
+        "pl_new": pl[steps],
+        "reward": np.asarray(records["reward"][steps], dtype=np.float64),
+        "run": np.asarray(records["episode"][steps], dtype=np.int64),
+    }
+
+
+def transitions_from_log(cols):
+    """(temp, pl_old, pl_new) from logged columns; pl_old = previous power_limit of the same run (and env)."""
+    pl = cols["power_limit"]
+    group = cols["run"]
+    if "env" in cols:
+        group = group * (int(cols["env"].max()) + 1) + cols["env"].astype(np.int64)
+    order = np.argsort(group, kind="stable")
+    pl_sorted = pl[order]
+    prev = np.empty_like(pl_sorted)
+    prev[1:] = pl_sorted[:-1]
+    first = np.ones(len(pl), dtype=bool)
+    first[1:] = group[order][1:] != group[order][:-1]
+    # 每個 run 的第一步沒有前一個 PL，視為未調整
+    prev[first] = pl_sorted[first]
+    pl_old = np.empty_like(pl)
+    pl_old[order] = prev
+    return cols["temp"], pl_old, pl
+
+
+def load_transitions(path):
+    if path.endswith(".csv") or path.endswith(CHUNK_EXT):
+        cols = load_log(path)
+        temp, pl_old, pl_new = transitions_from_log(cols)
+        return {"temp": temp, "pl_old": pl_old, "pl_new": pl_new,
+                "reward": cols["reward"], "run": cols["run"]}
+    return load_trace_steps(path)
+
+
+def rescore(data, variants):
+    """
+    Score logged transitions under every variant.
+    Returns:
+        {name: rewards (T,)}; multi-GPU traces are averaged per step like GPUEnv
+    """
+    out = {}
+    for name in variants:
+        r = get_reward(name).batch(data["temp"], data["pl_old"], data["pl_new"])
+        r = np.asarray(r, dtype=np.float64)
+        out[name] = r.mean(axis=1) if r.ndim == 2 else r
+    return out
+
+
+def summarize(name, rewards, logged=None):
+    row = {
+        "variant": name,
+        "mean": float(rewards.mean()),
+        "std": float(rewards.std()),
+        "sum": float(rewards.sum()),
+        "min": float(rewards.min()),
+        "max": float(rewards.max()),
+    }
+    if logged is not None and rewards.std() > 0 and logged.std() > 0:
+        row["corr_logged"] = float(np.corrcoef(rewards, logged)[0, 1])
+    else:
+        row["corr_logged"] = float("nan")
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score logged GPU runs under registered reward variants")
+    parser.add_argument("paths", nargs="+", help="training_log.csv or recorder trace files")
+    parser.add_argument("--variants", nargs="*", default=None, help="variant names (default: all)")
+    parser.add_argument("--import", dest="imports", nargs="*", default=[],
+                        help="modules that register extra variants on import")
+    parser.add_argument("--out", default=None, help="save per-step rewards to this .npz")
+    args = parser.parse_args()
+
+    for mod in args.imports:
+        importlib.import_module(mod)
+    variants = args.variants or sorted(REWARD_VARIANTS)
+
+    saved = {}
+    for path in args.paths:
+        t0 = time.perf_counter()
+        data = load_transitions(path)
+        t_load = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        scores = rescore(data, variants)
+        t_score = time.perf_counter() - t0
+        n = len(data["run"])
+        print(f"{path}: {n} steps, {int(data['run'].max()) + 1} runs "
+              f"(load {t_load:.2f}s, score {t_score:.3f}s)")
+        print(f"  {'variant':<16}{'mean':>10}{'std':>10}{'sum':>14}{'min':>10}{'max':>10}{'corr':>8}")
+        for name in variants:
+            s = summarize(name, scores[name], data["reward"])
+            print(f"  {name:<16}{s['mean']:>10.4f}{s['std']:>10.4f}{s['sum']:>14.2f}"
+                  f"{s['min']:>10.3f}{s['max']:>10.3f}{s['corr_logged']:>8.3f}")
+            saved[f"{path}:{name}"] = scores[name]
+        saved[f"{path}:logged"] = data["reward"]
+        saved[f"{path}:run"] = data["run"]
+
+    if args.out:
+        np.savez_compressed(args.out, **saved)
+        print(f"saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
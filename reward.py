@@ -1,3 +1,7 @@
+from typing import Callable, Dict, NamedTuple, Optional
+
+import numpy as np
+
 def compute_reward(
     temp: float,
     pl_old: float,
@@ -74,3 +78,114 @@ def compute_reward(
     reward = norm_pl * temp_factor
     return reward
 
+
+
+def compute_reward_batch(temp, pl_old, pl_new):
+    """
+    compute_reward 的 numpy 向量化版本 (規則完全相同)，一次計算整批。
+    Args:
+        temp, pl_old, pl_new: array-like，形狀相同 (或可 broadcast)
+    Returns:
+        np.ndarray of float64 rewards
+    """
+    temp = np.asarray(temp, dtype=np.float64)
+    pl_old = np.asarray(pl_old, dtype=np.float64)
+    pl_new = np.asarray(pl_new, dtype=np.float64)
+
+    # (B) 溫度 >=75°C: 下調 => scale * 降幅 * early_factor * extra_factor，否則 -0.5
+    drop_amount = pl_old - pl_new
+    early_factor = 1.0 - np.clip((pl_old - 100.0) / 175.0, 0.0, 1.0)
+    extra_factor = np.maximum(1.0 + 0.05 * drop_amount, 1.0)
+    hot = np.where(pl_new < pl_old, 0.5 * drop_amount * early_factor * extra_factor, -0.5)
+
+    # (C) 溫度 <75: norm_pl × temp_factor
+    norm_pl = np.clip((pl_new - 100.0) / 175.0, 0.0, 1.0)
+    temp_factor = np.where(temp <= 70.0, 1.0, (75.0 - temp) / 5.0)
+    cool = norm_pl * temp_factor
+
+    reward = np.where(temp >= 75.0, hot, cool)
+    # (A) 大動作 => 0
+    return np.where(np.abs(pl_new - pl_old) >= 30.0, 0.0, reward)
+
+
+def compute_reward_fast_batch(temp, pl_old, pl_new):
+    """
+    fast/reward.py 的 compute_reward 向量化版本 (三段式: 高溫鼓勵下調、中溫沿用、低溫鼓勵上調)。
+    """
+    temp = np.asarray(temp, dtype=np.float64)
+    pl_old = np.asarray(pl_old, dtype=np.float64)
+    pl_new = np.asarray(pl_new, dtype=np.float64)
+
+    norm_pl_old = np.clip((pl_old - 100.0) / 175.0, 0.0, 1.0)
+    norm_pl_new = np.clip((pl_new - 100.0) / 175.0, 0.0, 1.0)
+
+    # (A) temp >= 75: 下調 => 0.5 * 降幅 * max(1 - norm_pl_old, 0.1) * (1 + 0.3 * 降幅)
+    drop_amount = pl_old - pl_new
+    hot = np.where(
+        pl_new < pl_old,
+        0.5 * drop_amount * np.maximum(1.0 - norm_pl_old, 0.1) * np.maximum(1.0 + 0.3 * drop_amount, 1.0),
+        -1.0
+    )
+    # (B) 70 <= temp < 75: norm_pl_new * temp_factor
+    mid = norm_pl_new * (75.0 - temp) / 5.0
+    # (C) temp < 70: 上調 => 0.5 * 升幅 * max(norm_pl_old, 0.1) * (1 + 0.3 * 升幅)
+    up_amount = pl_new - pl_old
+    cool = np.where(
+        pl_new > pl_old,
+        0.5 * up_amount * np.maximum(norm_pl_old, 0.1) * np.maximum(1.0 + 0.3 * up_amount, 1.0),
+        -1.0
+    )
+    return np.where(temp >= 75.0, hot, np.where(temp >= 70.0, mid, cool))
+
+
+def reward_1(temp, pl_old, pl_new):
+    if temp >= 80:
+        return -100
+    elif temp >= 75:
+        return -5 * (temp - 75)
+    else:
+        return (pl_new - 100) / 175 - (temp / 75)**2
+
+
+def reward_1_batch(temp, pl_old, pl_new):
+    """reward_1 的向量化版本。"""
+    temp = np.asarray(temp, dtype=np.float64)
+    pl_new = np.asarray(pl_new, dtype=np.float64)
+    cool = (pl_new - 100) / 175 - (temp / 75) ** 2
+    return np.where(temp >= 80, -100.0, np.where(temp >= 75, -5 * (temp - 75), cool))
+
+
+# ----------------------------------------------------------------------
+# 獎勵變體註冊表: 名稱 -> (scalar 版本給 GPUEnv.set_reward，batch 版本給重新評分 / VecEnv)
+# ----------------------------------------------------------------------
+class RewardVariant(NamedTuple):
+    scalar: Optional[Callable]
+    batch: Callable
+
+
+REWARD_VARIANTS: Dict[str, RewardVariant] = {}
+
+
+def register_reward(name: str, batch_fn: Callable, scalar_fn: Optional[Callable] = None):
+    """
+    Register a reward variant.
+    Args:
+        batch_fn: batch_fn(temp, pl_old, pl_new) -> np.ndarray, broadcasting over arrays
+        scalar_fn: optional per-step version with the same rules (for GPUEnv.set_reward)
+    """
+    if name in REWARD_VARIANTS:
+        raise ValueError(f"reward variant {name!r} already registered")
+    REWARD_VARIANTS[name] = RewardVariant(scalar_fn, batch_fn)
+    return batch_fn
+
+
+def get_reward(name: str) -> RewardVariant:
+    try:
+        return REWARD_VARIANTS[name]
+    except KeyError:
+        raise KeyError(f"unknown reward variant {name!r}, available: {sorted(REWARD_VARIANTS)}") from None
+
+
+register_reward("default", compute_reward_batch, compute_reward)
+register_reward("fast", compute_reward_fast_batch)
+register_reward("reward_1", reward_1_batch, reward_1)
@@ -0,0 +1,64 @@
+"""
+ring_buffer.py
+固定大小、預先配置的 numpy 環形緩衝區 (單一寫入者，讀取端不上鎖)。
+"""
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Preallocated ring buffer of fixed-shape rows.
+
+    Each row is stored twice (slot i and i + capacity), so the newest n rows
+    are always one contiguous slice and window(n) is a zero-copy view.
+    Single writer only; readers never block. A view stays valid until the
+    writer wraps around onto it (capacity - n further appends), so readers
+    that keep data for longer should copy it.
+    """
+
+    def __init__(self, capacity: int, row_shape=1, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        if isinstance(row_shape, int):
+            row_shape = (row_shape,)
+        self.capacity = int(capacity)
+        self.row_shape = tuple(row_shape)
+        self._buf = np.zeros((2 * self.capacity,) + self.row_shape, dtype=dtype)
+        # 已寫入總筆數；寫完資料後才遞增，讀取端以此為快照
+        self._count = 0
+
+    def append(self, row):
+        i = self._count % self.capacity
+        self._buf[i] = row
+        self._buf[i + self.capacity] = row
+        self._count += 1
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def count(self) -> int:
+        """Total number of rows ever appended (monotonic until clear())."""
+        return self._count
+
+    def latest(self):
+        c = self._count
+        if c == 0:
+            return None
+        return self._buf[(c - 1) % self.capacity]
+
+    def row(self, index: int):
+        """Row by absolute index (0 .. count-1); only the newest capacity rows are valid."""
+        return self._buf[index % self.capacity]
+
+    def window(self, n=None) -> np.ndarray:
+        """Newest n rows (oldest first) as a view, n defaults to len(self)."""
+        c = self._count
+        size = min(c, self.capacity)
+        if n is None or n > size:
+            n = size
+        start = (c - n) % self.capacity
+        return self._buf[start:start + n]
+
+    def clear(self):
+        self._count = 0
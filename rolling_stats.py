@@ -0,0 +1,168 @@
+"""
+rolling_stats.py
+固定記憶體的滑動視窗統計 (建立在 RingBuffer 上)。
+
+每次 append 為 O(1) (攤銷)：
+ - mean      : 累加和，移出視窗的舊值直接扣掉 (定期以視窗重算避免誤差累積)
+ - min / max : 單調佇列 (monotonic deque)
+ - 百分位    : 固定分箱的直方圖 sketch，查詢為 O(bins)，誤差 <= 半個 bin 寬
+ - 門檻比例  : 例如 temp >= 75°C 的步數
+"""
+from collections import deque
+
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+
+class RollingStats:
+    """
+    Sliding-window aggregates over the newest `window` rows.
+    Args:
+        columns: column names, every appended row has one value per column
+        sketch_ranges: {column: (lo, hi, bins)} histogram sketches for percentile()
+        thresholds: {name: (column, value)} counts rows with column >= value
+        rebase_every: recompute the running sums from the window every N appends
+    """
+
+    def __init__(self, columns, window=1024, sketch_ranges=None, thresholds=None, rebase_every=4096):
+        self.columns = tuple(columns)
+        self._col = {c: k for k, c in enumerate(self.columns)}
+        self.buffer = RingBuffer(window, len(self.columns))
+        self.rebase_every = rebase_every
+
+        self._sums = np.zeros(len(self.columns))
+        self._min_q = [deque() for _ in self.columns]   # (index, value)，值遞增
+        self._max_q = [deque() for _ in self.columns]   # (index, value)，值遞減
+
+        self._sketches = {}
+        for name, (lo, hi, bins) in (sketch_ranges or {}).items():
+            self._sketches[name] = (self._col[name], float(lo), float(hi), np.zeros(int(bins), dtype=np.int64))
+        self._thresholds = {}
+        for name, (column, value) in (thresholds or {}).items():
+            self._thresholds[name] = [self._col[column], float(value), 0]
+
+    def __len__(self):
+        return len(self.buffer)
+
+    @property
+    def count(self) -> int:
+        return self.buffer.count
+
+    # ------------------------------------------------------------------
+    def append(self, row):
+        row = np.asarray(row, dtype=np.float64)
+        buf = self.buffer
+        idx = buf.count
+        if idx >= buf.capacity:
+            # 移出視窗的那一列 (append 之後就會被覆寫)
+            old = buf.row(idx - buf.capacity)
+            self._sums -= old
+            for col, lo, hi, counts in self._sketches.values():
+                counts[self._bin(old[col], lo, hi, len(counts))] -= 1
+            for th in self._thresholds.values():
+                if old[th[0]] >= th[1]:
+                    th[2] -= 1
+        buf.append(row)
+        self._sums += row
+
+        oldest = idx - buf.capacity + 1
+        values = row.tolist()
+        for k, v in enumerate(values):
+            q = self._min_q[k]
+            while q and q[-1][1] >= v:
+                q.pop()
+            q.append((idx, v))
+            if q[0][0] < oldest:
+                q.popleft()
+            q = self._max_q[k]
+            while q and q[-1][1] <= v:
+                q.pop()
+            q.append((idx, v))
+            if q[0][0] < oldest:
+                q.popleft()
+
+        for col, lo, hi, counts in self._sketches.values():
+            counts[self._bin(values[col], lo, hi, len(counts))] += 1
+        for th in self._thresholds.values():
+            if values[th[0]] >= th[1]:
+                th[2] += 1
+
+        if (idx + 1) % self.rebase_every == 0:
+            self._sums = self.buffer.window().sum(axis=0)
+
+    @staticmethod
+    def _bin(value, lo, hi, bins):
+        b = int((value - lo) / (hi - lo) * bins)
+        return min(max(b, 0), bins - 1)
+
+    # ------------------------------------------------------------------
+    def mean(self, column=None):
+        n = len(self.buffer)
+        if n == 0:
+            return 0.0 if column is not None else np.zeros(len(self.columns))
+        means = self._sums / n
+        return float(means[self._col[column]]) if column is not None else means
+
+    def min(self, column):
+        q = self._min_q[self._col[column]]
+        return q[0][1] if q else 0.0
+
+    def max(self, column):
+        q = self._max_q[self._col[column]]
+        return q[0][1] if q else 0.0
+
+    def percentile(self, column, q):
+        """Approximate q-th percentile (0..100) from the column's histogram sketch."""
+        col, lo, hi, counts = self._sketches[column]
+        n = len(self.buffer)
+        if n == 0:
+            return 0.0
+        target = q / 100.0 * n
+        b = int(np.searchsorted(np.cumsum(counts), max(target, 1), side="left"))
+        width = (hi - lo) / len(counts)
+        return lo + (min(b, len(counts) - 1) + 0.5) * width
+
+    def fraction(self, name):
+        """Fraction of rows in the window at or above the named threshold."""
+        n = len(self.buffer)
+        return self._thresholds[name][2] / n if n else 0.0
+
+    def summary(self) -> dict:
+        """
+        All aggregates as a flat {name: float} dict, e.g. "temp_mean", "temp_p95" and
+        "<threshold>_frac" ("temp_above_75_frac" for GPUControlCallback's threshold).
+        """
+        out = {"window": len(self.buffer)}
+        means = self.mean()
+        for k, c in enumerate(self.columns):
+            out[f"{c}_mean"] = float(means[k])
+            out[f"{c}_min"] = self.min(c)
+            out[f"{c}_max"] = self.max(c)
+        for c in self._sketches:
+            for q in (50, 95, 99):
+                out[f"{c}_p{q}"] = self.percentile(c, q)
+        for name in self._thresholds:
+            out[f"{name}_frac"] = self.fraction(name)
+        return out
+
+    def state_dict(self) -> dict:
+        """Rows currently in the window (enough to rebuild every aggregate)."""
+        return {"columns": self.columns, "rows": self.buffer.window().copy()}
+
+    def load_state_dict(self, state):
+        if tuple(state["columns"]) != self.columns:
+            raise ValueError(f"columns {state['columns']} do not match {self.columns}")
+        self.clear()
+        for row in state["rows"]:
+            self.append(row)
+
+    def clear(self):
+        self.buffer.clear()
+        self._sums[:] = 0.0
+        for q in self._min_q + self._max_q:
+            q.clear()
+        for _, _, _, counts in self._sketches.values():
+            counts[:] = 0
+        for th in self._thresholds.values():
+            th[2] = 0
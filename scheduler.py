@@ -0,0 +1,103 @@
+"""
+scheduler.py
+固定控制週期的 step 排程器 (deadline-based，monotonic clock)。
+
+原本 step = 致動 + sleep(step_time) + 讀取，實際週期 = step_time + 子行程 + 策略時間，
+會隨負載飄移。這裡改成每一步等到下一個 deadline (前一個 deadline + period)，
+週期內的工作 (策略、致動、讀取) 與等待重疊，並記錄每一步的 jitter / overrun。
+"""
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+
+class StepTiming(NamedTuple):
+    period: float      # 實際週期 (本次喚醒 - 上次喚醒)
+    busy: float        # 上次喚醒到本次呼叫 wait() 的工作時間
+    jitter: float      # 喚醒時間 - deadline (>= 0 代表晚醒)
+    overrun: bool      # 呼叫 wait() 時已超過 deadline
+    missed: int        # 因 overrun 跳過的週期數
+
+
+class StepScheduler:
+    """
+    Keeps a fixed control period on a monotonic clock.
+    Args:
+        period: control period in seconds
+        clock / sleep: injectable for simulated time
+        history: number of StepTiming records kept for summary()
+    """
+
+    def __init__(self, period: float, clock=time.monotonic, sleep=time.sleep, history=1024):
+        self.period = float(period)
+        self.clock = clock
+        self.sleep = sleep
+        self._deadline = None
+        self._last_wake = None
+        # (period, busy, jitter, overrun, missed)
+        self.history = RingBuffer(history, len(StepTiming._fields))
+        self.last = StepTiming(0.0, 0.0, 0.0, False, 0)
+        self.overruns = 0
+
+    def start(self):
+        """(Re)start the schedule: the first deadline is one period from now."""
+        now = self.clock()
+        self._last_wake = now
+        self._deadline = now + self.period
+
+    def wait(self) -> StepTiming:
+        """Sleep until the next deadline and advance it by one period."""
+        if self._deadline is None:
+            self.start()
+        now = self.clock()
+        busy = now - self._last_wake
+        remaining = self._deadline - now
+        missed = 0
+        overrun = remaining < 0.0
+        if self.period <= 0.0:
+            # period=0: 不等待 (benchmark 量測純控制迴圈開銷)
+            overrun = False
+            self._deadline = now
+        elif overrun:
+            # 已經遲到：不追趕已錯過的週期，對齊到下一個相位 (保持原本的節拍)
+            missed = int(-remaining // self.period)
+            self._deadline += missed * self.period
+            self.overruns += 1
+        else:
+            self.sleep(remaining)
+
+        wake = self.clock()
+        timing = StepTiming(
+            period=wake - self._last_wake,
+            busy=busy,
+            jitter=wake - self._deadline,
+            overrun=overrun,
+            missed=missed
+        )
+        self._deadline += self.period
+        self._last_wake = wake
+        self.last = timing
+        self.history.append(timing)
+        return timing
+
+    def summary(self) -> dict:
+        """Jitter / period / overrun statistics over the kept history."""
+        rows = self.history.window()
+        if len(rows) == 0:
+            return {}
+        period, busy, jitter = rows[:, 0], rows[:, 1], rows[:, 2]
+        return {
+            "steps": len(rows),
+            "period_mean": float(period.mean()),
+            "period_std": float(period.std()),
+            "busy_mean": float(busy.mean()),
+            "busy_max": float(busy.max()),
+            "jitter_mean": float(jitter.mean()),
+            "jitter_p99": float(np.percentile(jitter, 99)),
+            "jitter_max": float(jitter.max()),
+            "overrun_ratio": float(rows[:, 3].mean()),
+            "missed_periods": int(rows[:, 4].sum()),
+        }
@@ -0,0 +1,246 @@
+"""
+sim_env.py
+模擬 GPU 散熱/功耗的環境 (SimGPUEnv)，不需要實體顯卡即可訓練 / 除錯策略。
+
+ - ThermalModel : N 張 GPU 的一階熱模型 (numpy 批次運算)
+     功耗: P_target = min(P_idle + util * (P_max - P_idle) * (1 + leakage), PL)，一階延遲 power_tau
+     溫度: C dT/dt = P - (T - T_amb) / R(fan)，R 隨風扇轉速線性下降
+ - SimBackend   : 把 ThermalModel 包成 telemetry backend，給 GPUInfoMonitor 讀
+ - SimGPUEnv    : 與 GPUEnv 相同的 action/observation space 與 reward hook，時間為模擬時間
+"""
+from typing import List
+
+import numpy as np
+
+from env import GPUEnv
+from monitor import GPUInfoMonitor
+from telemetry import GPUSample, TelemetryBackend
+
+
+class ThermalModel:
+    """
+    Batched thermal / power model of n GPUs, all state in numpy arrays.
+    Default constants roughly match the card used for training:
+    ~65°C steady state at fan 100% / 255 W, ~40 s thermal time constant.
+    Args:
+        n: number of simulated GPUs
+        seed: RNG seed (initial state, parameter jitter, sensor noise)
+        jitter: relative per-GPU randomisation of R / C / P_max on reset
+        max_dt: longest sub-step used when advancing (seconds)
+    """
+
+    def __init__(self, n=1, seed=None,
+                 t_ambient=25.0,
+                 r_fan_full=0.157,     # K/W，風扇 100%
+                 r_fan_off=0.257,      # K/W，風扇 0%
+                 heat_capacity=255.0,  # J/K
+                 p_idle=30.0,
+                 p_max=300.0,
+                 power_tau=0.5,
+                 leakage=0.003,        # 每 °C (相對 60°C) 增加的功耗比例
+                 temp_noise=0.0,
+                 power_noise=2.0,
+                 init_temp=(40.0, 65.0),
+                 init_util=100.0,
+                 init_fan=100.0,
+                 init_power_limit=260.0,
+                 pl_range=(100.0, 275.0),
+                 jitter=0.0,
+                 max_dt=1.0):
+        self.n = n
+        self.t_ambient = t_ambient
+        self.r_fan_full = r_fan_full
+        self.r_fan_off = r_fan_off
+        self.heat_capacity = heat_capacity
+        self.p_idle = p_idle
+        self.p_max = p_max
+        self.power_tau = power_tau
+        self.leakage = leakage
+        self.temp_noise = temp_noise
+        self.power_noise = power_noise
+        self.init_temp = init_temp
+        self.init_util = init_util
+        self.init_fan = init_fan
+        self.init_power_limit = init_power_limit
+        self.pl_range = pl_range
+        self.jitter = jitter
+        self.max_dt = max_dt
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self, seed=None, index=None, keep_inputs=False):
+        """
+        Re-initialise all GPUs (or only those selected by index).
+        Args:
+            keep_inputs: keep the current fan / util / power limit and only
+                         resample the thermal state (and jitter)
+        """
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        inputs = None
+        if keep_inputs:
+            sel = slice(None) if index is None else index
+            inputs = (self.util[sel].copy(), self.fan[sel].copy(), self.power_limit[sel].copy())
+        if index is None:
+            self.time = 0.0
+            self.temp = np.zeros(self.n)
+            self.power_draw = np.zeros(self.n)
+            self.power_limit = np.zeros(self.n)
+            self.fan = np.zeros(self.n)
+            self.util = np.zeros(self.n)
+            self._r_scale = np.ones(self.n)
+            self._c_scale = np.ones(self.n)
+            self._p_scale = np.ones(self.n)
+            index = slice(None)
+        k = np.size(self.temp[index])
+
+        lo, hi = self.init_temp
+        self.temp[index] = self.rng.uniform(lo, hi, size=k)
+        if inputs is None:
+            inputs = (self.init_util, self.init_fan, self.init_power_limit)
+        self.util[index], self.fan[index], self.power_limit[index] = inputs
+        if self.jitter > 0:
+            j = self.jitter
+            self._r_scale[index] = self.rng.uniform(1 - j, 1 + j, size=k)
+            self._c_scale[index] = self.rng.uniform(1 - j, 1 + j, size=k)
+            self._p_scale[index] = self.rng.uniform(1 - j, 1 + j, size=k)
+        self.power_draw[index] = self._power_target()[index]
+
+    def set_power_limit(self, value, index=None):
+        lo, hi = self.pl_range
+        value = np.clip(np.floor(value), lo, hi)  # 與 nvidia-smi 相同取整數瓦
+        self.power_limit[slice(None) if index is None else index] = value
+
+    def set_fan(self, value, index=None):
+        self.fan[slice(None) if index is None else index] = np.clip(value, 0.0, 100.0)
+
+    def set_util(self, value, index=None):
+        self.util[slice(None) if index is None else index] = np.clip(value, 0.0, 100.0)
+
+    def _power_target(self):
+        demand = self.p_idle + self.util / 100.0 * (self.p_max * self._p_scale - self.p_idle)
+        demand = demand * (1.0 + self.leakage * (self.temp - 60.0))
+        return np.minimum(demand, self.power_limit)
+
+    def advance(self, seconds: float):
+        """Advance simulated time; inputs are held constant during the call."""
+        remaining = float(seconds)
+        while remaining > 1e-9:
+            dt = min(self.max_dt, remaining)
+            self._substep(dt)
+            remaining -= dt
+        return self.time
+
+    def _substep(self, dt):
+        # 在 dt 內功耗目標固定 (leakage 以起點溫度計算)，一階系統有解析解
+        p_target = self._power_target()
+        p0 = self.power_draw
+        r = (self.r_fan_off - (self.r_fan_off - self.r_fan_full) * self.fan / 100.0) * self._r_scale
+        c = self.heat_capacity * self._c_scale
+        tau = r * c
+        tau_p = self.power_tau
+
+        decay_p = np.exp(-dt / tau_p)
+        decay_t = np.exp(-dt / tau)
+        # dT/dt = -(T - T_amb - R*P_target)/tau + (P0 - P_target) e^{-t/tau_p} / C
+        k = (p0 - p_target) / c / (1.0 / tau - 1.0 / tau_p)
+        t_inf = self.t_ambient + r * p_target
+        self.temp = t_inf + k * decay_p + (self.temp - t_inf - k) * decay_t
+        self.power_draw = p_target + (p0 - p_target) * decay_p
+        self.time += dt
+
+    def observe(self):
+        """
+        Sensor readings of all GPUs (temp quantised to 1°C like nvidia-smi).
+        Returns:
+            tuple of arrays: temp, util, power_draw, power_limit, fan
+        """
+        temp = self.temp
+        if self.temp_noise > 0:
+            temp = temp + self.rng.normal(0.0, self.temp_noise, size=self.n)
+        draw = self.power_draw
+        if self.power_noise > 0:
+            draw = draw + self.rng.normal(0.0, self.power_noise, size=self.n)
+        draw = np.clip(draw, 0.0, self.power_limit * 1.02)
+        return (np.round(temp), np.round(self.util), np.round(draw, 2),
+                self.power_limit.copy(), np.round(self.fan))
+
+
+class SimBackend(TelemetryBackend):
+    """Telemetry backend reading GPUs `gpu_ids` (model indices) of a ThermalModel."""
+    name = "sim"
+
+    def __init__(self, model: ThermalModel, gpu_id=0, gpu_ids=None):
+        super().__init__(gpu_id, gpu_ids)
+        self.model = model
+
+    def read_all(self) -> List[GPUSample]:
+        cols = [col.tolist() for col in self.model.observe()]
+        return [GPUSample(*(col[i] for col in cols)) for i in self.gpu_ids]
+
+
+class SimGPUEnv(GPUEnv):
+    """
+    GPUEnv on top of ThermalModel: same spaces and reward hook, simulated time.
+    Args:
+        sim_sample_hz: if set, record telemetry at this rate during each step
+                       (like GPUEnv(sample_hz=...)); otherwise once per step
+        history_len / history_features: history observations (see GPUEnv)
+        model_kwargs: forwarded to ThermalModel
+    """
+
+    def __init__(self, step_time=2.0, seed=None, trend_features=False,
+                 sim_sample_hz=None, stress_secs=10.0, n_gpus=None, history_len=None,
+                 history_features=None, **model_kwargs):
+        # n_gpus: 多卡模式 (與 GPUEnv(gpu_ids=...) 相同的堆疊 action / observation)
+        gpu_ids = list(range(n_gpus)) if n_gpus is not None else None
+        self.model = ThermalModel(n=n_gpus or 1, seed=seed, **model_kwargs)
+        self.sim_sample_hz = sim_sample_hz
+        self.stress_secs = stress_secs
+        backend = SimBackend(self.model, gpu_ids=gpu_ids)
+        monitor = GPUInfoMonitor(gpu_ids=gpu_ids, backend=backend, clock=lambda: self.model.time)
+        super().__init__(
+            gpu_id=0,
+            step_time=step_time,
+            trend_features=trend_features,
+            monitor=monitor,
+            gpu_ids=gpu_ids,
+            history_len=history_len,
+            history_features=history_features
+        )
+
+    def set_power_limits(self, pl_values):
+        self.model.set_power_limit(np.clip(np.asarray(pl_values, dtype=np.float64), 100.0, 275.0))
+
+    def set_fan_speed(self, fan_speed: float):
+        self.model.set_fan(float(np.clip(fan_speed, 0.0, 100.0)))
+
+    def set_util(self, util: float):
+        self.model.set_util(util)
+
+    def stress_gpu(self):
+        # 對應實機的 100 次大矩陣乘法：滿載 stress_secs 秒 (模擬時間)
+        self.model.set_util(100.0)
+        self._wait(self.stress_secs)
+
+    def _clock(self) -> float:
+        return self.model.time
+
+    def _wait(self, seconds: float):
+        if not self.sim_sample_hz:
+            self.model.advance(seconds)
+            return
+        # 模擬背景取樣：區間內每 1/hz 記錄一筆 (終點由 step 的 update_info 讀取)
+        period = 1.0 / self.sim_sample_hz
+        n = int(seconds / period + 1e-9)
+        for _ in range(n - 1):
+            self.model.advance(period)
+            self.monitor._sample_once()
+        self.model.advance(seconds - period * max(n - 1, 0))
+
+    def reset(self, *, seed=None, options=None):
+        # 與實機相同，reset 不改變散熱狀態 (暖機結果保留)；
+        # 指定 seed 或 options={"randomize": True} 時才重新抽樣初始狀態
+        if seed is not None or (options or {}).get("randomize"):
+            self.model.reset(seed=seed, keep_inputs=True)
+        return super().reset(seed=seed, options=options)
@@ -0,0 +1,213 @@
+"""
+sim_vec_env.py
+SB3 VecEnv：N 張模擬 GPU 的狀態放在連續的 numpy 陣列，一次 step 向量化更新全部，
+獎勵也整批計算 (compute_reward_batch)。可直接餵給 PPO("MlpPolicy", env, ...)。
+"""
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from env import make_spaces
+from reward import compute_reward_batch
+from sim_env import ThermalModel
+
+
+# obs 欄位 [temp, util, slope_3s, pl, draw, eta, fan] -> env.TELEMETRY_KEYS 順序
+_TELEMETRY_COLS = [0, 2, 3, 4, 5, 6, 1]
+
+
+class SimGPUVecEnv(VecEnv):
+    """
+    Vectorized simulator of num_envs GPUs with GPUEnv's spaces and dynamics.
+    Args:
+        num_envs: number of simulated GPUs
+        step_time: simulated seconds per step
+        max_episode_steps: truncate (and auto-reset) episodes after this many steps,
+                           None = never (same as GPUEnv)
+        reward_fn: batched reward, reward_fn(temp, pl_old, pl_new) -> array
+        model_kwargs: forwarded to ThermalModel (e.g. jitter=0.1, init_fan=30.0)
+    """
+    render_mode = None
+
+    def __init__(self, num_envs=64, step_time=2.0, seed=None, max_episode_steps=None,
+                 reward_fn=compute_reward_batch, slope_horizon=3.0, **model_kwargs):
+        action_space, observation_space = make_spaces()
+        self.step_time = step_time
+        self.max_episode_steps = max_episode_steps
+        self.reward_fn = reward_fn
+        self.model = ThermalModel(n=num_envs, seed=seed, **model_kwargs)
+
+        # slope_3s: 最近 m 個步點 (間隔 step_time) 的最小平方斜率，權重預先算好
+        m = int(slope_horizon // step_time) + 1
+        self._slope_len = max(m, 2)
+        j = np.arange(self._slope_len, dtype=np.float64)
+        j -= j.mean()
+        self._slope_w = j / (np.sum(j * j) * step_time)
+        # 溫度歷史 (m, N)，row 0 為最舊；_hist_len 記錄每個 env reset 後累積的點數
+        self._temp_hist = np.zeros((self._slope_len, num_envs))
+        self._hist_len = np.zeros(num_envs, dtype=np.int64)
+
+        self.pl_old = np.full(num_envs, 260.0)
+        # 每個 env 的起始 PL (reset() 時由各自的 options 決定，截斷後的自動 reset 沿用)
+        self._start_pl = np.full(num_envs, 260.0)
+        self.episode_steps = np.zeros(num_envs, dtype=np.int64)
+        self._actions = np.zeros(num_envs)
+        self._obs = np.zeros((num_envs,) + observation_space.shape, dtype=np.float32)
+        super().__init__(num_envs, observation_space, action_space)
+
+    # ------------------------------------------------------------------
+    # VecEnv API
+    # ------------------------------------------------------------------
+    def reset(self):
+        # 與實機相同，reset 不改變散熱狀態 (暖機結果保留)；有指定 seed 時才重新抽樣
+        seed = self._seeds[0]
+        if seed is not None:
+            self.model.reset(seed=seed, keep_inputs=True)
+        # 與 GPUEnv 相同，set_options({"power_limit": W}) 指定起始 PL (每個 env 各自的 options)
+        self._start_pl[:] = [float(options.get("power_limit", 260.0)) for options in self._options]
+        self.pl_old[:] = self._start_pl
+        self.model.set_power_limit(self.pl_old)
+        self.episode_steps[:] = 0
+        self._hist_len[:] = 0
+        self._reset_seeds()
+        self._reset_options()
+        self.reset_infos = [{} for _ in range(self.num_envs)]
+        return self._observe()
+
+    def step_async(self, actions: np.ndarray):
+        self._actions = np.asarray(actions, dtype=np.float64).reshape(self.num_envs)
+
+    def step_wait(self):
+        pl_old = self.pl_old
+        pl_new = np.clip(pl_old + self._actions, 100.0, 275.0)
+
+        self.model.set_power_limit(pl_new)
+        self.model.advance(self.step_time)
+        obs = self._observe()
+
+        rewards = self.reward_fn(obs[:, 0], pl_old, pl_new).astype(np.float32)
+        self.pl_old = pl_new
+        self.episode_steps += 1
+
+        # 與 GPUEnv 相同，遙測放在 info["telemetry"] (截斷 env 為 reset 前的值)
+        telemetry = obs[:, _TELEMETRY_COLS].astype(np.float64)
+        infos: List[dict] = [{"telemetry": row} for row in telemetry]
+        dones = np.zeros(self.num_envs, dtype=bool)
+        if self.max_episode_steps is not None:
+            dones = self.episode_steps >= self.max_episode_steps
+            if dones.any():
+                idx = np.flatnonzero(dones)
+                for i in idx:
+                    infos[i]["terminal_observation"] = obs[i].copy()
+                    infos[i]["TimeLimit.truncated"] = True
+                # 截斷的 env 重新抽樣初始狀態 (增加狀態多樣性)
+                self._reset_envs(idx)
+                obs = self._observe(idx)
+        return obs, rewards, dones, infos
+
+    def _reset_envs(self, idx):
+        # 只重新抽樣熱狀態；風扇 / 負載沿用目前設定 (例如 curriculum 的 fan=30)
+        self.model.reset(index=idx, keep_inputs=True)
+        self.pl_old[idx] = self._start_pl[idx]
+        self.model.set_power_limit(self.pl_old[idx], index=idx)
+        self.episode_steps[idx] = 0
+        self._hist_len[idx] = 0
+
+    def _observe(self, idx=None):
+        """Sample telemetry and build observations (all envs, or only idx)."""
+        temp, util, draw, pl, fan = self.model.observe()
+        obs = self._obs
+        if idx is None:
+            idx = slice(None)
+            # 推進溫度歷史 (所有 env 共用同一個時間軸)
+            self._temp_hist[:-1] = self._temp_hist[1:]
+            self._temp_hist[-1] = temp
+            self._hist_len += 1
+        else:
+            self._temp_hist[:, idx] = temp[idx]
+            self._hist_len[idx] = 1
+
+        slope = self._slope_w @ self._temp_hist
+        slope[self._hist_len < self._slope_len] = 0.0
+        eta = np.where(pl > 1e-6, draw / np.maximum(pl, 1e-6), 0.0)
+        eta = np.minimum(eta, 1.0)
+
+        obs[idx, 0] = temp[idx]
+        obs[idx, 1] = util[idx]
+        obs[idx, 2] = slope[idx]
+        obs[idx, 3] = pl[idx]
+        obs[idx, 4] = draw[idx]
+        obs[idx, 5] = eta[idx]
+        obs[idx, 6] = fan[idx]
+        # PPO 會保留上一個 obs 的參照，必須回傳副本
+        return obs.copy()
+
+    def close(self):
+        pass
+
+    # 與 GPUEnv 同名的屬性 / 方法，每個 env 一個值
+    _PER_ENV_ATTRS = {
+        "current_temp": lambda self: self._obs[:, 0],
+        "current_utilization": lambda self: self._obs[:, 1],
+        "current_slope_3s": lambda self: self._obs[:, 2],
+        "current_power_limit": lambda self: self._obs[:, 3],
+        "current_power_draw": lambda self: self._obs[:, 4],
+        "current_eta": lambda self: self._obs[:, 5],
+        "current_fan": lambda self: self._obs[:, 6],
+    }
+
+    def get_attr(self, attr_name: str, indices=None) -> List[Any]:
+        indices = self._get_indices(indices)
+        if attr_name in self._PER_ENV_ATTRS:
+            values = self._PER_ENV_ATTRS[attr_name](self)
+            return [float(values[i]) for i in indices]
+        if attr_name == "pl_old":
+            return [float(self.pl_old[i]) for i in indices]
+        value = getattr(self, attr_name)
+        return [value for _ in indices]
+
+    def set_attr(self, attr_name: str, value: Any, indices=None) -> None:
+        if attr_name == "pl_old":
+            self.pl_old[self._get_indices(indices)] = value
+            return
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> List[Any]:
+        """Calls set_fan_speed / set_power_limit / set_util / get_temp once per selected env."""
+        method = getattr(self, method_name)
+        return [method(*method_args, index=i, **method_kwargs) for i in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        return [False for _ in self._get_indices(indices)]
+
+    def get_images(self) -> Sequence[Optional[np.ndarray]]:
+        return [None for _ in range(self.num_envs)]
+
+    # ------------------------------------------------------------------
+    # GPUEnv 對應的控制介面 (index=None 代表全部)
+    # ------------------------------------------------------------------
+    def set_fan_speed(self, fan_speed, index=None):
+        self.model.set_fan(fan_speed, index=index)
+
+    def set_power_limit(self, pl_value, index=None):
+        pl_value = np.clip(pl_value, 100.0, 275.0)
+        self.model.set_power_limit(pl_value, index=index)
+        self.pl_old[slice(None) if index is None else index] = pl_value
+
+    def set_util(self, util, index=None):
+        self.model.set_util(util, index=index)
+
+    def get_temp(self, index=None):
+        temp = self.model.observe()[0]
+        return temp if index is None else float(temp[index])
+
+    def warm_up(self, target_temp, stress_secs=10.0, max_secs=3600.0):
+        """Simulated heat-up: full load until every GPU is above target_temp."""
+        self.model.set_util(100.0)
+        elapsed = 0.0
+        while np.any(self.model.temp <= target_temp) and elapsed < max_secs:
+            self.model.advance(stress_secs)
+            elapsed += stress_secs
+        self._hist_len[:] = 0
+        return self._observe()
@@ -0,0 +1,214 @@
+"""
+spans.py
+控制迴圈熱路徑的計時 span (set_power_limit / update_info / _parse_nvidia_smi /
+compute_reward / build_obs)，收進固定記憶體的對數分箱直方圖。
+set_power_limit 只是把目標交給 Actuator (非同步時只有排入佇列)；實際的 driver 寫入 + 回讀
+由 Actuator worker 記成 actuator_write (非同步時會出現在之後某一步的 info["spans"])。
+
+ - 關閉時 (預設) 每個 span 只有 begin() / end() 兩次方法呼叫與一個 bool 判斷 (~0.15 µs)
+ - 開啟後每筆約 1 µs：log2 分箱 (每倍頻 8 格，相對誤差 < 5%)、count / sum / max / 最近一筆
+ - 可在執行中切換 (enable() / disable()，或 GPUEnv.set_instrumentation)
+ - 每步的 span 時間放進 step 的 info["spans"] (秒)；彙總由 exporter 輸出
+   (SB3 logger / TensorBoard、JSON lines，或任何有 export(snapshot) 的物件)
+
+用法:
+    env = GPUEnv(...)
+    env.spans.add_exporter(JsonLinesExporter("spans.jsonl"), every_secs=60)
+    env.spans.enable()
+    ...
+    env.spans.snapshot()   # {"update_info": {"count", "mean", "p50", "p90", "p99", "max", "last"}, ...}
+
+背景執行緒 (取樣器、Actuator worker) 也會記錄 span：直方圖與本步累計都在同一個 lock 內更新，
+pop_step() 在 lock 內換掉本步的 dict，換手時落下的 span 會算到下一步，不會遺失。
+"""
+import json
+import math
+import threading
+import time
+
+SPAN_NAMES = ("set_power_limit", "actuator_write", "update_info", "parse_nvidia_smi", "compute_reward",
+              "build_obs")
+
+# 直方圖範圍：1 µs ~ 2^27 µs (約 134 秒)，每倍頻 BUCKETS_PER_OCTAVE 格
+BUCKETS_PER_OCTAVE = 8
+N_BUCKETS = 27 * BUCKETS_PER_OCTAVE + 1
+
+
+class SpanHistogram:
+    """Log-bucketed latency histogram with O(1) add and fixed memory."""
+    __slots__ = ("count", "total", "max", "last", "counts")
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        for k in range(N_BUCKETS):
+            self.counts[k] = 0
+
+    def add(self, seconds: float):
+        us = seconds * 1e6
+        k = int(math.log2(us) * BUCKETS_PER_OCTAVE) + 1 if us >= 1.0 else 0
+        self.counts[k if k < N_BUCKETS else N_BUCKETS - 1] += 1
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Approximate q-th percentile (0-100) in seconds: geometric centre of the bucket."""
+        if self.count == 0:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for k, c in enumerate(self.counts):
+            seen += c
+            if c and seen >= rank:
+                if k == 0:
+                    return 0.5e-6
+                return min(2.0 ** ((k - 0.5) / BUCKETS_PER_OCTAVE) * 1e-6, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "last": self.last,
+        }
+
+
+class Spans:
+    """
+    Span recorder shared by GPUEnv and its GPUInfoMonitor.
+    Args:
+        enabled: start recording immediately
+        clock: high resolution timer (seconds)
+    """
+
+    def __init__(self, enabled=False, clock=time.perf_counter):
+        self.enabled = enabled
+        self.clock = clock
+        self.histograms = {name: SpanHistogram() for name in SPAN_NAMES}
+        # 本步 (上次 pop_step 之後) 的 span 時間；背景執行緒也會寫，與 histograms 一起由 _lock 保護
+        self._step = {}
+        self._lock = threading.Lock()
+        self._exporters = []     # [exporter, every_secs, last_export]
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def begin(self) -> float:
+        # 關閉時回傳 0.0，end() 就不記錄 (中途開啟的 span 也略過)
+        return self.clock() if self.enabled else 0.0
+
+    def end(self, name: str, t0: float):
+        if t0:
+            dt = self.clock() - t0
+            with self._lock:
+                hist = self.histograms.get(name)
+                if hist is None:
+                    hist = self.histograms[name] = SpanHistogram()
+                hist.add(dt)
+                self._step[name] = self._step.get(name, 0.0) + dt
+
+    def pop_step(self) -> dict:
+        """Span durations (seconds) recorded since the previous call, for info["spans"]."""
+        with self._lock:
+            step, self._step = self._step, {}
+        return step
+
+    def snapshot(self) -> dict:
+        """Summary (seconds) of every span with at least one sample."""
+        with self._lock:
+            return {name: h.summary() for name, h in self.histograms.items() if h.count}
+
+    def reset(self):
+        with self._lock:
+            for h in self.histograms.values():
+                h.reset()
+            self._step = {}
+
+    # ------------------------------------------------------------------
+    def add_exporter(self, exporter, every_secs=None):
+        """
+        Register an exporter (object with export(snapshot)).
+        Args:
+            every_secs: export automatically from maybe_export() at this interval;
+                        None = only on explicit export()
+        """
+        self._exporters.append([exporter, every_secs, self.clock()])
+
+    def remove_exporter(self, exporter):
+        self._exporters = [e for e in self._exporters if e[0] is not exporter]
+
+    def export(self):
+        snapshot = self.snapshot()
+        now = self.clock()
+        for entry in self._exporters:
+            entry[0].export(snapshot)
+            entry[2] = now
+
+    def maybe_export(self):
+        """Run the exporters whose interval elapsed (called once per step by GPUEnv)."""
+        if not self._exporters:
+            return
+        now = self.clock()
+        snapshot = None
+        for entry in self._exporters:
+            exporter, every_secs, last = entry
+            if every_secs is not None and now - last >= every_secs:
+                if snapshot is None:
+                    snapshot = self.snapshot()
+                exporter.export(snapshot)
+                entry[2] = now
+
+    def close(self):
+        for exporter, _, _ in self._exporters:
+            close = getattr(exporter, "close", None)
+            if close is not None:
+                close()
+        self._exporters = []
+
+
+class LoggerExporter:
+    """
+    Records span summaries into an SB3 logger (written on the next logger.dump,
+    e.g. by GPUControlCallback) as <prefix><span>/<stat>_ms.
+    """
+
+    def __init__(self, logger, prefix="timing/", stats=("mean", "p50", "p99", "max")):
+        self.logger = logger
+        self.prefix = prefix
+        self.stats = stats
+
+    def export(self, snapshot):
+        for name, summary in snapshot.items():
+            for stat in self.stats:
+                self.logger.record(f"{self.prefix}{name}/{stat}_ms", summary[stat] * 1e3)
+
+
+class JsonLinesExporter:
+    """Appends one JSON line {"time": ..., "spans": snapshot} per export."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a")
+
+    def export(self, snapshot):
+        self._file.write(json.dumps({"time": time.time(), "spans": snapshot}) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
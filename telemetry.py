@@ -0,0 +1,206 @@
+"""
+telemetry.py
+GPU 遙測後端 (telemetry backend)，供 monitor.py 使用。
+
+ - NVMLBackend      : 行程內透過 NVML 讀取，device handle 常駐 (微秒級)
+ - NvidiaSmiBackend : 原本的 nvidia-smi CLI 解析 (每次 fork 一個行程)，作為後備
+ - FakeBackend      : 決定性的假資料，測試 / 無 GPU 環境使用
+ - SharedMemoryBackend ("shm") : 讀取本機 telemetry daemon 的 shared memory (telemetry_bus.py)
+
+所有後端的 read() 都回傳同一種 GPUSample；多卡時 read_all() 以一次查詢
+回傳 gpu_ids 每張卡的 GPUSample (list)。
+"""
+import subprocess
+from typing import List, NamedTuple, Optional, Sequence
+
+
+class GPUSample(NamedTuple):
+    temp: float
+    gpu_util: float
+    power_draw: float
+    power_limit: float
+    fan_speed: float
+
+
+# 讀取失敗時的回傳值 (與舊版 _parse_nvidia_smi 相同)
+DEFAULT_SAMPLE = GPUSample(0.0, 0.0, 0.0, 150.0, 0.0)
+
+
+class TelemetryBackend:
+    name = "base"
+
+    def __init__(self, gpu_id=0, gpu_ids=None):
+        # gpu_ids: 多卡模式下要讀的所有卡；預設只有 gpu_id
+        self.gpu_ids = list(gpu_ids) if gpu_ids is not None else [gpu_id]
+        self.gpu_id = self.gpu_ids[0]
+
+    def read(self) -> GPUSample:
+        return self.read_all()[0]
+
+    def read_all(self) -> List[GPUSample]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class NvidiaSmiBackend(TelemetryBackend):
+    name = "nvidia-smi"
+
+    def __init__(self, gpu_id=0, gpu_ids=None, timeout=5.0):
+        super().__init__(gpu_id, gpu_ids)
+        self.timeout = timeout
+        # 多卡時一次查詢全部 (--id=0,1,2)，每張卡一行，順序同 --id
+        self.command = [
+            "nvidia-smi",
+            "--query-gpu=temperature.gpu,utilization.gpu,power.draw,power.limit,fan.speed",
+            "--format=csv,noheader,nounits",
+            "--id=" + ",".join(str(i) for i in self.gpu_ids)
+        ]
+
+    def read_all(self) -> List[GPUSample]:
+        n = len(self.gpu_ids)
+        try:
+            output = subprocess.check_output(
+                self.command, universal_newlines=True, timeout=self.timeout
+            )
+        except Exception as e:
+            print(f"[WARN] Could not parse nvidia-smi: {e}")
+            return [DEFAULT_SAMPLE] * n
+        lines = [line for line in output.strip().splitlines() if line.strip()]
+        if len(lines) != n:
+            print(f"[WARN] nvidia-smi 回傳 {len(lines)} 行，預期 {n} 行")
+            lines = (lines + [""] * n)[:n]
+        return [parse_smi_line(line.strip()) for line in lines]
+
+
+def parse_smi_line(line: str) -> GPUSample:
+    parts = [x.strip() for x in line.split(",")]
+    if len(parts) < 5:
+        print(f"[WARN] nvidia-smi 回傳格式不足: {line}")
+        return DEFAULT_SAMPLE
+
+    try:
+        values = [_smi_float(p) for p in parts[:5]]
+    except ValueError as ve:
+        print(f"[WARN] 解析 nvidia-smi 輸出失敗: {ve}")
+        return DEFAULT_SAMPLE
+    return GPUSample(*values)
+
+
+def _smi_float(text: str) -> float:
+    # 部分顯卡 (例如被動散熱) fan.speed 會回傳 "[N/A]"
+    if text.startswith("[") or text in ("N/A", ""):
+        return 0.0
+    return float(text)
+
+
+class NVMLBackend(TelemetryBackend):
+    name = "nvml"
+
+    def __init__(self, gpu_id=0, gpu_ids=None):
+        super().__init__(gpu_id, gpu_ids)
+        import pynvml  # optional dependency: nvidia-ml-py
+        self._nvml = pynvml
+        pynvml.nvmlInit()
+        self._handles = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in self.gpu_ids]
+        self._has_fan = [True] * len(self._handles)
+
+    def read_all(self) -> List[GPUSample]:
+        return [self._read_device(k) for k in range(len(self._handles))]
+
+    def _read_device(self, k) -> GPUSample:
+        nvml = self._nvml
+        h = self._handles[k]
+        try:
+            temp = float(nvml.nvmlDeviceGetTemperature(h, nvml.NVML_TEMPERATURE_GPU))
+            gpu_util = float(nvml.nvmlDeviceGetUtilizationRates(h).gpu)
+            # NVML 單位為 mW
+            power_draw = nvml.nvmlDeviceGetPowerUsage(h) / 1000.0
+            power_limit = nvml.nvmlDeviceGetEnforcedPowerLimit(h) / 1000.0
+        except nvml.NVMLError as e:
+            print(f"[WARN] NVML read failed: {e}")
+            return DEFAULT_SAMPLE
+
+        fan_speed = 0.0
+        if self._has_fan[k]:
+            try:
+                fan_speed = float(nvml.nvmlDeviceGetFanSpeed(h))
+            except nvml.NVMLError:
+                # 無風扇或不支援 => 之後不再嘗試
+                self._has_fan[k] = False
+        return GPUSample(temp, gpu_util, power_draw, power_limit, fan_speed)
+
+    def close(self):
+        if self._handles:
+            self._handles = []
+            try:
+                self._nvml.nvmlShutdown()
+            except self._nvml.NVMLError:
+                pass
+
+
+class FakeBackend(TelemetryBackend):
+    """
+    Deterministic backend for tests.
+    Args:
+        samples: sequence of GPUSample (or 5-tuples) replayed in order;
+                 the last one is repeated once the sequence runs out.
+                 Every GPU in gpu_ids reports the same sample.
+    """
+    name = "fake"
+
+    def __init__(self, gpu_id=0, gpu_ids=None, samples: Optional[Sequence] = None):
+        super().__init__(gpu_id, gpu_ids)
+        if not samples:
+            samples = [GPUSample(60.0, 100.0, 250.0, 260.0, 100.0)]
+        self.samples = [GPUSample(*map(float, s)) for s in samples]
+        self.index = 0
+        self.read_count = 0
+
+    def set(self, **fields):
+        """Override fields of the sample returned by the next read, e.g. set(temp=80)."""
+        i = min(self.index, len(self.samples) - 1)
+        self.samples[i] = self.samples[i]._replace(**fields)
+
+    def read_all(self) -> List[GPUSample]:
+        i = min(self.index, len(self.samples) - 1)
+        self.index += 1
+        self.read_count += 1
+        return [self.samples[i]] * len(self.gpu_ids)
+
+
+BACKENDS = {
+    "nvml": NVMLBackend,
+    "nvidia-smi": NvidiaSmiBackend,
+    "fake": FakeBackend,
+}
+
+
+def make_backend(kind="auto", gpu_id=0, gpu_ids=None, use_bus=True, **kwargs) -> TelemetryBackend:
+    """
+    Build a telemetry backend.
+    Args:
+        kind: "auto" (node telemetry bus if a daemon is running, else NVML, falling back
+              to nvidia-smi), "shm", "nvml", "nvidia-smi" or "fake"
+        gpu_ids: read several GPUs per query (multi-GPU mode)
+        use_bus: let "auto" attach to the telemetry bus (False for the daemon itself)
+    """
+    if kind == "shm" or (kind == "auto" and use_bus):
+        from telemetry_bus import SharedMemoryBackend
+        if kind == "shm":
+            return SharedMemoryBackend(gpu_id=gpu_id, gpu_ids=gpu_ids, **kwargs)
+        try:
+            return SharedMemoryBackend(gpu_id=gpu_id, gpu_ids=gpu_ids)
+        except (FileNotFoundError, RuntimeError, ValueError):
+            # 沒有 daemon (或不含這些卡)：自己讀
+            pass
+    if kind == "auto":
+        try:
+            return NVMLBackend(gpu_id=gpu_id, gpu_ids=gpu_ids)
+        except Exception as e:
+            print(f"[WARN] NVML unavailable ({e}), fallback to nvidia-smi")
+            return NvidiaSmiBackend(gpu_id=gpu_id, gpu_ids=gpu_ids)
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown telemetry backend: {kind}")
+    return BACKENDS[kind](gpu_id=gpu_id, gpu_ids=gpu_ids, **kwargs)
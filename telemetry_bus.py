@@ -0,0 +1,414 @@
+"""
+telemetry_bus.py
+每台機器一個取樣 daemon：以一次查詢讀取所有 GPU，寫進 shared memory；
+訓練 env、推理迴圈、check_env.py、監控腳本等任意多個行程直接讀記憶體，不再各自呼叫
+nvidia-smi / NVML (N 個讀取端與 1 個的成本相同)。
+
+shared memory 配置 (全部 8-byte 對齊):
+    header  int64[8]   MAGIC, VERSION, n_gpus, capacity, n_fields, seq, count, writer pid
+    period  float64    取樣週期 (秒)
+    gpu_ids int64[n_gpus]
+    data    float64[n_gpus, 2 * capacity, n_fields]
+            每張卡一個環形緩衝區，欄位同 monitor.HISTORY_FIELDS
+            (time, temp, gpu_util, power_draw, power_limit, fan_speed)；
+            與 RingBuffer 相同每列寫兩次，最新 n 列永遠是一段連續的 view
+
+寫入端 (單一) 以 seqlock 發佈：seq 變奇數 -> 寫入所有卡的新列 -> count + 1 -> seq 變偶數。
+讀取端不上鎖：
+ - SharedMemoryBackend.read_all() : 最新一組樣本 (seq 前後相同才採用，否則重讀)
+ - BusRing                        : 某張卡的唯讀 RingBuffer view (零複製)，
+                                    GPUInfoMonitor 直接拿來當 history / TrendEstimator 的來源
+
+用法:
+    python telemetry_bus.py --gpus 0 1 --rate 20           # daemon (前景執行)
+    python telemetry_bus.py --status                       # 印出目前的樣本
+    GPUEnv(telemetry_backend="shm")                        # 讀 bus；"auto" 在 bus 存在時也會用它
+"""
+import argparse
+import os
+import signal
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import List
+
+import numpy as np
+
+from ring_buffer import RingBuffer
+from telemetry import DEFAULT_SAMPLE, GPUSample, TelemetryBackend, make_backend
+
+DEFAULT_NAME = "gpu-telemetry"
+MAGIC = 0x47505554454C4D31   # "GPUTELM1"
+VERSION = 1
+N_FIELDS = 6                 # time + GPUSample
+
+# header 索引
+H_MAGIC, H_VERSION, H_N_GPUS, H_CAPACITY, H_N_FIELDS, H_SEQ, H_COUNT, H_PID = range(8)
+_HEADER_BYTES = 8 * 8 + 8    # header + period
+# seqlock 讀取的重試上限 (秒)：寫入端在 publish 中途被殺掉時 seq 會一直是奇數
+SEQLOCK_TIMEOUT = 0.5
+
+
+def _layout(n_gpus, capacity):
+    data_offset = _HEADER_BYTES + 8 * n_gpus
+    size = data_offset + 8 * n_gpus * 2 * capacity * N_FIELDS
+    return data_offset, size
+
+
+def _views(buf, n_gpus, capacity):
+    data_offset, _ = _layout(n_gpus, capacity)
+    header = np.ndarray((8,), dtype=np.int64, buffer=buf)
+    period = np.ndarray((1,), dtype=np.float64, buffer=buf, offset=64)
+    gpu_ids = np.ndarray((n_gpus,), dtype=np.int64, buffer=buf, offset=_HEADER_BYTES)
+    data = np.ndarray((n_gpus, 2 * capacity, N_FIELDS), dtype=np.float64, buffer=buf, offset=data_offset)
+    return header, period, gpu_ids, data
+
+
+class BusWriter:
+    """
+    Creates the segment and publishes one row per GPU per sample (single writer).
+    Args:
+        name: shared memory name (/dev/shm/<name>)
+        gpu_ids: GPUs published, in read_all() order
+        capacity: rows kept per GPU (history available to readers)
+    Raises:
+        RuntimeError: the segment exists and its writer process is still alive
+    """
+
+    def __init__(self, name=DEFAULT_NAME, gpu_ids=(0,), capacity=4096, period=0.05):
+        self.name = name
+        self.gpu_ids = list(gpu_ids)
+        self.capacity = int(capacity)
+        _, size = _layout(len(self.gpu_ids), self.capacity)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # 已存在的 segment：writer 還活著就拒絕接手，否則是上一個 daemon 沒有正常結束留下的
+            try:
+                other = BusReader(name)
+            except RuntimeError:
+                other = None
+            if other is not None:
+                alive, pid = other.writer_alive(), other.writer_pid
+                other.close()
+                if alive:
+                    raise RuntimeError(f"{name}: telemetry bus already published by pid {pid}")
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.header, self.period, ids, self.data = _views(self.shm.buf, len(self.gpu_ids), self.capacity)
+        ids[:] = self.gpu_ids
+        self.period[0] = period
+        self.header[:] = [0, VERSION, len(self.gpu_ids), self.capacity, N_FIELDS, 0, 0, os.getpid()]
+        # MAGIC 最後寫：讀取端看到 MAGIC 時其他欄位已就緒
+        self.header[H_MAGIC] = MAGIC
+        self._count = 0
+
+    def publish(self, t, samples):
+        """Append one (time, GPUSample) row for every GPU."""
+        header = self.header
+        i = self._count % self.capacity
+        seq = int(header[H_SEQ])
+        header[H_SEQ] = seq + 1            # 奇數：寫入中
+        for k, sample in enumerate(samples):
+            row = (t,) + tuple(sample)
+            self.data[k, i] = row
+            self.data[k, i + self.capacity] = row
+        self._count += 1
+        header[H_COUNT] = self._count
+        header[H_SEQ] = seq + 2            # 偶數：完成
+
+    def close(self, unlink=True):
+        self.header = self.period = self.data = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class BusReader:
+    """Attach to an existing segment (read only, never unlinks it)."""
+
+    def __init__(self, name=DEFAULT_NAME):
+        self.name = name
+        self.shm = shared_memory.SharedMemory(name=name)
+        header = np.ndarray((8,), dtype=np.int64, buffer=self.shm.buf)
+        valid = int(header[H_MAGIC]) == MAGIC and int(header[H_VERSION]) == VERSION
+        # Python < 3.13 的 resource_tracker 會在讀取端結束時 unlink segment，這裡取消登記；
+        # writer 在同一個行程 (TelemetryDaemon.start()) 時登記是 writer 的，不能取消
+        if not valid or int(header[H_PID]) != os.getpid():
+            try:
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+        if not valid:
+            del header
+            self.shm.close()
+            raise RuntimeError(f"{name}: not a telemetry bus (or incompatible version)")
+        self.n_gpus = int(header[H_N_GPUS])
+        self.capacity = int(header[H_CAPACITY])
+        self.header, self._period, ids, self.data = _views(self.shm.buf, self.n_gpus, self.capacity)
+        self.gpu_ids = ids.tolist()
+
+    @property
+    def period(self) -> float:
+        return float(self._period[0])
+
+    @property
+    def count(self) -> int:
+        return int(self.header[H_COUNT])
+
+    @property
+    def writer_pid(self) -> int:
+        return int(self.header[H_PID])
+
+    def writer_alive(self) -> bool:
+        try:
+            os.kill(self.writer_pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def snapshot(self, timeout=SEQLOCK_TIMEOUT):
+        """
+        Newest row of every GPU, consistent across GPUs (seqlock).
+        Returns:
+            (count, rows (n_gpus, n_fields) copy); rows is None before the first sample
+        Raises:
+            TimeoutError: no consistent read within timeout seconds (writer died mid-publish)
+        """
+        header, data, capacity = self.header, self.data, self.capacity
+        deadline = None
+        while True:
+            seq = int(header[H_SEQ])
+            if not seq & 1:
+                count = int(header[H_COUNT])
+                rows = data[:, (count - 1) % capacity].copy() if count else None
+                if int(header[H_SEQ]) == seq:
+                    return count, rows
+            # 寫入中 (或讀到一半被改寫)：重試到 deadline 為止
+            now = time.monotonic()
+            if deadline is None:
+                deadline = now + timeout
+            elif now > deadline:
+                raise TimeoutError(f"{self.name}: telemetry bus stuck mid-publish "
+                                   f"(seq {seq}, writer pid {self.writer_pid})")
+            time.sleep(0)
+
+    def age(self) -> float:
+        """Seconds since the newest sample (inf before the first one)."""
+        count, rows = self.snapshot()
+        return float("inf") if rows is None else time.time() - float(rows[0, 0])
+
+    def ring(self, index) -> "BusRing":
+        return BusRing(self, index)
+
+    def close(self):
+        self.header = self._period = self.data = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # 仍有 BusRing / history 的 view 指向 segment：mapping 留到行程結束
+            pass
+
+
+class BusRing(RingBuffer):
+    """
+    Read-only RingBuffer over one GPU's rows in the bus: window() / latest() / row()
+    are views into shared memory, count follows the writer.
+    """
+
+    def __init__(self, reader: BusReader, index: int):
+        self.capacity = reader.capacity
+        self.row_shape = (N_FIELDS,)
+        self._buf = reader.data[index]
+        self._header = reader.header
+
+    @property
+    def _count(self) -> int:
+        return int(self._header[H_COUNT])
+
+    def append(self, row):
+        raise TypeError("BusRing is read only (the telemetry daemon writes it)")
+
+    def clear(self):
+        # 共用的資料不清除
+        pass
+
+
+class StaleTelemetryError(RuntimeError):
+    """The telemetry daemon stopped publishing (dead writer or samples older than max_age)."""
+
+
+class SharedMemoryBackend(TelemetryBackend):
+    """
+    Telemetry backend reading the node's telemetry bus instead of the driver.
+    Args:
+        bus: segment name
+        max_age: newest sample must be at most this old, checked when attaching and on
+                 every read; otherwise StaleTelemetryError (None = never check)
+    """
+    name = "shm"
+
+    def __init__(self, gpu_id=0, gpu_ids=None, bus=DEFAULT_NAME, max_age=5.0):
+        super().__init__(gpu_id, gpu_ids)
+        self.bus = BusReader(bus)
+        try:
+            missing = [gid for gid in self.gpu_ids if gid not in self.bus.gpu_ids]
+            if missing:
+                raise ValueError(f"{bus}: GPUs {missing} not published (bus has {self.bus.gpu_ids})")
+        except Exception:
+            self.bus.close()
+            raise
+        self.max_age = max_age
+        self.indices = [self.bus.gpu_ids.index(gid) for gid in self.gpu_ids]
+        try:
+            self.snapshot()
+        except StaleTelemetryError:
+            self.bus.close()
+            raise
+
+    def rings(self) -> List[BusRing]:
+        """Zero-copy history of every GPU in gpu_ids (for GPUInfoMonitor)."""
+        return [self.bus.ring(k) for k in self.indices]
+
+    def snapshot(self):
+        """
+        (count, rows (len(gpu_ids), n_fields)) in gpu_ids order.
+        Raises:
+            StaleTelemetryError: daemon dead or newest sample older than max_age;
+                                 控制迴圈不能拿凍結的溫度繼續調 PL
+        """
+        count, rows = self.bus.snapshot()
+        if self.max_age is not None:
+            age = float("inf") if rows is None else time.time() - float(rows[0, 0])
+            if age > self.max_age or not self.bus.writer_alive():
+                raise StaleTelemetryError(
+                    f"{self.bus.name}: telemetry daemon (pid {self.bus.writer_pid}) is not publishing "
+                    f"(newest sample {age:.1f}s old)"
+                )
+        return count, None if rows is None else rows[self.indices]
+
+    def read_all(self) -> List[GPUSample]:
+        _, rows = self.snapshot()
+        if rows is None:
+            return [DEFAULT_SAMPLE] * len(self.gpu_ids)
+        return [GPUSample(*row[1:].tolist()) for row in rows]
+
+    def readback(self, timeout=None) -> List[GPUSample]:
+        """read_all() of a sample taken after this call (PL readback after a write)."""
+        start = self.bus.count
+        deadline = time.monotonic() + (timeout if timeout is not None else 3.0 * self.bus.period + 0.5)
+        while self.bus.count <= start + 1 and time.monotonic() < deadline:
+            # +1：呼叫時可能正在進行中的那次取樣不算
+            time.sleep(self.bus.period / 4.0)
+        return self.read_all()
+
+    def close(self):
+        if self.bus.shm is not None:
+            self.bus.close()
+            self.bus.shm = None
+
+
+class TelemetryDaemon:
+    """
+    Samples every GPU at rate_hz with one backend query and publishes to the bus.
+    Args:
+        backend: TelemetryBackend or kind for telemetry.make_backend ("auto", "nvml", ...);
+                 "auto" never picks the bus itself (the daemon reads the hardware)
+    """
+
+    def __init__(self, gpu_ids=(0,), rate_hz=20.0, name=DEFAULT_NAME, backend="auto", capacity=4096,
+                 clock=time.time, verbose=1):
+        if isinstance(backend, str):
+            if backend == "shm":
+                raise ValueError("the telemetry daemon cannot read from the bus it publishes")
+            backend = make_backend(backend, gpu_ids=list(gpu_ids), use_bus=False)
+        self.backend = backend
+        self.period = 1.0 / rate_hz
+        self.clock = clock
+        self.verbose = verbose
+        try:
+            self.writer = BusWriter(name, backend.gpu_ids, capacity=capacity, period=self.period)
+        except RuntimeError:
+            backend.close()
+            raise
+        self._stop = threading.Event()
+        self._thread = None
+        self.overruns = 0
+
+    def sample_once(self):
+        now = self.clock()
+        self.writer.publish(now, self.backend.read_all())
+
+    def run(self):
+        """Sample until stop() (blocking); same drift-free schedule as the monitor's sampler."""
+        if self.verbose:
+            print(f"[telemetry-bus] {self.writer.name}: GPUs {self.writer.gpu_ids} "
+                  f"via {self.backend.name} at {1.0 / self.period:g} Hz")
+        next_t = time.monotonic()
+        while not self._stop.is_set():
+            self.sample_once()
+            next_t += self.period
+            delay = next_t - time.monotonic()
+            if delay < 0.0:
+                self.overruns += 1
+                next_t = time.monotonic()
+                delay = 0.0
+            self._stop.wait(delay)
+
+    def start(self):
+        """Run in a background thread (same process)."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="telemetry-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self.writer.close()
+        self.backend.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-node GPU telemetry daemon (shared memory)")
+    parser.add_argument("--gpus", type=int, nargs="+", default=[0])
+    parser.add_argument("--rate", type=float, default=20.0, help="samples per second")
+    parser.add_argument("--name", default=DEFAULT_NAME, help="shared memory segment name")
+    parser.add_argument("--backend", default="auto", choices=("auto", "nvml", "nvidia-smi", "fake"))
+    parser.add_argument("--capacity", type=int, default=4096, help="history rows kept per GPU")
+    parser.add_argument("--status", action="store_true", help="print the newest samples of a running bus")
+    args = parser.parse_args()
+
+    if args.status:
+        reader = BusReader(args.name)
+        count, rows = reader.snapshot()
+        print(f"{args.name}: writer pid {reader.writer_pid} "
+              f"({'alive' if reader.writer_alive() else 'dead'}), {count} samples, age {reader.age():.2f}s")
+        for gid, row in zip(reader.gpu_ids, rows if rows is not None else []):
+            print(f"  GPU {gid}: " + ", ".join(f"{f}={v:.1f}" for f, v in zip(GPUSample._fields, row[1:])))
+        reader.close()
+        return
+
+    daemon = TelemetryDaemon(args.gpus, rate_hz=args.rate, name=args.name, backend=args.backend,
+                             capacity=args.capacity)
+    # systemd / kill 送的 SIGTERM 也正常結束 (unlink segment)
+    signal.signal(signal.SIGTERM, lambda *_: daemon._stop.set())
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+        print(f"[telemetry-bus] {args.name} closed ({daemon.overruns} overruns)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ from env import GPUEnv
 import time
 import os
 from stable_baselines3.common.logger import configure
+from window_logger import WindowAggregator
 
 def test_model(model_path="modelA.zip", test_steps=100, log_name="test_run"):
     # 初始化環境
@@ -22,6 +23,8 @@ def test_model(model_path="modelA.zip", test_steps=100, log_name="test_run"):
     os.makedirs(log_dir, exist_ok=True)
     new_logger = configure(log_dir, ["tensorboard"])
     model.set_logger(new_logger)
+    # 每 10 步寫一次彙總，而不是每步 dump
+    window = WindowAggregator(every_steps=10, histograms=("test/temperature", "test/power_limit"))
 
     # 開始測試
     for step in range(test_steps):
@@ -29,11 +32,11 @@ def test_model(model_path="modelA.zip", test_steps=100, log_name="test_run"):
         obs, reward, done, truncated, info = env.step(action)
 
         # TensorBoard scalar logs
-        model.logger.record("test/temperature", env.current_temp)
-        model.logger.record("test/power_limit", env.current_power_limit)
-        model.logger.record("test/reward", reward)
-        model.logger.record("test/step", step)
-        model.logger.dump(step)
+        window.add("test/temperature", env.current_temp)
+        window.add("test/power_limit", env.current_power_limit)
+        window.add("test/reward", reward)
+        if window.step():
+            window.write_logger(model.logger, step)
 
         # Console log
         print(f"[Step {step}] Temp: {env.current_temp}°C | PL: {env.current_power_limit}W | Reward: {reward:.4f}")
@@ -44,6 +47,8 @@ def test_model(model_path="modelA.zip", test_steps=100, log_name="test_run"):
 
         time.sleep(2.0)
 
+    if window.due():
+        window.write_logger(model.logger, step)
     print("測試完成")
 
 if __name__ == "__main__":
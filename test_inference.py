@@ -1,20 +1,47 @@
+import os
 import time
 import numpy as np
-from stable_baselines3 import PPO
-from torch.utils.tensorboard import SummaryWriter
 from env import GPUEnv
+from metrics_exporter import ControllerMetrics, MetricsServer
+from numpy_policy import load_policy
+from window_logger import WindowAggregator
 
-def main():
-    # 0) TensorBoard 日誌路徑 (區別於訓練資料)
+
+def make_summary_writer(log_dir):
+    """TensorBoard writer, or None when torch is not installed (torch is only imported here)."""
+    try:
+        from torch.utils.tensorboard import SummaryWriter
+    except ImportError:
+        print("[WARN] torch not installed, TensorBoard logging disabled (metrics endpoint still on)")
+        return None
+    return SummaryWriter(log_dir=log_dir)
+
+
+def main(model_path="modelA_B_C_D.npz", tensorboard=True):
+    # 0) TensorBoard 日誌路徑 (區別於訓練資料)；tensorboard=False 時完全不載入 torch
     inference_logdir = "./tb_inference_logs/"
-    writer = SummaryWriter(log_dir=inference_logdir)
+    writer = make_summary_writer(inference_logdir) if tensorboard else None
+    # 每 30 步 (或 60 秒) 寫一次彙總 (mean/min/max/last + 直方圖)，不再每步寫 event file
+    window = WindowAggregator(
+        every_steps=30, every_secs=60.0,
+        histograms=("inference/temp", "inference/power_limit", "inference/action")
+    )
 
     # 1) 建立環境
     env = GPUEnv(gpu_id=0, step_time=2.0)
 
-    # 2) 載入已訓練的 model
-    model_path = "modelA_B_C_D.zip"
-    model = PPO.load(model_path)
+    # 1b) Prometheus / OpenMetrics 端點 (http://<host>:9400/metrics)，機群監控直接 scrape；
+    # scrape 只讀記憶體中的彙總值，不會卡住控制迴圈
+    metrics = ControllerMetrics(env.gpu_ids, actuator=env.actuator)
+    metrics_server = MetricsServer(metrics, port=9400).start()
+
+    # 2) 載入已訓練的 model：預設用匯出的 numpy 權重 (python numpy_policy.py modelA_B_C_D.zip)，
+    # 推理不需要 torch / SB3；還沒匯出時才退回 SB3 的 .zip
+    if not os.path.exists(model_path) and model_path.endswith(".npz"):
+        fallback = model_path[:-len(".npz")] + ".zip"
+        print(f"[WARN] {model_path} not found, loading {fallback} with SB3 (needs torch)")
+        model_path = fallback
+    model = load_policy(model_path)
     print(f"Loaded model from {model_path}.")
 
     # 3) 指定「我要在推理階段跑多少個step」 (無回合概念亦可)
@@ -28,21 +55,29 @@ def main():
     for step in range(max_inference_steps):
         action, _states = model.predict(obs, deterministic=True)
         obs, reward, terminated, truncated, info = env.step(action)
+        # 只算運算時間 (predict + env.step 的工作)，不含排程器的等待
+        metrics.observe_step(info, action, reward, latency=info["step_timing"]["busy"])
 
         ep_reward += reward
         global_step += 1
 
-        # 紀錄到TensorBoard
-        writer.add_scalar("inference/reward", reward, global_step)
+        # 紀錄到TensorBoard (視窗彙總)
+        window.add("inference/reward", reward)
 
         current_temp = getattr(env, "current_temp", np.nan)
-        writer.add_scalar("inference/temp", current_temp, global_step)
+        window.add("inference/temp", current_temp)
 
         current_pl = getattr(env, "current_power_limit", np.nan)
-        writer.add_scalar("inference/power_limit", current_pl, global_step)
+        window.add("inference/power_limit", current_pl)
 
         # 如果你還想記錄動作
-        writer.add_scalar("inference/action", action[0], global_step)
+        window.add("inference/action", action[0])
+
+        if window.step():
+            if writer is not None:
+                window.write_summary_writer(writer, global_step)
+            else:
+                window.reset()
 
         # 若你的環境很少會 done，不過還是檢查
         if terminated or truncated:
@@ -55,8 +90,12 @@ def main():
         # time.sleep(1.0)
 
     # 4) 跑完1000步後，關閉
+    if window.due() and writer is not None:
+        window.write_summary_writer(writer, global_step)
     env.close()
-    writer.close()
+    if writer is not None:
+        writer.close()
+    metrics_server.close()
     print("Inference ended after 1000 steps, logs in", inference_logdir)
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+import threading
+
+from actuator import Actuator
+from telemetry import DEFAULT_SAMPLE, FakeBackend
+
+
+class FakeWriter:
+    """Records power limit writes; the driver applies them unless clamp is set."""
+    name = "fake"
+
+    def __init__(self, limits, gate=None):
+        self.limits = limits
+        self.gate = gate
+        self.entered = threading.Event()
+        self.calls = []
+
+    def set_power_limits(self, targets):
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait()
+        self.calls.append(dict(targets))
+        self.limits.update(targets)
+        return {gid: True for gid in targets}
+
+    def set_fans(self, targets):
+        self.calls.append(("fan", dict(targets)))
+        return {fan: True for fan in targets}
+
+
+def _readback(gpu_ids, limits):
+    return lambda: [DEFAULT_SAMPLE._replace(power_limit=float(limits[g])) for g in gpu_ids]
+
+
+def test_pending_targets_are_coalesced():
+    limits = {0: 250, 1: 250}
+    gate = threading.Event()
+    writer = FakeWriter(limits, gate)
+    act = Actuator([0, 1], readback=_readback([0, 1], limits), writer=writer)
+    try:
+        act.submit_power_limits({0: 200, 1: 200})
+        assert writer.entered.wait(timeout=5.0)
+        # worker 卡在第一次寫入時，後面的目標只保留最新值
+        for watts in (150, 160, 170):
+            act.submit_power_limits({0: watts})
+        gate.set()
+        assert act.wait(timeout=5.0)
+    finally:
+        act.close()
+    assert writer.calls == [{0: 200, 1: 200}, {0: 170}]
+    assert act.stats["coalesced"] == 2
+    assert act.applied_pl == {0: 170.0, 1: 200.0}
+    assert act.failures == {}
+
+
+def test_readback_dedup_skips_no_op_writes():
+    limits = {0: 250, 1: 250}
+    writer = FakeWriter(limits)
+    act = Actuator([0, 1], readback=_readback([0, 1], limits), writer=writer, async_mode=False)
+    act.submit_power_limits({0: 220, 1: 230})
+    act.submit_power_limits({0: 220, 1: 230})
+    act.submit_power_limits({0: 220, 1: 240})
+    assert writer.calls == [{0: 220, 1: 230}, {1: 240}]
+    assert act.stats["skipped"] == 3 and act.stats["written"] == 3
+    latest = {r.gpu_id: r for r in act.latest()}
+    assert latest[0].skipped and latest[0].applied == 220.0
+    assert not latest[1].skipped and latest[1].applied == 240.0
+
+
+def test_readback_mismatch_is_a_failure():
+    # FakeBackend 不會套用寫入：回讀仍是 260W
+    backend = FakeBackend(gpu_id=0)
+    writer = FakeWriter({})
+    act = Actuator([0], readback=backend.read_all, writer=writer, async_mode=False)
+    act.submit_power_limits({0: 200})
+    assert act.failures == {("power_limit", 0): 1}
+    assert act.applied_pl[0] == 260.0
+    # 回讀值就是目標 => 不再下指令
+    act.submit_power_limits({0: 260})
+    assert len(writer.calls) == 1 and act.stats["skipped"] == 1
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import fake_nvidia
+from actuator import Actuator, CommandWriter
+from bench_step import compare, run_benchmark
+from scheduler import StepScheduler
+from telemetry import NvidiaSmiBackend
+
+
+def _report(p50, steps_per_sec=100.0, count=100):
+    return {"phases": {"env_step": {"count": count, "p50": p50}}, "steps_per_sec": steps_per_sec}
+
+
+@pytest.fixture
+def fake_gpus(tmp_path, monkeypatch):
+    state = tmp_path / "state.json"
+    env = fake_nvidia.install(str(tmp_path / "bin"), str(state), n_gpus=2, echo=False)
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    return state
+
+
+def test_compare_flags_only_real_regressions():
+    base = _report(10.0)
+    assert compare(_report(12.0), base) == []                      # +20%
+    assert len(compare(_report(13.0), base)) == 1                  # +30%
+    assert compare(_report(0.4), _report(0.2)) == []               # +100% 但不到 min_delta_ms
+    assert compare(_report(30.0, count=5), _report(10.0, count=5)) == []
+    assert len(compare(_report(30.0, count=5), _report(10.0, count=5), phases=["env_step"])) == 1
+    failures = compare(_report(10.0, steps_per_sec=70.0), base)
+    assert len(failures) == 1 and failures[0].startswith("steps/s")
+
+
+def test_zero_period_is_free_running():
+    now = [0.0]
+    sleeps = []
+    sched = StepScheduler(0.0, clock=lambda: now[0], sleep=sleeps.append)
+    sched.start()
+    for _ in range(5):
+        now[0] += 0.01
+        timing = sched.wait()
+        assert not timing.overrun and timing.missed == 0
+        assert timing.busy == pytest.approx(0.01)
+    assert sleeps == [] and sched.overruns == 0
+    assert sched.summary()["steps"] == 5
+
+
+def test_fake_binaries_serve_queries_and_apply_writes(fake_gpus):
+    backend = NvidiaSmiBackend(gpu_ids=[0, 1])
+    assert [s.power_limit for s in backend.read_all()] == [260.0, 260.0]
+    act = Actuator([0, 1], readback=backend.read_all, writer=CommandWriter(), async_mode=False)
+    act.submit_power_limits({0: 200, 1: 230})
+    act.submit_fans({0: 40})
+    assert act.failures == {}
+    assert act.applied_pl == {0: 200.0, 1: 230.0}
+    gpus = json.loads(fake_gpus.read_text())["gpus"]
+    assert [g["power_limit"] for g in gpus] == [200.0, 230.0]
+    assert [g["fan"] for g in gpus] == [40.0, 100.0]
+
+
+def test_benchmark_reports_every_measured_phase(tmp_path):
+    report = run_benchmark(steps=32, warmup=0, n_steps=16, workdir=str(tmp_path), verbose=0)
+    for phase in ("env_step", "telemetry_read", "actuation_write", "policy_forward", "callback", "ppo_train"):
+        assert report["phases"][phase]["count"] > 0, phase
+    assert report["steps_per_sec"] > 0
+    assert compare(report, report) == []
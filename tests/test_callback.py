@@ -0,0 +1,24 @@
+import numpy as np
+from stable_baselines3 import PPO
+
+from custom_callback import GPUControlCallback
+from rescore import load_log
+from sim_vec_env import SimGPUVecEnv
+
+
+def test_every_env_gets_a_row_per_step(tmp_path):
+    env = SimGPUVecEnv(num_envs=3, seed=0)
+    model = PPO("MlpPolicy", env, n_steps=8, batch_size=12, n_epochs=1, seed=0, device="cpu")
+    path = str(tmp_path / "training_log.csv")
+    callback = GPUControlCallback(verbose=0, dump_interval=1000, csv_path=path)
+    model.learn(total_timesteps=24, callback=callback)
+    callback.close()
+
+    cols = load_log(path)
+    assert len(cols["timestep"]) == 24
+    assert cols["env"].tolist() == [0.0, 1.0, 2.0] * 8
+    assert cols["timestep"].tolist() == [float(3 * (i // 3 + 1)) for i in range(24)]
+    # 最後一步的遙測就是各 env 最後的觀測
+    np.testing.assert_array_equal(cols["temp"][-3:], env.get_attr("current_temp"))
+    np.testing.assert_array_equal(cols["power_limit"][-3:], env.get_attr("current_power_limit"))
+    assert callback.stats.count == 8
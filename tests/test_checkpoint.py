@@ -0,0 +1,101 @@
+import copy
+import os
+
+import numpy as np
+import torch
+from stable_baselines3 import PPO
+from stable_baselines3.common.callbacks import BaseCallback
+
+from checkpoint import AsyncCheckpointCallback, latest_checkpoint, list_checkpoints, load_checkpoint
+from custom_callback import GPUControlCallback
+from sim_env import SimGPUEnv
+from sim_vec_env import SimGPUVecEnv
+
+
+class EnvSnapshot(BaseCallback):
+    """Deep copy of the training env at the rollout boundary where `step` is reached."""
+
+    def __init__(self, step):
+        super().__init__()
+        self.step = step
+        self.env = None
+
+    def _on_rollout_start(self) -> None:
+        if self.num_timesteps == self.step:
+            self.env = copy.deepcopy(self.training_env)
+
+    def _on_step(self) -> bool:
+        return True
+
+
+def _ppo(env):
+    return PPO("MlpPolicy", env, n_steps=8, batch_size=8, n_epochs=2, seed=0, device="cpu")
+
+
+def _params(model):
+    return {k: v.clone() for k, v in model.policy.state_dict().items()}
+
+
+def test_resume_continues_exactly(tmp_path):
+    save_dir = str(tmp_path / "ckpt")
+    model = _ppo(SimGPUVecEnv(num_envs=2, seed=0))
+    gpu_cb = GPUControlCallback(verbose=0, dump_interval=1000, csv_path=str(tmp_path / "a.csv"))
+    ckpt = AsyncCheckpointCallback(save_dir, save_freq=16, keep_last=5, callbacks=[gpu_cb], verbose=0)
+    snapshot = EnvSnapshot(16)
+    model.learn(total_timesteps=32, callback=[gpu_cb, ckpt, snapshot])
+    ckpt.close()
+    gpu_cb.close()
+    assert list_checkpoints(save_dir) == [16, 32]
+    assert latest_checkpoint(save_dir).endswith("step_00000032")
+
+    resumed_cb = GPUControlCallback(verbose=0, dump_interval=1000, csv_path=str(tmp_path / "b.csv"))
+    resumed, remaining = load_checkpoint(os.path.join(save_dir, "step_00000016"), snapshot.env,
+                                         callbacks=[resumed_cb], total_timesteps=32, device="cpu")
+    assert resumed.num_timesteps == 16 and remaining == 16
+    assert resumed_cb.stats.count == 8
+    resumed.learn(total_timesteps=remaining, callback=resumed_cb, reset_num_timesteps=False)
+    resumed_cb.close()
+    expected = _params(model)
+    for name, value in _params(resumed).items():
+        assert torch.equal(value, expected[name]), name
+
+
+def test_only_the_newest_checkpoints_are_kept_across_sessions(tmp_path):
+    save_dir = tmp_path / "ckpt"
+    save_dir.mkdir()
+    # 之前的執行留下的存檔
+    for step in (8, 900):
+        for ext in (".zip", ".state.pt"):
+            path = save_dir / f"step_{step:08d}{ext}"
+            path.write_bytes(b"old")
+            os.utime(path, (1.0, 1.0))
+    model = _ppo(SimGPUVecEnv(num_envs=2, seed=0))
+    ckpt = AsyncCheckpointCallback(str(save_dir), save_freq=8, keep_last=2, verbose=0)
+    model.learn(total_timesteps=48, callback=ckpt)
+    ckpt.close()
+    assert list_checkpoints(str(save_dir)) == [32, 48]
+    assert sorted(p.name for p in save_dir.glob("step_*")) == [
+        "step_00000032.state.pt", "step_00000032.zip", "step_00000048.state.pt", "step_00000048.zip"]
+    assert ckpt.saved == [32, 48]
+
+
+def test_plain_env_gets_the_saved_power_limit_or_a_fresh_reset(tmp_path):
+    save_dir = str(tmp_path / "ckpt")
+    model = _ppo(SimGPUEnv(seed=0))
+    ckpt = AsyncCheckpointCallback(save_dir, save_freq=8, verbose=0)
+    model.learn(total_timesteps=16, callback=ckpt)
+    ckpt.close()
+    saved_pl = model.get_env().get_attr("pl_old")[0]
+    saved_obs = model._last_obs.copy()
+
+    env = SimGPUEnv(seed=1)
+    resumed, _ = load_checkpoint(save_dir, env, device="cpu")
+    assert env.pl_old == saved_pl
+    np.testing.assert_array_equal(resumed._last_obs, saved_obs)
+
+    env = SimGPUEnv(seed=1)
+    resumed, _ = load_checkpoint(save_dir, env, reset_env=True, device="cpu")
+    assert env.pl_old == 260.0
+    assert resumed._last_obs[0, 3] == 260.0 and resumed._last_episode_starts.all()
+    resumed.learn(total_timesteps=8, reset_num_timesteps=False)
+    assert resumed.num_timesteps == 24
@@ -0,0 +1,47 @@
+import numpy as np
+from stable_baselines3 import PPO
+
+from curriculum import CurriculumRunner, Stage
+from reward import get_reward
+from sim_env import SimGPUEnv
+from sim_vec_env import SimGPUVecEnv
+
+
+def _ppo(env):
+    return PPO("MlpPolicy", env, n_steps=8, batch_size=8, n_epochs=1, device="cpu")
+
+
+def test_stages_reuse_one_model_and_reconfigure_the_env():
+    env = SimGPUEnv(seed=0, init_temp=(40.0, 40.0))
+    model = _ppo(env)
+    runner = CurriculumRunner(model, env, save=False, verbose=0)
+    runner.run([
+        Stage("A", 16, fan=100.0, power_limit=250.0, warmup_temp=55.0),
+        Stage("B", 8, fan=30.0, reward="reward_1"),
+    ])
+    assert runner.model is model and model.num_timesteps == 24
+    assert [name for name, _, _ in runner.timings] == ["A", "B"]
+    assert env.model.fan[0] == 30.0
+    assert env.reward_fn == get_reward("reward_1").scalar
+
+
+def test_apply_warms_up_and_resets_with_the_stage_power_limit():
+    env = SimGPUEnv(seed=0, init_temp=(40.0, 40.0), init_util=0.0)
+    model = _ppo(env)
+    runner = CurriculumRunner(model, env, save=False, verbose=0)
+    runner.apply(Stage("A", 0, fan=100.0, power_limit=230.0, warmup_temp=55.0))
+    assert model._last_obs is None
+    assert env.get_temp() >= 54.0
+    obs = model.get_env().reset()
+    assert obs[0, 3] == 230.0
+
+
+def test_vectorized_simulator_uses_its_own_warm_up_and_batched_reward():
+    env = SimGPUVecEnv(num_envs=4, seed=0, init_temp=(40.0, 40.0))
+    model = _ppo(env)
+    runner = CurriculumRunner(model, env, save=False, verbose=0)
+    runner.apply(Stage("A", 0, fan=100.0, power_limit=240.0, warmup_temp=55.0, reward="reward_1"))
+    assert np.all(env.model.temp > 55.0)
+    assert env.reward_fn == get_reward("reward_1").batch
+    obs = env.reset()
+    np.testing.assert_array_equal(obs[:, 3], 240.0)
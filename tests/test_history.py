@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from recorder import ReplayGPUEnv, TrajectoryRecorder
+from sim_env import SimGPUEnv
+
+
+def _steps(env, n, delta=-10.0):
+    return [np.array(env.step(np.full(env.action_space.shape, delta, dtype=np.float32))[0]) for _ in range(n)]
+
+
+def test_history_is_the_last_k_observations():
+    plain = SimGPUEnv(seed=0)
+    env = SimGPUEnv(seed=0, history_len=4)
+    assert env.observation_space.shape == (4, 7)
+    expected = [plain.reset()[0]] + _steps(plain, 6)
+    obs, _ = env.reset()
+    assert obs.shape == (4, 7) and not obs.flags.writeable
+    # reset 後以第一個觀測補滿
+    np.testing.assert_array_equal(obs, np.tile(expected[0], (4, 1)))
+    got = _steps(env, 6)
+    np.testing.assert_array_equal(got[-1], np.array(expected[-4:]))
+    np.testing.assert_array_equal(got[1], np.array([expected[0]] * 2 + expected[1:3]))
+    assert env.observation_space.contains(got[-1])
+    with pytest.raises(ValueError):
+        env.step(np.zeros(1, dtype=np.float32))[0][0, 0] = 0.0
+
+
+def test_feature_subset_and_multi_gpu_layout():
+    env = SimGPUEnv(seed=0, n_gpus=2, history_len=3, history_features=("temp", "power_limit"))
+    assert env.observation_space.shape == (2, 3, 2)
+    obs, _ = env.reset()
+    assert obs.shape == (2, 3, 2)
+    np.testing.assert_array_equal(obs[:, :, 1], 260.0)
+    obs = env.step(np.array([-20.0, 10.0], dtype=np.float32))[0]
+    # 每張卡 (K, F)，最新一列在最後
+    np.testing.assert_array_equal(obs[:, -1, 1], [240.0, 270.0])
+    np.testing.assert_array_equal(obs[:, 0, 1], [260.0, 260.0])
+    np.testing.assert_array_equal(obs[:, -1, 0], env.get_temps().round())
+    env = SimGPUEnv(seed=0, trend_features=True, history_len=2, history_features="temp_accel")
+    assert env.reset()[0].shape == (2, 1)
+
+
+def test_invalid_history_configuration():
+    with pytest.raises(ValueError):
+        SimGPUEnv(history_features=("temp",))
+    with pytest.raises(ValueError):
+        SimGPUEnv(history_len=4, history_features=("temp", "slope_1s"))
+
+
+@pytest.mark.parametrize("n_gpus", [None, 2])
+def test_replay_rebuilds_history_observations(tmp_path, n_gpus):
+    path = str(tmp_path / "trace.bin")
+    env = TrajectoryRecorder(SimGPUEnv(seed=0, n_gpus=n_gpus, history_len=3,
+                                       history_features=("temp", "power_limit")), path)
+    recorded = [np.array(env.reset()[0])] + _steps(env, 5)
+    env.close()
+    replay = ReplayGPUEnv(path, rebuild_obs=True)
+    assert replay.history_len == 3 and replay.history_features == ("temp", "power_limit")
+    assert replay.multi_gpu == (n_gpus is not None)
+    assert replay.observation_space.shape == recorded[0].shape
+    replayed = [replay.reset()[0]] + _steps(replay, 5)
+    for expected, obs in zip(recorded, replayed):
+        np.testing.assert_allclose(obs, expected, atol=1e-5)
@@ -0,0 +1,81 @@
+import time
+
+import numpy as np
+import pytest
+
+from load_playback import LoadTrace, SimTracePlayer, TracePlaybackWrapper, TracePlayer
+from recorder import TrajectoryRecorder
+from sim_env import SimGPUEnv
+
+
+def test_trace_is_piecewise_constant_and_loops():
+    trace = LoadTrace([0.0, 10.0, 20.0], [20.0, 80.0, 150.0])
+    assert trace.duration == 30.0 and trace.util[-1] == 100.0
+    assert trace.util_at(0.0) == 20.0 and trace.util_at(9.99) == 20.0 and trace.util_at(10.0) == 80.0
+    assert trace.util_at(35.0) == 20.0
+    np.testing.assert_array_equal(trace.util_at([5.0, 15.0, 25.0]), [20.0, 80.0, 100.0])
+    assert trace.mean() == pytest.approx(200.0 / 3.0)
+    assert LoadTrace([0.0, 10.0], [20.0, 80.0], loop=False).util_at(50.0) == 80.0
+    with pytest.raises(ValueError):
+        LoadTrace([], [])
+
+
+@pytest.mark.parametrize("kind", ["constant", "square", "sine", "ramp", "bursty"])
+def test_synthetic_profiles_stay_in_range(kind):
+    trace = LoadTrace.synthetic(kind, duration=600.0, seed=0, low=10.0, high=90.0)
+    assert len(trace) == 600 and trace.duration == 600.0
+    assert trace.util.min() >= 10.0 - 1e-9 and trace.util.max() <= 90.0 + 1e-9
+
+
+def test_traces_from_a_log_and_a_recording(tmp_path):
+    log = tmp_path / "training_log.csv"
+    log.write_text("timestep,temp,power_limit,reward,slope_3s,power_draw,eta,fan,util\n"
+                   + "".join(f"{i + 1},60,250,0.5,0.0,200,0.8,100,{u}\n" for i, u in enumerate([10, 50, 90])))
+    trace = LoadTrace.from_log(str(log), step_time=2.0)
+    assert trace.times.tolist() == [0.0, 2.0, 4.0] and trace.util.tolist() == [10.0, 50.0, 90.0]
+
+    path = str(tmp_path / "trace.bin")
+    env = TrajectoryRecorder(SimGPUEnv(seed=0), path)
+    env.reset()
+    for util in (30.0, 70.0):
+        env.unwrapped.set_util(util)
+        env.step(np.zeros(1, dtype=np.float32))
+    env.close()
+    trace = LoadTrace.from_trace(path)
+    assert trace.util.tolist()[-2:] == [30.0, 70.0]
+    assert trace.times[0] == 0.0 and np.all(np.diff(trace.times) > 0)
+
+
+def test_wrapper_plays_one_trace_segment_per_step():
+    env = SimGPUEnv(seed=0, step_time=2.0)
+    trace = LoadTrace([0.0, 4.0, 8.0], [20.0, 60.0, 100.0])
+    wrapped = TracePlaybackWrapper(env, SimTracePlayer(env.model, trace, intensity=0.5))
+    wrapped.reset()
+    seen = []
+    for _ in range(6):
+        info = wrapped.step(np.zeros(1, dtype=np.float32))[-1]
+        seen.append((info["load_util"], env.model.util[0]))
+    assert seen == [(10.0, 10.0), (10.0, 10.0), (30.0, 30.0), (30.0, 30.0), (50.0, 50.0), (50.0, 50.0)]
+    # 不 rewind：下一個回合接著播
+    wrapped.reset()
+    assert wrapped.step(np.zeros(1, dtype=np.float32))[-1]["load_util"] == 10.0
+    assert wrapped.position == 14.0
+
+
+def test_player_process_follows_sync_and_pause():
+    trace = LoadTrace.synthetic("constant", duration=60.0, high=40.0)
+    player = TracePlayer(trace, workload="cpu", workload_kwargs={"size": 32}, period=0.02)
+    player.start()
+    try:
+        player.sync(0.0)
+        deadline = time.monotonic() + 30.0
+        while player.target != 40.0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert player.target == 40.0
+        player.pause()
+        deadline = time.monotonic() + 10.0
+        while player.target != 0.0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert player.target == 0.0
+    finally:
+        player.close()
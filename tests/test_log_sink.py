@@ -0,0 +1,37 @@
+import numpy as np
+
+from log_sink import ChunkSink, CSVSink, load_chunks
+
+
+def test_csv_appends_under_a_matching_header(tmp_path):
+    path = str(tmp_path / "log.csv")
+    for step in (1, 2):
+        sink = CSVSink(path, ("timestep", "reward"), background=False)
+        sink.write([step, 0.5])
+        sink.close()
+    assert open(path).read().splitlines() == ["timestep,reward", "1,0.5", "2,0.5"]
+
+
+def test_csv_with_other_columns_is_rotated(tmp_path):
+    path = str(tmp_path / "log.csv")
+    sink = CSVSink(path, ("timestep", "reward"), background=False)
+    sink.write([1, 0.5])
+    sink.close()
+    sink = CSVSink(path, ("timestep", "reward", "temp"), background=False)
+    sink.write([2, 0.5, 70.0])
+    sink.close()
+    assert open(path).read().splitlines() == ["timestep,reward,temp", "2,0.5,70.0"]
+    assert open(str(tmp_path / "log.1.csv")).read().splitlines() == ["timestep,reward", "1,0.5"]
+
+
+def test_chunks_roundtrip_across_flushes(tmp_path):
+    path = str(tmp_path / "log.npyc")
+    sink = ChunkSink(path, ("a", "b"), flush_rows=4, background=True)
+    rows = np.arange(22, dtype=np.float64).reshape(11, 2)
+    for row in rows:
+        sink.write(row)
+    sink.close()
+    data = load_chunks(path)
+    assert data.dtype.names == ("a", "b")
+    np.testing.assert_array_equal(data["a"], rows[:, 0])
+    np.testing.assert_array_equal(data["b"], rows[:, 1])
@@ -0,0 +1,93 @@
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+from metrics_exporter import CONTENT_TYPE_OPENMETRICS, ControllerMetrics, MetricsServer
+from sim_env import SimGPUEnv
+
+
+class FakeActuator:
+    def __init__(self):
+        self.failures = {}
+
+
+def _samples(text):
+    # {"name{labels}": value}，略過註解行
+    out = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            key, value = line.rsplit(" ", 1)
+            out[key] = float(value)
+    return out
+
+
+def test_gauges_follow_the_last_step_of_every_gpu():
+    env = SimGPUEnv(seed=0, n_gpus=2)
+    env.reset()
+    metrics = ControllerMetrics(env.gpu_ids, actuator=env.actuator, clock=lambda: 1234.5)
+    assert _samples(metrics.render()) == {"gpu_controller_steps_total": 0.0}
+    action = np.array([-10.0, 5.0], dtype=np.float32)
+    for _ in range(3):
+        _, reward, _, _, info = env.step(action)
+        metrics.observe_step(info, action, reward)
+    samples = _samples(metrics.render())
+    telemetry = np.asarray(info["telemetry"])
+    for k, gid in enumerate(env.gpu_ids):
+        label = f'{{gpu="{gid}"}}'
+        assert samples["gpu_controller_temperature_celsius" + label] == pytest.approx(telemetry[k, 0])
+        assert samples["gpu_controller_power_limit_watts" + label] == pytest.approx(telemetry[k, 2])
+        assert samples["gpu_controller_action_watts" + label] == action[k]
+        assert samples["gpu_controller_reward" + label] == pytest.approx(info["rewards"][k])
+    assert samples["gpu_controller_steps_total"] == 3.0
+    assert samples["gpu_controller_last_step_timestamp_seconds"] == 1234.5
+    assert samples["gpu_controller_step_latency_seconds_count"] == 0.0
+
+
+def test_latency_histogram_overruns_and_failures():
+    actuator = FakeActuator()
+    metrics = ControllerMetrics([0], actuator=actuator, latency_buckets=(0.01, 0.1))
+    info = {"telemetry": [[60.0, 0.0, 250.0, 200.0, 0.8, 100.0, 90.0]]}
+    for latency, overrun in ((0.005, False), (0.05, False), (0.5, True), (0.01, False)):
+        metrics.observe_step(dict(info, step_timing={"overrun": overrun}), [0.0], 1.0, latency=latency)
+    actuator.failures[("power_limit", 0)] = 2
+    metrics.observe_step(info, [0.0], 1.0)
+    samples = _samples(metrics.render())
+    assert samples['gpu_controller_step_latency_seconds_bucket{le="0.01"}'] == 2.0
+    assert samples['gpu_controller_step_latency_seconds_bucket{le="0.1"}'] == 3.0
+    assert samples['gpu_controller_step_latency_seconds_bucket{le="+Inf"}'] == 4.0
+    assert samples["gpu_controller_step_latency_seconds_sum"] == pytest.approx(0.565)
+    assert samples["gpu_controller_step_latency_seconds_count"] == 4.0
+    assert samples["gpu_controller_step_overruns_total"] == 1.0
+    assert samples["gpu_controller_steps_total"] == 5.0
+    assert samples['gpu_controller_actuation_failures_total{gpu="0",kind="power_limit"}'] == 2.0
+    assert samples['gpu_controller_actuation_failures_total{gpu="0",kind="fan"}'] == 0.0
+
+
+def test_openmetrics_names_counter_families_without_total():
+    metrics = ControllerMetrics([0], prefix="ctl")
+    metrics.observe_step({"telemetry": [60.0, 0.0, 250.0, 200.0, 0.8, 100.0, 90.0]}, [0.0], 1.0)
+    text = metrics.render(openmetrics=True)
+    assert text.endswith("# EOF\n")
+    assert "# TYPE ctl_steps counter" in text and "ctl_steps_total 1" in text
+    assert "# TYPE ctl_steps_total counter" in metrics.render()
+    assert "# EOF" not in metrics.render()
+
+
+def test_server_serves_both_formats():
+    metrics = ControllerMetrics([0])
+    server = MetricsServer(metrics, host="127.0.0.1", port=0).start()
+    try:
+        url = f"http://127.0.0.1:{server.port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "gpu_controller_steps_total 0" in resp.read().decode()
+        req = urllib.request.Request(url, headers={"Accept": "application/openmetrics-text"})
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            assert resp.headers["Content-Type"] == CONTENT_TYPE_OPENMETRICS
+            assert resp.read().decode().endswith("# EOF\n")
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{server.port}/other", timeout=5)
+    finally:
+        server.close()
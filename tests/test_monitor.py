@@ -0,0 +1,40 @@
+import time
+
+import numpy as np
+
+from monitor import GPUInfoMonitor
+from telemetry import FakeBackend
+
+
+def test_update_info_reads_the_backend_once_per_call():
+    backend = FakeBackend(samples=[(60, 100, 250, 260, 100), (62, 90, 240, 255, 80)])
+    monitor = GPUInfoMonitor(backend=backend)
+    monitor.update_info()
+    assert monitor.get_observation()["temp"] == 60.0
+    monitor.update_info()
+    obs = monitor.get_observation()
+    assert obs["temp"] == 62.0 and obs["power_limit"] == 255.0 and obs["fan"] == 80.0
+    assert backend.read_count == 2 and monitor.history.count == 2
+
+
+def test_sampler_fills_the_history_in_the_background():
+    backend = FakeBackend()
+    monitor = GPUInfoMonitor(backend=backend)
+    monitor.start_sampler(rate_hz=200.0)
+    try:
+        assert monitor.sampling
+        deadline = time.monotonic() + 5.0
+        while monitor.history.count < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        obs = monitor.get_observation()
+    finally:
+        monitor.stop_sampler()
+    assert not monitor.sampling
+    assert monitor.history.count >= 5
+    assert obs["temp"] == 60.0
+    times = monitor.history.window()[:, 0]
+    assert np.all(np.diff(times) >= 0.0)
+    # 取樣停止後不再讀取
+    reads = backend.read_count
+    time.sleep(0.05)
+    assert backend.read_count == reads
@@ -0,0 +1,37 @@
+import numpy as np
+
+from monitor import GPUInfoMonitor
+from sim_env import SimGPUEnv
+from telemetry import FakeBackend
+
+
+def test_monitor_reads_every_gpu_with_one_query():
+    backend = FakeBackend(gpu_ids=[0, 1, 2])
+    monitor = GPUInfoMonitor(gpu_ids=[0, 1, 2], backend=backend)
+    monitor.update_info()
+    observations = monitor.get_observations()
+    assert backend.read_count == 1
+    assert [obs["temp"] for obs in observations] == [60.0, 60.0, 60.0]
+    assert len(monitor.histories) == 3 and all(h.count == 1 for h in monitor.histories)
+
+
+def test_multi_gpu_env_stacks_observations_and_averages_rewards():
+    env = SimGPUEnv(n_gpus=2, seed=0)
+    obs, _ = env.reset()
+    assert obs.shape == (2, 7) and env.action_space.shape == (2,)
+    assert env.observation_space.contains(obs)
+    obs, reward, _, _, info = env.step(np.array([-10.0, 10.0], dtype=np.float32))
+    np.testing.assert_array_equal(obs[:, 3], [250.0, 270.0])
+    np.testing.assert_array_equal(env.pl_old, [250.0, 270.0])
+    expected = [env.reward_fn(temp=float(t), pl_old=260.0, pl_new=pl) for t, pl in zip(obs[:, 0], (250.0, 270.0))]
+    assert info["rewards"] == expected
+    assert reward == np.mean(expected)
+
+
+def test_multi_gpu_env_heats_each_card_with_its_own_power_limit():
+    env = SimGPUEnv(n_gpus=2, seed=0, power_noise=0.0)
+    env.reset()
+    env.set_power_limits([150.0, 275.0])
+    env.model.advance(600.0)
+    temps = env.get_temps()
+    assert temps.shape == (2,) and temps[0] < temps[1]
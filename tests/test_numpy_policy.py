@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+import pytest
+
+from numpy_policy import NumpyPolicy, export_policy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL = os.path.join(ROOT, "modelA.zip")
+
+pytest.importorskip("stable_baselines3")
+pytestmark = pytest.mark.skipif(not os.path.exists(MODEL), reason="modelA.zip not available")
+
+
+@pytest.fixture(scope="module")
+def models():
+    from stable_baselines3 import PPO
+    model = PPO.load(MODEL, device="cpu", custom_objects={"lr_schedule": 0.0, "clip_range": 0.0})
+    return model, export_policy(MODEL)
+
+
+def test_matches_ppo_predict_on_a_batch(models):
+    model, policy = models
+    space = model.observation_space
+    space.seed(0)
+    obs = np.stack([space.sample() for _ in range(2000)])
+    expected, _ = model.predict(obs, deterministic=True)
+    actual, _ = policy.predict(obs)
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, atol=1e-5)
+
+
+def test_single_observation_shape_and_roundtrip(models, tmp_path):
+    model, policy = models
+    obs = model.observation_space.sample()
+    expected, _ = model.predict(obs, deterministic=True)
+    path = str(tmp_path / "policy.npz")
+    policy.save(path)
+    action, state = NumpyPolicy.load(path).predict(obs)
+    assert state is None
+    assert action.shape == model.action_space.shape
+    np.testing.assert_allclose(action, expected, atol=1e-5)
@@ -0,0 +1,95 @@
+import numpy as np
+
+from numpy_policy import NumpyPolicy
+from policy_lut import PolicyLUT, build_lut, compile_lut, policy_lipschitz
+
+LO = np.array([30.0, 0.0, 100.0])
+HI = np.array([95.0, 100.0, 275.0])
+
+
+def _policy(seed=0):
+    rng = np.random.default_rng(seed)
+    layers = [(rng.normal(0.0, 0.05, (16, 3)), rng.normal(0.0, 0.1, 16)),
+              (rng.normal(0.0, 0.3, (16, 16)), rng.normal(0.0, 0.1, 16))]
+    action_layer = (rng.normal(0.0, 2.0, (1, 16)), np.zeros(1))
+    return NumpyPolicy(layers, action_layer, "tanh", (3,), [-30.0], [30.0])
+
+
+def _predict_fn(policy):
+    return lambda obs: policy.predict(obs)[0]
+
+
+def _nodes(lut):
+    axes = [np.linspace(a, b, n) for a, b, n in zip(lut.lo, lut.hi, lut.points)]
+    return np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(axes))
+
+
+def test_exact_on_grid_nodes():
+    predict_fn = _predict_fn(_policy())
+    lut = build_lut(predict_fn, LO, HI, [5, 4, 6])
+    nodes = _nodes(lut)
+    np.testing.assert_allclose(lut.predict(nodes)[0], predict_fn(nodes), atol=1e-5)
+
+
+def test_linear_policies_are_reproduced_everywhere():
+    weights = np.array([0.5, -0.2, 0.1])
+    lut = build_lut(lambda obs: obs @ weights, LO, HI, [3, 3, 3])
+    obs = np.random.default_rng(0).uniform(LO, HI, size=(500, 3))
+    np.testing.assert_allclose(lut.predict(obs)[0][:, 0], obs @ weights, atol=1e-3)
+
+
+def test_single_observation_matches_the_batch_path():
+    lut = build_lut(_predict_fn(_policy()), LO, HI, [5, 4, 6])
+    # 含格子範圍外的輸入 (夾到邊界)
+    obs = np.random.default_rng(1).uniform(LO - 10.0, HI + 10.0, size=(200, 3))
+    batch = lut.predict(obs)[0]
+    for x, expected in zip(obs, batch):
+        action, state = lut.predict(x)
+        assert action.shape == (1,) and state is None
+        np.testing.assert_allclose(action, expected, atol=1e-4)
+
+
+def test_fixed_dimensions_use_their_single_value():
+    weights = np.array([0.5, -0.2, 0.1])
+    lut = build_lut(lambda obs: obs @ weights, LO, HI, [4, 1, 4])
+    obs = np.array([[60.0, 80.0, 200.0]])
+    np.testing.assert_allclose(lut.predict(obs)[0][0, 0], 60.0 * 0.5 + 0.1 * 200.0, atol=1e-3)
+
+
+def test_lipschitz_constant_bounds_the_policy():
+    policy = _policy()
+    lipschitz = policy_lipschitz(policy)
+    rng = np.random.default_rng(2)
+    x = rng.uniform(LO, HI, size=(2000, 3))
+    y = x + rng.normal(0.0, 5.0, size=x.shape)
+    diff = np.abs(policy.predict(x)[0] - policy.predict(y)[0])[:, 0]
+    assert np.all(diff <= lipschitz * np.linalg.norm(x - y, axis=1) + 1e-4)
+
+
+def test_bound_covers_the_sampled_error():
+    policy = _policy()
+    lut = compile_lut(_predict_fn(policy), LO, HI, [5, 4, 6], verify_samples=20000, verbose=False,
+                      lipschitz=policy_lipschitz(policy))
+    report = lut.meta["verify"]
+    assert 0.0 < report["max_error"] <= report["bound"]
+    obs = np.random.default_rng(3).uniform(LO, HI, size=(50000, 3))
+    err = np.abs(lut.predict(obs)[0] - policy.predict(obs)[0]).max()
+    assert err <= report["bound"]
+
+
+def test_target_error_refines_the_grid():
+    predict_fn = _predict_fn(_policy())
+    coarse = compile_lut(predict_fn, LO, HI, [3, 3, 3], verify_samples=5000, verbose=False)
+    target = coarse.meta["verify"]["max_error"] / 4.0
+    fine = compile_lut(predict_fn, LO, HI, [3, 3, 3], target_error=target, verify_samples=5000, verbose=False)
+    assert fine.entries > coarse.entries
+    assert fine.meta["verify"]["max_error"] <= target
+
+
+def test_save_and_load(tmp_path):
+    lut = build_lut(_predict_fn(_policy()), LO, HI, [5, 4, 6])
+    path = str(tmp_path / "lut.npz")
+    lut.save(path)
+    loaded = PolicyLUT.load(path)
+    obs = np.random.default_rng(4).uniform(LO, HI, size=(100, 3))
+    np.testing.assert_array_equal(loaded.predict(obs)[0], lut.predict(obs)[0])
@@ -0,0 +1,54 @@
+import pytest
+
+from preconditioner import Preconditioner
+from sim_env import SimGPUEnv
+from workload import SimLoad
+
+
+def _env():
+    env = SimGPUEnv(seed=0, init_temp=(40.0, 40.0), init_util=0.0)
+    env.reset()
+    return env
+
+
+def _preconditioner(env, target_temp, temps=None, **kwargs):
+    def read_temp():
+        temp = env.get_temp()
+        if temps is not None:
+            temps.append(temp)
+        return temp
+    return Preconditioner(read_temp, SimLoad(env.model), target_temp=target_temp,
+                          clock=env._clock, sleep=env._wait, verbose=0, **kwargs)
+
+
+def test_reaches_the_target_without_overshoot_and_restores_the_load():
+    env = _env()
+    temps = []
+    pre = _preconditioner(env, 60.0, temps)
+    assert pre.run()
+    assert pre.status.state == "ready" and pre.ready.is_set()
+    assert pre.status.temp == pytest.approx(60.0, abs=1.0)
+    assert max(temps) <= 62.0
+    # 沒有 hold：ready 之後負載還原成開始前的設定
+    assert env.model.util[0] == 0.0
+
+
+def test_unreachable_target_is_reported_as_saturated():
+    env = _env()
+    pre = _preconditioner(env, 90.0, max_secs=7200.0)
+    assert not pre.run()
+    assert pre.status.state == "saturated" and pre.status.duty == 1.0
+    assert not pre.ready.is_set()
+
+
+def test_background_hold_until_closed():
+    env = _env()
+    pre = _preconditioner(env, 55.0, hold=True)
+    pre.start()
+    try:
+        assert pre.wait_ready(timeout=60.0)
+        assert env.model.util[0] > 0.0
+    finally:
+        pre.close()
+    assert pre.status.state == "stopped"
+    assert env.model.util[0] == 0.0
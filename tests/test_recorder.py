@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from recorder import EVENT_RESET, EVENT_STEP, ReplayGPUEnv, TrajectoryRecorder, load_trace
+from sim_env import SimGPUEnv
+
+
+def _record(path, episodes=(5, 3), seed=0, **env_kwargs):
+    rng = np.random.default_rng(seed)
+    env = TrajectoryRecorder(SimGPUEnv(seed=seed, **env_kwargs), str(path), flush_every=4)
+    recorded = []
+    for steps in episodes:
+        obs, _ = env.reset()
+        episode = [(np.array(obs), None, None)]
+        for _ in range(steps):
+            action = rng.uniform(-15.0, 15.0, size=env.action_space.shape).astype(np.float32)
+            obs, reward, _, _, _ = env.step(action)
+            episode.append((np.array(obs), action, reward))
+        recorded.append(episode)
+    env.close()
+    return recorded
+
+
+def test_trace_holds_every_reset_and_step(tmp_path):
+    path = tmp_path / "trace.bin"
+    recorded = _record(path)
+    records, meta = load_trace(str(path))
+    assert len(records) == 10 and meta["n_gpus"] == 1
+    assert records["event"].tolist() == [EVENT_RESET] + [EVENT_STEP] * 5 + [EVENT_RESET] + [EVENT_STEP] * 3
+    assert records["episode"].tolist() == [0] * 6 + [1] * 4
+    flat = [rec for episode in recorded for rec in episode]
+    np.testing.assert_array_equal(records["obs"], np.array([obs for obs, _, _ in flat]))
+    np.testing.assert_allclose(records["reward"][1:6], [r for _, _, r in flat[1:6]], rtol=1e-6)
+    # 遙測欄位就是觀測的原始值
+    np.testing.assert_array_equal(records["temp"][:, 0], records["obs"][:, 0])
+
+
+def test_partial_record_is_ignored_and_truncated_on_append(tmp_path):
+    path = tmp_path / "trace.bin"
+    _record(path, episodes=(2,))
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+    assert len(load_trace(str(path))[0]) == 3
+    _record(path, episodes=(2,))
+    records, _ = load_trace(str(path))
+    assert len(records) == 6
+    assert records["event"].tolist() == [EVENT_RESET, EVENT_STEP, EVENT_STEP] * 2
+
+
+def test_replay_reproduces_observations_and_rewards(tmp_path):
+    path = tmp_path / "trace.bin"
+    recorded = _record(path)
+    env = ReplayGPUEnv(str(path))
+    for episode in recorded:
+        obs, _ = env.reset()
+        np.testing.assert_array_equal(obs, episode[0][0])
+        for k, (expected_obs, action, reward) in enumerate(episode[1:]):
+            obs, r, terminated, truncated, info = env.step(action)
+            np.testing.assert_array_equal(obs, expected_obs)
+            assert r == pytest.approx(reward)
+            assert r == pytest.approx(info["recorded_reward"])
+            assert not terminated
+            assert truncated == (k == len(episode) - 2)
+    # loop=True：回到第一個回合
+    obs, info = env.reset()
+    assert info["trace_index"] == 0
+
+
+def test_replay_rebuilds_observations_from_raw_telemetry(tmp_path):
+    path = tmp_path / "trace.bin"
+    recorded = _record(path, episodes=(6,))
+    env = ReplayGPUEnv(str(path), rebuild_obs=True)
+    obs, _ = env.reset()
+    np.testing.assert_allclose(obs, recorded[0][0][0], atol=1e-5)
+    for expected_obs, action, _ in recorded[0][1:]:
+        obs = env.step(action)[0]
+        np.testing.assert_allclose(obs, expected_obs, atol=1e-5)
+
+
+def test_counterfactual_rewards_use_the_agents_action(tmp_path):
+    path = tmp_path / "trace.bin"
+    _record(path, episodes=(1,))
+    records, _ = load_trace(str(path))
+    env = ReplayGPUEnv(str(path), follow_recorded_actions=False)
+    env.reset()
+    pl_old = env.pl_old
+    _, reward, _, _, _ = env.step(np.array([-40.0], dtype=np.float32))
+    temp = float(records["temp"][1, 0])
+    assert reward == env.reward_fn(temp=temp, pl_old=pl_old, pl_new=pl_old - 40.0)
+    with pytest.raises(RuntimeError):
+        env.step(np.zeros(1, dtype=np.float32))
@@ -0,0 +1,54 @@
+import numpy as np
+
+from recorder import TrajectoryRecorder
+from rescore import load_log, load_transitions, rescore
+from reward import get_reward
+from sim_env import SimGPUEnv
+
+HEADER = "timestep,temp,power_limit,reward,slope_3s,power_draw,eta,fan,util\n"
+
+
+def _row(step, temp, pl, reward=0.0):
+    return f"{step},{temp},{pl},{reward},0.0,200.0,0.8,100.0,100.0\n"
+
+
+def test_runs_are_split_on_headers_and_timestep_resets(tmp_path):
+    path = tmp_path / "training_log.csv"
+    path.write_text(
+        HEADER + _row(1, 60, 250) + _row(2, 61, 255)
+        + HEADER + _row(1, 70, 260) + _row(2, 71, 262)
+        + _row(1, 65, 240)
+    )
+    cols = load_log(str(path))
+    assert cols["run"].tolist() == [0, 0, 1, 1, 2]
+    data = load_transitions(str(path))
+    # 每個 run 的第一步沒有前一個 PL
+    assert data["pl_old"].tolist() == [250.0, 250.0, 260.0, 260.0, 240.0]
+    assert data["pl_new"].tolist() == [250.0, 255.0, 260.0, 262.0, 240.0]
+
+
+def test_rescore_matches_the_scalar_variants(tmp_path):
+    path = tmp_path / "training_log.csv"
+    rng = np.random.default_rng(0)
+    rows = [_row(i + 1, t, pl) for i, (t, pl) in enumerate(zip(rng.uniform(50, 85, 50), rng.uniform(150, 275, 50)))]
+    path.write_text(HEADER + "".join(rows))
+    data = load_transitions(str(path))
+    scores = rescore(data, ["default", "reward_1"])
+    for name in ("default", "reward_1"):
+        scalar = get_reward(name).scalar
+        expected = [scalar(temp=t, pl_old=o, pl_new=n) for t, o, n in zip(data["temp"], data["pl_old"], data["pl_new"])]
+        np.testing.assert_allclose(scores[name], expected, rtol=1e-12)
+
+
+def test_rescoring_a_trace_reproduces_the_recorded_rewards(tmp_path):
+    path = str(tmp_path / "trace.bin")
+    env = TrajectoryRecorder(SimGPUEnv(seed=0), path)
+    rng = np.random.default_rng(0)
+    for _ in range(2):
+        env.reset()
+        for _ in range(8):
+            env.step(rng.uniform(-15.0, 15.0, size=1).astype(np.float32))
+    env.close()
+    data = load_transitions(path)
+    assert len(data["reward"]) == 16 and data["run"].tolist() == [0] * 8 + [1] * 8
+    np.testing.assert_allclose(rescore(data, ["default"])["default"], data["reward"], rtol=1e-5, atol=1e-6)
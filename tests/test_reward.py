@@ -0,0 +1,40 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from reward import get_reward
+
+
+def _grid():
+    # 含各段的邊界 (70 / 75 / 80 度、|ΔPL| = 30W、PL 100 / 275W)
+    temps = [40.0, 69.9, 70.0, 72.5, 74.99, 75.0, 77.0, 79.99, 80.0, 90.0]
+    pl_olds = [100.0, 150.0, 212.5, 275.0]
+    deltas = [-45.0, -30.0, -29.9, -10.0, -1.0, 0.0, 1.0, 10.0, 29.9, 30.0]
+    rows = [(t, o, o + d) for t, o, d in itertools.product(temps, pl_olds, deltas)]
+    rng = np.random.default_rng(0)
+    n = 2000
+    rows += list(zip(rng.uniform(30, 95, n), rng.uniform(100, 275, n), rng.uniform(60, 300, n)))
+    return np.array(rows).T
+
+
+@pytest.mark.parametrize("name", ["default", "reward_1"])
+def test_batch_matches_scalar(name):
+    variant = get_reward(name)
+    temp, pl_old, pl_new = _grid()
+    batch = variant.batch(temp, pl_old, pl_new)
+    scalar = [variant.scalar(temp=t, pl_old=o, pl_new=n) for t, o, n in zip(temp, pl_old, pl_new)]
+    np.testing.assert_allclose(batch, scalar, rtol=1e-12, atol=1e-12)
+
+
+def test_batch_broadcasts_over_a_scalar_pl_old():
+    variant = get_reward("default")
+    temp = np.array([60.0, 76.0, 80.0])
+    batch = variant.batch(temp, 200.0, 195.0)
+    assert batch.shape == (3,)
+    assert batch.tolist() == [variant.scalar(t, 200.0, 195.0) for t in temp]
+
+
+def test_unknown_variant():
+    with pytest.raises(KeyError):
+        get_reward("nope")
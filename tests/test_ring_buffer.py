@@ -0,0 +1,41 @@
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+
+def test_window_is_contiguous_across_wraparound():
+    buf = RingBuffer(5, 2)
+    for i in range(12):
+        buf.append([i, -i])
+    window = buf.window(4)
+    assert window.tolist() == [[8, -8], [9, -9], [10, -10], [11, -11]]
+    assert len(buf) == 5 and buf.count == 12
+    assert buf.latest().tolist() == [11, -11]
+    assert buf.row(9).tolist() == [9, -9]
+
+
+def test_window_is_a_view_until_the_writer_wraps():
+    buf = RingBuffer(4, 1)
+    for i in range(3):
+        buf.append(i)
+    window = buf.window(2)
+    assert np.shares_memory(window, buf._buf)
+    assert window.ravel().tolist() == [1, 2]
+    # capacity - n 筆之內 view 不變，之後被覆寫
+    buf.append(3)
+    buf.append(4)
+    assert window.ravel().tolist() == [1, 2]
+    for i in range(5, 8):
+        buf.append(i)
+    assert window.ravel().tolist() != [1, 2]
+
+
+def test_window_clamps_to_available_rows_and_clear():
+    buf = RingBuffer(8, 1)
+    assert buf.latest() is None
+    assert buf.window().shape == (0, 1)
+    buf.append(1.0)
+    buf.append(2.0)
+    assert buf.window(5).ravel().tolist() == [1.0, 2.0]
+    buf.clear()
+    assert len(buf) == 0 and buf.window().shape == (0, 1)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from rolling_stats import RollingStats
+
+
+def _stats(window=50, rebase_every=4096):
+    return RollingStats(
+        ("temp", "reward"), window=window,
+        sketch_ranges={"temp": (0.0, 120.0, 480)},
+        thresholds={"hot": ("temp", 75.0)},
+        rebase_every=rebase_every
+    )
+
+
+@pytest.mark.parametrize("rebase_every", [4096, 7])
+def test_aggregates_match_the_last_window_rows(rebase_every):
+    rng = np.random.default_rng(0)
+    stats = _stats(rebase_every=rebase_every)
+    rows = np.column_stack((rng.uniform(40.0, 90.0, 333), rng.normal(0.0, 1.0, 333)))
+    for i, row in enumerate(rows):
+        stats.append(row)
+        window = rows[max(0, i - 49):i + 1]
+        if i % 11:
+            continue
+        np.testing.assert_allclose(stats.mean(), window.mean(axis=0), atol=1e-9)
+        assert stats.min("temp") == window[:, 0].min() and stats.max("reward") == window[:, 1].max()
+        assert stats.fraction("hot") == pytest.approx(np.mean(window[:, 0] >= 75.0))
+        # 分箱寬 0.25°C：回傳 bin 中心，誤差不超過半個 bin
+        exact = np.percentile(window[:, 0], 95, method="inverted_cdf")
+        assert abs(stats.percentile("temp", 95) - exact) <= 0.125 + 1e-9
+    assert len(stats) == 50 and stats.count == 333
+
+
+def test_summary_names_every_aggregate():
+    stats = _stats()
+    for temp in (70.0, 80.0):
+        stats.append((temp, 1.0))
+    summary = stats.summary()
+    assert summary["temp_mean"] == 75.0 and summary["temp_max"] == 80.0 and summary["reward_min"] == 1.0
+    assert summary["hot_frac"] == 0.5
+    assert {"temp_p50", "temp_p95", "temp_p99"} <= set(summary)
+
+
+def test_empty_and_clear():
+    stats = _stats()
+    assert stats.mean("temp") == 0.0 and stats.max("temp") == 0.0 and stats.percentile("temp", 99) == 0.0
+    stats.append((90.0, 2.0))
+    stats.clear()
+    assert len(stats) == 0 and stats.fraction("hot") == 0.0
+    stats.append((60.0, 1.0))
+    assert stats.max("temp") == 60.0 and stats.mean("reward") == 1.0
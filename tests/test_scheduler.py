@@ -0,0 +1,44 @@
+import pytest
+
+from scheduler import StepScheduler
+
+
+class FakeClock:
+    def __init__(self, t=0.0):
+        self.t = t
+        self.sleeps = []
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.t += seconds
+
+
+def test_on_time_steps_sleep_until_the_deadline():
+    clock = FakeClock()
+    sched = StepScheduler(1.0, clock=clock, sleep=clock.sleep)
+    sched.start()
+    clock.t += 0.25
+    timing = sched.wait()
+    assert clock.t == 1.0
+    assert timing.busy == 0.25 and timing.period == 1.0
+    assert not timing.overrun and timing.missed == 0
+
+
+def test_overrun_realigns_to_the_original_phase():
+    clock = FakeClock(10.0)
+    sched = StepScheduler(1.0, clock=clock, sleep=clock.sleep)
+    sched.start()                        # deadlines 11, 12, 13 ...
+    clock.t += 2.5                       # 12.5：錯過 11 與 12
+    timing = sched.wait()
+    assert timing.overrun and timing.missed == 1
+    assert timing.jitter == pytest.approx(0.5)
+    assert sched.overruns == 1
+    clock.t += 0.1
+    timing = sched.wait()
+    # 不追趕，仍對齊到整數秒的相位
+    assert clock.t == pytest.approx(13.0)
+    assert not timing.overrun and timing.jitter == pytest.approx(0.0)
+
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from sim_env import SimGPUEnv, ThermalModel
+
+
+def _steady(model, seconds=600.0):
+    model.advance(seconds)
+    return model.observe()
+
+
+def test_default_model_settles_near_65c_at_full_fan_and_255w():
+    model = ThermalModel(power_noise=0.0)
+    model.set_util(100.0)
+    model.set_fan(100.0)
+    model.set_power_limit(255.0)
+    temp, util, draw, pl, fan = _steady(model)
+    assert temp[0] == pytest.approx(65.0, abs=1.0)
+    assert draw[0] == pytest.approx(255.0, abs=0.5)
+    assert (util[0], pl[0], fan[0]) == (100.0, 255.0, 100.0)
+
+
+def test_batched_gpus_respond_to_their_own_inputs():
+    model = ThermalModel(n=3, seed=0, power_noise=0.0)
+    model.set_power_limit(np.array([150.0, 200.0, 250.0]))
+    temp = _steady(model)[0]
+    assert temp[0] < temp[1] < temp[2]
+    # 風扇轉速越低越熱
+    model.set_fan(30.0, index=1)
+    temp_slow_fan = _steady(model)[0]
+    assert temp_slow_fan[1] > temp[1]
+    assert temp_slow_fan[0] == temp[0] and temp_slow_fan[2] == temp[2]
+
+
+def test_power_limit_is_clipped_and_quantised_like_nvidia_smi():
+    model = ThermalModel()
+    model.set_power_limit(212.7)
+    assert model.power_limit[0] == 212.0
+    model.set_power_limit(400.0)
+    assert model.power_limit[0] == 275.0
+
+
+def test_observation_is_quantised_and_seeded():
+    a = ThermalModel(n=4, seed=3, temp_noise=0.5)
+    b = ThermalModel(n=4, seed=3, temp_noise=0.5)
+    obs_a, obs_b = a.observe(), b.observe()
+    for col_a, col_b in zip(obs_a, obs_b):
+        np.testing.assert_array_equal(col_a, col_b)
+    np.testing.assert_array_equal(obs_a[0], np.round(obs_a[0]))
+
+
+def test_sim_env_step_advances_simulated_time_and_applies_the_action():
+    env = SimGPUEnv(step_time=2.0, seed=0)
+    obs, _ = env.reset()
+    assert env.observation_space.contains(obs)
+    t0 = env.model.time
+    pl_old = env.pl_old
+    obs, reward, terminated, truncated, _ = env.step(np.array([5.0], dtype=np.float32))
+    assert env.model.time == pytest.approx(t0 + 2.0)
+    assert obs[3] == pl_old + 5.0
+    assert reward == env.reward_fn(temp=obs[0], pl_old=pl_old, pl_new=pl_old + 5.0)
+    assert not terminated and not truncated
@@ -0,0 +1,45 @@
+import numpy as np
+
+from reward import compute_reward_batch
+from sim_vec_env import SimGPUVecEnv
+
+
+def test_step_is_one_batched_update_with_batched_rewards():
+    env = SimGPUVecEnv(num_envs=8, seed=0)
+    obs = env.reset()
+    assert obs.shape == (8,) + env.observation_space.shape and obs.dtype == np.float32
+    assert np.all(obs[:, 3] == 260.0)
+    actions = np.random.default_rng(1).uniform(-10.0, 10.0, size=(8, 1)).astype(np.float32)
+    obs, rewards, dones, _ = env.step(actions)
+    pl_new = np.clip(260.0 + actions[:, 0].astype(np.float64), 100.0, 275.0)
+    np.testing.assert_array_equal(obs[:, 3], np.floor(pl_new))
+    np.testing.assert_allclose(rewards, compute_reward_batch(obs[:, 0], 260.0, pl_new).astype(np.float32))
+    assert not dones.any()
+    np.testing.assert_array_equal(env.pl_old, pl_new)
+
+
+def test_slope_is_the_least_squares_slope_of_the_recent_steps():
+    env = SimGPUVecEnv(num_envs=4, seed=0, step_time=2.0)
+    first = env.reset()
+    assert np.all(first[:, 2] == 0.0)
+    obs, _, _, _ = env.step(np.zeros((4, 1), dtype=np.float32))
+    np.testing.assert_allclose(obs[:, 2], (obs[:, 0] - first[:, 0]) / 2.0, atol=1e-5)
+
+
+def test_truncated_envs_restart_with_their_own_start_pl_and_current_fan():
+    env = SimGPUVecEnv(num_envs=4, seed=0, max_episode_steps=3)
+    env.set_options([{"power_limit": 200.0}, {"power_limit": 250.0}, {}, {}])
+    obs = env.reset()
+    np.testing.assert_array_equal(obs[:, 3], [200.0, 250.0, 260.0, 260.0])
+    env.set_fan_speed(30.0)
+    for _ in range(3):
+        obs, _, dones, infos = env.step(np.full((4, 1), 5.0, dtype=np.float32))
+    assert dones.all()
+    for info, pl in zip(infos, [215.0, 265.0, 275.0, 275.0]):
+        assert info["TimeLimit.truncated"]
+        assert info["terminal_observation"][3] == pl
+    # 自動 reset：起始 PL 用各自的 options，風扇維持目前設定
+    np.testing.assert_array_equal(obs[:, 3], [200.0, 250.0, 260.0, 260.0])
+    np.testing.assert_array_equal(env.pl_old, [200.0, 250.0, 260.0, 260.0])
+    assert np.all(env.model.fan == 30.0) and np.all(obs[:, 6] == 30.0)
+    assert np.all(env.episode_steps == 0)
@@ -0,0 +1,156 @@
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from actuator import Actuator
+from sim_env import SimGPUEnv
+from spans import JsonLinesExporter, LoggerExporter, SpanHistogram, Spans
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self):
+        return self.t
+
+
+class FakeLogger:
+    def __init__(self):
+        self.records = {}
+
+    def record(self, key, value):
+        self.records[key] = value
+
+
+class FakeWriter:
+    name = "fake"
+
+    def set_power_limits(self, targets):
+        return {gid: True for gid in targets}
+
+    def set_fans(self, targets):
+        return {fan: True for fan in targets}
+
+
+def test_histogram_percentiles_are_within_one_bucket():
+    hist = SpanHistogram()
+    for ms in np.linspace(1.0, 100.0, 1000):
+        hist.add(ms * 1e-3)
+    assert hist.count == 1000 and hist.max == pytest.approx(0.1)
+    assert hist.percentile(50) == pytest.approx(0.0505, rel=0.05)
+    assert hist.percentile(90) == pytest.approx(0.0901, rel=0.05)
+    assert hist.percentile(100) <= hist.max
+    hist.reset()
+    assert hist.count == 0 and hist.percentile(50) == 0.0
+
+
+def test_disabled_spans_record_nothing():
+    clock = FakeClock()
+    spans = Spans(clock=clock)
+    t0 = spans.begin()
+    spans.enable()
+    clock.t += 1.0
+    # 關閉時開始的 span 即使中途開啟也略過
+    spans.end("update_info", t0)
+    assert spans.snapshot() == {} and spans.pop_step() == {}
+
+
+def test_step_totals_and_snapshot():
+    clock = FakeClock()
+    spans = Spans(enabled=True, clock=clock)
+    for dt in (0.001, 0.003):
+        t0 = spans.begin()
+        clock.t += dt
+        spans.end("update_info", t0)
+    t0 = spans.begin()
+    clock.t += 0.002
+    spans.end("custom", t0)
+    assert spans.pop_step() == pytest.approx({"update_info": 0.004, "custom": 0.002})
+    assert spans.pop_step() == {}
+    snap = spans.snapshot()
+    assert set(snap) == {"update_info", "custom"}
+    assert snap["update_info"]["count"] == 2
+    assert snap["update_info"]["mean"] == pytest.approx(0.002)
+    assert snap["update_info"]["max"] == pytest.approx(0.003)
+    assert snap["update_info"]["last"] == pytest.approx(0.003)
+    spans.reset()
+    assert spans.snapshot() == {}
+
+
+def test_spans_from_worker_threads_are_never_lost():
+    spans = Spans(enabled=True)
+    n_threads, n_spans = 4, 2000
+    popped = []
+
+    def worker():
+        for _ in range(n_spans):
+            spans.end("actuator_write", spans.begin())
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        popped.append(spans.pop_step())
+    for t in threads:
+        t.join()
+    popped.append(spans.pop_step())
+    hist = spans.histograms["actuator_write"]
+    assert hist.count == n_threads * n_spans
+    assert sum(p.get("actuator_write", 0.0) for p in popped) == pytest.approx(hist.total)
+
+
+def test_exporters_run_on_their_interval(tmp_path):
+    clock = FakeClock()
+    spans = Spans(enabled=True, clock=clock)
+    logger = FakeLogger()
+    path = tmp_path / "spans.jsonl"
+    spans.add_exporter(LoggerExporter(logger), every_secs=10.0)
+    spans.add_exporter(JsonLinesExporter(str(path)), every_secs=30.0)
+    t0 = spans.begin()
+    clock.t += 0.002
+    spans.end("compute_reward", t0)
+
+    clock.t += 5.0
+    spans.maybe_export()
+    assert logger.records == {}
+    clock.t += 5.0
+    spans.maybe_export()
+    assert logger.records["timing/compute_reward/mean_ms"] == pytest.approx(2.0)
+    assert set(logger.records) == {f"timing/compute_reward/{s}_ms" for s in ("mean", "p50", "p99", "max")}
+    assert path.read_text() == ""
+    clock.t += 20.0
+    spans.maybe_export()
+    spans.close()
+    lines = path.read_text().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["spans"]["compute_reward"]["count"] == 1
+
+
+def test_env_reports_hot_path_spans_when_instrumented():
+    env = SimGPUEnv(seed=0)
+    env.reset()
+    _, _, _, _, info = env.step(np.zeros(1, dtype=np.float32))
+    assert "spans" not in info
+    env.set_instrumentation(True)
+    _, _, _, _, info = env.step(np.zeros(1, dtype=np.float32))
+    assert {"set_power_limit", "update_info", "compute_reward", "build_obs"} <= set(info["spans"])
+    assert all(v >= 0.0 for v in info["spans"].values())
+    assert env.spans.snapshot()["update_info"]["count"] == 1
+    env.set_instrumentation(False)
+    _, _, _, _, info = env.step(np.zeros(1, dtype=np.float32))
+    assert "spans" not in info
+    env.close()
+
+
+def test_actuator_records_each_power_limit_write():
+    spans = Spans(enabled=True)
+    act = Actuator([0, 1], writer=FakeWriter(), async_mode=False, spans=spans)
+    act.submit_power_limits({0: 200, 1: 200})
+    act.submit_power_limits({0: 200, 1: 200})   # no-op：不寫入
+    act.submit_power_limits({0: 210, 1: 200})
+    assert spans.snapshot()["actuator_write"]["count"] == 2
+    assert set(spans.pop_step()) == {"actuator_write"}
+    act.close()
@@ -0,0 +1,38 @@
+import pytest
+
+from telemetry import DEFAULT_SAMPLE, FakeBackend, GPUSample, make_backend, parse_smi_line
+
+
+def test_parse_smi_line():
+    sample = parse_smi_line("63, 98, 251.37, 260.00, 100")
+    assert sample == GPUSample(63.0, 98.0, 251.37, 260.0, 100.0)
+
+
+def test_parse_smi_line_without_fan_reading():
+    # 被動散熱的卡 fan.speed 為 "[N/A]"
+    assert parse_smi_line("40, 0, 30.5, 250.00, [N/A]").fan_speed == 0.0
+
+
+@pytest.mark.parametrize("line", ["63, 98", "63, x, 251, 260, 100"])
+def test_parse_smi_line_falls_back_to_the_default_sample(line):
+    assert parse_smi_line(line) == DEFAULT_SAMPLE
+
+
+def test_fake_backend_replays_samples_then_repeats_the_last():
+    backend = FakeBackend(samples=[(60, 100, 250, 260, 100), (61, 100, 251, 260, 100)])
+    temps = [backend.read().temp for _ in range(4)]
+    assert temps == [60.0, 61.0, 61.0, 61.0]
+    assert backend.read_count == 4
+
+
+def test_fake_backend_set_overrides_the_next_read():
+    backend = FakeBackend()
+    backend.set(temp=80)
+    sample = backend.read()
+    assert sample.temp == 80.0 and sample.power_limit == 260.0
+
+
+def test_make_backend():
+    assert isinstance(make_backend("fake"), FakeBackend)
+    with pytest.raises(ValueError):
+        make_backend("nope")
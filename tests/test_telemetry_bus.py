@@ -0,0 +1,148 @@
+import subprocess
+import sys
+import time
+import uuid
+from multiprocessing import shared_memory
+
+import pytest
+
+from monitor import GPUInfoMonitor
+from telemetry import FakeBackend, GPUSample
+from telemetry_bus import (H_PID, H_SEQ, BusReader, BusWriter, SharedMemoryBackend, StaleTelemetryError,
+                           TelemetryDaemon)
+
+
+@pytest.fixture
+def bus_name():
+    return f"test-bus-{uuid.uuid4().hex[:12]}"
+
+
+def _sample(temp, pl=250.0):
+    return GPUSample(temp, 90.0, 200.0, pl, 70.0)
+
+
+def test_readers_see_the_newest_row_of_every_gpu(bus_name):
+    writer = BusWriter(bus_name, gpu_ids=[0, 1, 2], capacity=4)
+    try:
+        backend = SharedMemoryBackend(gpu_ids=[2, 0], bus=bus_name, max_age=None)
+        assert backend.read_all() == [GPUSample(0.0, 0.0, 0.0, 150.0, 0.0)] * 2
+        for k in range(6):
+            writer.publish(time.time(), [_sample(50.0 + k), _sample(60.0 + k), _sample(70.0 + k)])
+        assert backend.read_all() == [_sample(75.0), _sample(55.0)]
+        count, rows = backend.bus.snapshot()
+        assert count == 6 and rows.shape == (3, 6)
+        # 每張卡的 history 是 shared memory 上的唯讀 RingBuffer
+        ring = backend.rings()[0]
+        assert len(ring) == 4
+        assert ring.window(4)[:, 1].tolist() == [72.0, 73.0, 74.0, 75.0]
+        with pytest.raises(TypeError):
+            ring.append([0.0] * 6)
+        backend.close()
+    finally:
+        writer.close()
+
+
+def test_missing_gpus_and_foreign_segments_are_rejected(bus_name):
+    writer = BusWriter(bus_name, gpu_ids=[0, 1])
+    try:
+        with pytest.raises(ValueError):
+            SharedMemoryBackend(gpu_ids=[0, 3], bus=bus_name, max_age=None)
+    finally:
+        writer.close()
+    shm = shared_memory.SharedMemory(name=bus_name, create=True, size=256)
+    try:
+        with pytest.raises(RuntimeError):
+            BusReader(bus_name)
+    finally:
+        shm.close()
+        shm.unlink()
+    with pytest.raises(FileNotFoundError):
+        BusReader(bus_name)
+
+
+def test_old_samples_are_stale(bus_name):
+    writer = BusWriter(bus_name, gpu_ids=[0])
+    try:
+        writer.publish(time.time() - 60.0, [_sample(50.0)])
+        with pytest.raises(StaleTelemetryError):
+            SharedMemoryBackend(bus=bus_name, max_age=5.0)
+        writer.publish(time.time(), [_sample(51.0)])
+        backend = SharedMemoryBackend(bus=bus_name, max_age=5.0)
+        assert backend.read_all()[0].temp == 51.0
+        # daemon 停住：控制迴圈不能繼續用凍結的溫度
+        writer.publish(time.time() - 60.0, [_sample(52.0)])
+        with pytest.raises(StaleTelemetryError):
+            backend.read_all()
+        backend.close()
+    finally:
+        writer.close()
+
+
+def test_snapshot_times_out_when_the_writer_died_mid_publish(bus_name):
+    writer = BusWriter(bus_name, gpu_ids=[0])
+    try:
+        writer.publish(time.time(), [_sample(50.0)])
+        reader = BusReader(bus_name)
+        writer.header[H_SEQ] += 1
+        with pytest.raises(TimeoutError):
+            reader.snapshot(timeout=0.05)
+        reader.close()
+    finally:
+        writer.close()
+
+
+def test_live_writer_is_not_replaced_but_a_dead_one_is(bus_name):
+    writer = BusWriter(bus_name, gpu_ids=[0])
+    try:
+        with pytest.raises(RuntimeError):
+            BusWriter(bus_name, gpu_ids=[0])
+        backend = FakeBackend(gpu_ids=[0])
+        with pytest.raises(RuntimeError):
+            TelemetryDaemon([0], name=bus_name, backend=backend, verbose=0)
+        # 上一個 daemon 被殺掉，留下 segment
+        proc = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                              capture_output=True, text=True, check=True)
+        writer.header[H_PID] = int(proc.stdout)
+    finally:
+        writer.close(unlink=False)
+    writer = BusWriter(bus_name, gpu_ids=[0, 1])
+    try:
+        reader = BusReader(bus_name)
+        assert reader.gpu_ids == [0, 1] and reader.count == 0 and reader.writer_alive()
+        reader.close()
+        # 讀取端關閉不會 unlink segment
+        BusReader(bus_name).close()
+    finally:
+        writer.close()
+
+
+def test_monitor_reads_history_and_trend_from_the_daemon(bus_name):
+    base = time.time() - 10.0
+    ticks = iter(range(100))
+    backend = FakeBackend(gpu_ids=[0, 1], samples=[_sample(50.0 + 2.0 * k) for k in range(10)])
+    daemon = TelemetryDaemon([0, 1], name=bus_name, backend=backend, clock=lambda: base + next(ticks),
+                             verbose=0)
+    try:
+        for _ in range(10):
+            daemon.sample_once()
+        monitor = GPUInfoMonitor(gpu_ids=[1], backend=SharedMemoryBackend(gpu_ids=[1], bus=bus_name),
+                                 history_capacity=8)
+        assert monitor.bus_attached
+        monitor.start_sampler()
+        assert not monitor.sampling
+        monitor.update_info()
+        assert monitor.current_temp == 68.0
+        assert len(monitor.history) == 10
+        assert monitor.get_slope_3s() == pytest.approx(2.0)
+        # daemon 在背景取樣，monitor 不讀 backend
+        daemon.clock = time.time
+        daemon.period = 0.01
+        daemon.start()
+        deadline = time.monotonic() + 5.0
+        while monitor.backend.bus.count < 15 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert monitor.backend.bus.count >= 15
+        assert backend.read_count >= 15
+        monitor.close()
+    finally:
+        daemon.close()
@@ -0,0 +1,56 @@
+import numpy as np
+
+from ring_buffer import RingBuffer
+from trend import TrendEstimator
+
+HORIZONS = (1.0, 3.0, 10.0)
+
+
+def _expected(window, horizon):
+    t, y = window[:, 0], window[:, 1]
+    mask = t >= t[-1] - horizon
+    return np.polyfit(t[mask], y[mask], 1)[0], np.polyfit(t[mask], y[mask], 2)[0] * 2.0
+
+
+def test_slopes_match_polyfit_incremental_and_after_rebase():
+    rng = np.random.default_rng(0)
+    buf = RingBuffer(256, 2)
+    # rebase_every 小一點，讓增量更新與整批重算都跑到
+    trend = TrendEstimator(buf, t_col=0, y_col=1, horizons=HORIZONS, rebase_every=50)
+    dt = 0.125        # 2 的冪次：視窗邊界不受浮點誤差影響
+    for i in range(600):
+        t = 1000.0 + i * dt
+        buf.append([t, 60.0 + 0.3 * t + 0.01 * (t - 1000.0) ** 2 + rng.normal(0.0, 0.2)])
+        slopes, accel = trend.update()
+        if i < 100 or i % 7:
+            continue
+        window = buf.window()
+        for h, horizon in enumerate(HORIZONS):
+            slope, _ = _expected(window, horizon)
+            np.testing.assert_allclose(slopes[h], slope, rtol=1e-6, atol=1e-6)
+        _, curvature = _expected(window, max(HORIZONS))
+        np.testing.assert_allclose(accel, curvature, rtol=1e-4, atol=1e-6)
+
+
+def test_short_window_reports_zero_until_it_spans_enough_time():
+    buf = RingBuffer(64, 2)
+    trend = TrendEstimator(buf, horizons=(1.0, 10.0))
+    for i in range(5):
+        buf.append([i * 0.5, float(i)])
+    slopes, _ = trend.update()
+    np.testing.assert_allclose(slopes[0], 2.0)
+    assert slopes[1] == 0.0
+
+
+def test_clear_resets_the_estimator():
+    buf = RingBuffer(64, 2)
+    trend = TrendEstimator(buf, horizons=(1.0,))
+    for i in range(10):
+        buf.append([i * 0.25, 3.0 * i])
+    trend.update()
+    # count 比上次少 => 視為 clear() 過 (等量重填則要像 monitor.clear_history 一樣呼叫 reset())
+    buf.clear()
+    for i in range(6):
+        buf.append([i * 0.25, -1.0 * i])
+    slopes, _ = trend.update()
+    np.testing.assert_allclose(slopes[0], -4.0)
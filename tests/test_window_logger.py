@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from window_logger import WindowAggregator
+
+
+class FakeLogger:
+    def __init__(self):
+        self.records = {}
+        self.excludes = {}
+        self.dumps = []
+
+    def record(self, key, value, exclude=None):
+        self.records[key] = value
+        self.excludes[key] = exclude
+
+    def dump(self, step):
+        self.dumps.append(step)
+
+
+class FakeWriter:
+    def __init__(self):
+        self.scalars = []
+        self.histograms = []
+
+    def add_scalar(self, key, value, step):
+        self.scalars.append((key, value, step))
+
+    def add_histogram(self, key, values, step):
+        self.histograms.append((key, np.asarray(values), step))
+
+
+def test_step_window_summarises_and_resets():
+    window = WindowAggregator(every_steps=3, histograms=("temp",))
+    logger = FakeLogger()
+    for temps in ([60.0, 62.0], [64.0, 66.0], [61.0, 63.0]):
+        window.add("temp", np.array(temps))
+        window.add("reward", temps[0] / 100.0)
+        due = window.step()
+    assert due
+    window.write_logger(logger, step=30)
+    assert logger.dumps == [30]
+    assert logger.records["temp/mean"] == pytest.approx(62.666666, rel=1e-6)
+    assert logger.records["temp/min"] == 60.0 and logger.records["temp/max"] == 66.0
+    assert logger.records["temp/last"] == 63.0 and logger.records["reward/last"] == 0.61
+    assert logger.records["window/steps"] == 3
+    # 直方圖只寫到 TensorBoard
+    assert logger.records["temp/hist"].tolist() == [60.0, 62.0, 64.0, 66.0, 61.0, 63.0]
+    assert "tensorboard" not in logger.excludes["temp/hist"]
+    assert "reward/hist" not in logger.records
+    assert not window.due() and window.summarize() == {} and window.windows == 1
+
+
+def test_time_window_uses_the_clock():
+    now = [0.0]
+    window = WindowAggregator(every_steps=None, every_secs=10.0, clock=lambda: now[0])
+    window.add("temp", 60.0)
+    assert not window.step()
+    now[0] = 9.5
+    assert not window.step()
+    now[0] = 10.0
+    assert window.step()
+    writer = FakeWriter()
+    window.write_summary_writer(writer, step=7)
+    assert ("temp/mean", 60.0, 7) in writer.scalars and ("window/steps", 3, 7) in writer.scalars
+    assert not window.due()
+
+
+def test_a_window_needs_a_length():
+    with pytest.raises(ValueError):
+        WindowAggregator(every_steps=None, every_secs=None)
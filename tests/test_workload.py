@@ -0,0 +1,25 @@
+import time
+
+from workload import CPUWorkload, DutyCycleWorker
+
+
+def test_duty_cycle_worker_runs_bursts_only_when_loaded():
+    worker = DutyCycleWorker(CPUWorkload(size=64), period=0.02, duty=0.0)
+    worker.start()
+    try:
+        time.sleep(0.1)
+        assert worker.bursts == 0
+        worker.set_duty(0.5)
+        time.sleep(0.2)
+        assert worker.bursts > 0 and worker.busy_secs > 0.0
+    finally:
+        worker.close()
+    assert worker._thread is None
+
+
+def test_set_duty_is_clipped():
+    worker = DutyCycleWorker(CPUWorkload(size=8))
+    worker.set_duty(3.0)
+    assert worker.duty == 1.0
+    worker.set_duty(-1.0)
+    assert worker.duty == 0.0
@@ -14,6 +14,9 @@ from stable_baselines3 import PPO
 from stable_baselines3.common.callbacks import CallbackList
 from env import GPUEnv
 from custom_callback import GPUControlCallback,EarlyStopCallback
+from checkpoint import AsyncCheckpointCallback, latest_checkpoint, load_checkpoint
+from preconditioner import Preconditioner
+from workload import CudaMatmulWorkload, DutyCycleWorker
 
 '''
 場景 A: 模擬溫度由安全區到70度之前要學會緩慢提升 PL
@@ -23,6 +26,7 @@ from custom_callback import GPUControlCallback,EarlyStopCallback
 '''
 
 train_name = '25250327train_A'
+checkpoint_dir = f'checkpoints/{train_name}'
 
 def main():
     env = GPUEnv(gpu_id=0, step_time=2.0)
@@ -30,47 +34,68 @@ def main():
     fan_speed_setting = 100
     env.set_fan_speed(fan_speed_setting)
     print(f'已設置fan_speed:{fan_speed_setting}') 
-    # 燒到65度
+    # 燒到65度：背景負載 + 閉迴路控制，升溫期間同時建立模型
     target_temp = 65
-    while env.get_temp() <= target_temp:
-        env.stress_gpu()
-        print(f'正在進行升溫目標:{target_temp},目前:{env.current_temp}')
-    # 設定PL 250W
-    power_limit_setting = 250
-    env.set_power_limit(power_limit_setting)
-    print(f'已設置power limit:{power_limit_setting}')
-    
+    precondition = Preconditioner(
+        env.get_temp, DutyCycleWorker(CudaMatmulWorkload()), target_temp=target_temp
+    )
+    precondition.start()
+
     # 開始訓練
     print('開始訓練')
 
-    model = PPO(
-        "MlpPolicy",
-        env,
-        verbose=1,
-        tensorboard_log=f"./tb_logs/{train_name}",
-        n_steps=256,
-        batch_size=64,
-        n_epochs=5,
-        gamma=0.99,
-        gae_lambda=0.95,
-        clip_range=0.2,
-        policy_kwargs=dict(log_std_init=1.0),
-    )
-
     tensorboard_cb = GPUControlCallback(
         verbose=1, 
-        dump_interval=1,
+        dump_interval=30,            # 每 30 步 (約 1 分鐘) 寫一次視窗彙總
+        aggregate=True,
         csv_path="training_log.csv"  # CSV 檔案名稱
     )
 
+    # 有存檔就從最後一個 checkpoint 接續 (模型、optimizer、timestep、callback 狀態)；
+    # 實機的觀測以升溫後重新 reset 為準，所以等升溫、設定 PL 之後才載入 (reset_env=True)
+    resume = latest_checkpoint(checkpoint_dir) is not None
+    model = None
+    if not resume:
+        model = PPO(
+            "MlpPolicy",
+            env,
+            verbose=1,
+            tensorboard_log=f"./tb_logs/{train_name}",
+            n_steps=256,
+            batch_size=64,
+            n_epochs=5,
+            gamma=0.99,
+            gae_lambda=0.95,
+            clip_range=0.2,
+            policy_kwargs=dict(log_std_init=1.0),
+        )
+
+    # 每 512 步 (約 17 分鐘) 在背景寫一次 checkpoint，保留最近 3 份
+    checkpoint_cb = AsyncCheckpointCallback(checkpoint_dir, save_freq=512, callbacks=[tensorboard_cb])
+
     # 组合回调：先执行 TensorBoard 记录，再检查步数
-    combined_cb = CallbackList([tensorboard_cb, EarlyStopCallback(max_steps=10000)])
+    combined_cb = CallbackList([tensorboard_cb, checkpoint_cb, EarlyStopCallback(max_steps=10000)])
+
+    if not precondition.wait_ready():
+        print(f'[WARN] 未達穩定目標溫度:{target_temp},狀態:{precondition.status.state},目前:{precondition.status.temp}')
+    precondition.close()
+    # 設定PL 250W
+    power_limit_setting = 250
+    env.set_power_limit(power_limit_setting)
+    print(f'已設置power limit:{power_limit_setting}')
+
+    if resume:
+        model, _ = load_checkpoint(checkpoint_dir, env, callbacks=[tensorboard_cb], reset_env=True,
+                                   tensorboard_log=f"./tb_logs/{train_name}")
+        print(f'從 checkpoint 接續訓練: step {model.num_timesteps}')
 
     model.learn(
-    total_timesteps=10000,  # 保留此参数（虽然实际由 EarlyStopCallback 控制）
+    total_timesteps=10000 - model.num_timesteps,  # 保留此参数（虽然实际由 EarlyStopCallback 控制）
     callback=combined_cb,
-    log_interval=1
+    log_interval=1,
+    reset_num_timesteps=False
     )
+    checkpoint_cb.close()
 
     model.save("modelA.zip")
     print('訓練結束')
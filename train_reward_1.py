@@ -2,6 +2,9 @@ from stable_baselines3 import PPO
 from stable_baselines3.common.callbacks import CallbackList
 from env import GPUEnv
 from custom_callback import GPUControlCallback,EarlyStopCallback
+from preconditioner import Preconditioner
+from workload import CudaMatmulWorkload, DutyCycleWorker
+from reward import reward_1
 from torch.utils.tensorboard import SummaryWriter
 
 
@@ -9,14 +12,6 @@ train_name = 'train_reward_A'
 writer = SummaryWriter(log_dir=f"./tb_logs/{train_name}")
 import inspect
 
-def reward_1(temp, pl_old, pl_new):
-    if temp >= 80:
-        return -100
-    elif temp >= 75:
-        return -5 * (temp - 75)
-    else:
-        return (pl_new - 100) / 175 - (temp / 75)**2
-
 reward_source = inspect.getsource(reward_1)
 writer.add_text("Reward Function", f"```python\n{reward_source}\n```", global_step=0)
 writer.close()
@@ -28,16 +23,13 @@ def main():
     fan_speed_setting = 100
     env.set_fan_speed(fan_speed_setting)
     print(f'已設置fan_speed:{fan_speed_setting}') 
-    # 燒到65度
+    # 燒到65度：背景負載 + 閉迴路控制，升溫期間同時建立模型
     target_temp = 65
-    while env.get_temp() <= target_temp:
-        env.stress_gpu()
-        print(f'正在進行升溫目標:{target_temp},目前:{env.current_temp}')
-    # 設定PL 250W
-    power_limit_setting = 250
-    env.set_power_limit(power_limit_setting)
-    print(f'已設置power limit:{power_limit_setting}')
-    
+    precondition = Preconditioner(
+        env.get_temp, DutyCycleWorker(CudaMatmulWorkload()), target_temp=target_temp
+    )
+    precondition.start()
+
     # 開始訓練
     print('開始訓練')
 
@@ -57,13 +49,22 @@ def main():
 
     tensorboard_cb = GPUControlCallback(
         verbose=1, 
-        dump_interval=1,
+        dump_interval=30,            # 每 30 步 (約 1 分鐘) 寫一次視窗彙總
+        aggregate=True,
         csv_path="training_log.csv"  # CSV 檔案名稱
     )
 
     # 组合回调：先执行 TensorBoard 记录，再检查步数
     combined_cb = CallbackList([tensorboard_cb, EarlyStopCallback(max_steps=10000)])
 
+    if not precondition.wait_ready():
+        print(f'[WARN] 未達穩定目標溫度:{target_temp},狀態:{precondition.status.state},目前:{precondition.status.temp}')
+    precondition.close()
+    # 設定PL 250W
+    power_limit_setting = 250
+    env.set_power_limit(power_limit_setting)
+    print(f'已設置power limit:{power_limit_setting}')
+
     model.learn(
     total_timesteps=10000,  # 保留此参数（虽然实际由 EarlyStopCallback 控制）
     callback=combined_cb,
@@ -0,0 +1,47 @@
+"""
+train_sim.py
+
+ - 在模擬器 (SimGPUVecEnv) 上預訓練場景 A，不佔用實體 GPU
+ - 與 train.py 相同的 PPO 設定，env 換成 N 個並行的模擬 GPU
+ - 產出的模型可用 PPO.load("modelA_sim.zip", env=GPUEnv(...)) 接到實機繼續訓練
+"""
+
+from stable_baselines3 import PPO
+from sim_vec_env import SimGPUVecEnv
+
+train_name = 'sim_train_A'
+
+def main():
+    env = SimGPUVecEnv(
+        num_envs=256,
+        step_time=2.0,
+        seed=0,
+        max_episode_steps=512,
+        jitter=0.1,          # 每張模擬卡的熱阻/熱容/功耗 ±10%
+    )
+    # 場景 A: fan=100%，燒到 65 度，PL 從 250W 開始
+    env.set_fan_speed(100)
+    env.warm_up(target_temp=65)
+    env.set_power_limit(250)
+
+    model = PPO(
+        "MlpPolicy",
+        env,
+        verbose=1,
+        tensorboard_log=f"./tb_logs/{train_name}",
+        n_steps=256,
+        batch_size=64 * 64,
+        n_epochs=5,
+        gamma=0.99,
+        gae_lambda=0.95,
+        clip_range=0.2,
+        policy_kwargs=dict(log_std_init=1.0),
+    )
+
+    model.learn(total_timesteps=2_000_000, log_interval=1)
+
+    model.save("modelA_sim.zip")
+    print('模擬訓練結束')
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+trend.py
+溫度趨勢估計：多個時間視窗 (例如 1s / 3s / 10s) 的最小平方斜率 + 二階導數。
+
+以 running sums (Σt^k, Σt^k·y) 增量更新，每筆樣本攤銷 O(1)；
+定期 (rebase) 以 numpy 對 ring buffer 視窗整批重算，消除累積誤差。
+"""
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+# sums 欄位: S0..S4 = Σdt^k, Y0..Y2 = Σdt^k * y
+_N_POW = 5
+_N_YPOW = 3
+
+
+def _row_terms(dt, y):
+    """Power terms of one sample as a plain list (hot path, no numpy overhead)."""
+    dt2 = dt * dt
+    return [1.0, dt, dt2, dt2 * dt, dt2 * dt2, y, dt * y, dt2 * y]
+
+
+def _terms(dt, y):
+    """Power terms for many samples (1-D arrays), vectorized."""
+    dt = np.asarray(dt, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    pows = dt[..., None] ** np.arange(_N_POW)
+    return np.concatenate([pows, pows[..., :_N_YPOW] * y[..., None]], axis=-1)
+
+
+class TrendEstimator:
+    """
+    Sliding-window least-squares slope of column y_col over several horizons,
+    computed incrementally from rows appended to a shared RingBuffer.
+    Args:
+        buffer: RingBuffer holding (time, ..., value, ...) rows
+        horizons: window lengths in seconds
+        min_span: a window must cover at least min_span * horizon seconds,
+                  otherwise its slope is reported as 0.0
+        rebase_every: recompute sums from scratch after this many samples
+    """
+
+    def __init__(self, buffer: RingBuffer, t_col=0, y_col=1,
+                 horizons=(1.0, 3.0, 10.0), min_span=0.5, rebase_every=512):
+        self.buffer = buffer
+        self.t_col = t_col
+        self.y_col = y_col
+        self.horizons = np.asarray(horizons, dtype=np.float64)
+        self._horizons = self.horizons.tolist()
+        self._longest = int(np.argmax(self.horizons))
+        self.min_span = min_span
+        self.rebase_every = rebase_every
+        # 時間原點離最新樣本太遠時也重算，避免 Σdt^4 數值過大
+        self.rebase_secs = 4.0 * float(self.horizons.max())
+        self.reset()
+
+    def reset(self):
+        n_h = len(self.horizons)
+        # 熱路徑用 python list (每個視窗 8 個 running sums)，避免 numpy 純量開銷
+        self._sums = [[0.0] * (_N_POW + _N_YPOW) for _ in range(n_h)]
+        # 每個視窗最舊一筆的絕對索引 (RingBuffer.count 座標)
+        self._head = [0] * n_h
+        self._seen = 0
+        self._t_ref = 0.0
+        self._since_rebase = 0
+        # 發佈給讀取端的結果 (整組替換，讀取端不需上鎖)
+        self.result = (np.zeros(n_h), 0.0)
+
+    def update(self):
+        """Consume rows appended to the buffer since the last call."""
+        buf = self.buffer
+        count = buf.count
+        if count < self._seen:
+            # buffer 被 clear() 過
+            self.reset()
+        if count == self._seen:
+            return self.result
+
+        t_new = float(buf.row(count - 1)[self.t_col])
+        if (self._seen == 0
+                or self._since_rebase >= self.rebase_every
+                or t_new - self._t_ref > self.rebase_secs
+                or count - min(self._head) > buf.capacity):
+            # 第一次 / 定期 / 視窗頭已被覆寫 => 整批重算
+            self._seen = count
+            self._rebase()
+        else:
+            t_col, y_col = self.t_col, self.y_col
+            for i in range(self._seen, count):
+                row = buf.row(i)
+                terms = _row_terms(float(row[t_col]) - self._t_ref, float(row[y_col]))
+                for sums in self._sums:
+                    for k, v in enumerate(terms):
+                        sums[k] += v
+                self._since_rebase += 1
+            self._seen = count
+            self._evict(t_new)
+
+        self.result = self._solve()
+        return self.result
+
+    def _evict(self, t_new):
+        buf = self.buffer
+        count = self._seen
+        t_col, y_col = self.t_col, self.y_col
+        for h, horizon in enumerate(self._horizons):
+            head = self._head[h]
+            sums = self._sums[h]
+            cutoff = t_new - horizon
+            while head < count - 1:
+                row = buf.row(head)
+                t_old = float(row[t_col])
+                if t_old >= cutoff:
+                    break
+                for k, v in enumerate(_row_terms(t_old - self._t_ref, float(row[y_col]))):
+                    sums[k] -= v
+                head += 1
+            self._head[h] = head
+
+    def _rebase(self):
+        # 以最新時間為原點，整批重算每個視窗的 sums
+        buf = self.buffer
+        window = buf.window()
+        t = window[:, self.t_col]
+        y = window[:, self.y_col]
+        self._t_ref = float(t[-1])
+        terms = _terms(t - self._t_ref, y)
+        first = self._seen - len(window)
+        starts = np.searchsorted(t, t[-1] - self.horizons, side="left")
+        cum = np.concatenate([np.zeros((1, terms.shape[1])), np.cumsum(terms, axis=0)])
+        self._sums = (cum[-1] - cum[starts]).tolist()
+        self._head = (first + starts).tolist()
+        self._since_rebase = 0
+
+    def _solve(self):
+        buf = self.buffer
+        t_new = float(buf.row(self._seen - 1)[self.t_col])
+        slopes = [0.0] * len(self._horizons)
+        accel = 0.0
+        for h, horizon in enumerate(self._horizons):
+            s0, s1, s2, s3, s4, y0, y1, y2 = self._sums[h]
+            t_head = float(buf.row(self._head[h])[self.t_col])
+            if s0 < 2 or t_new - t_head < self.min_span * horizon:
+                continue
+            denom = s0 * s2 - s1 * s1
+            if denom <= 1e-12:
+                continue
+            slopes[h] = (s0 * y1 - s1 * y0) / denom
+
+            # 二階導數: 最長視窗做二次擬合 y = c0 + c1*t + c2*t^2 => y'' = 2*c2 (Cramer)
+            if h == self._longest and s0 >= 3:
+                det = (s0 * (s2 * s4 - s3 * s3)
+                       - s1 * (s1 * s4 - s3 * s2)
+                       + s2 * (s1 * s3 - s2 * s2))
+                scale = s0 * s2 * s4
+                if scale > 0 and abs(det) > 1e-9 * scale:
+                    det_c2 = (s0 * (s2 * y2 - s3 * y1)
+                              - s1 * (s1 * y2 - s3 * y0)
+                              + s2 * (s1 * y1 - s2 * y0))
+                    accel = 2.0 * det_c2 / det
+        return np.array(slopes), accel
+
+    def slopes(self):
+        """Dict {horizon_seconds: slope} of the latest published result."""
+        slopes, _ = self.result
+        return dict(zip(self.horizons.tolist(), slopes.tolist()))
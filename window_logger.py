@@ -0,0 +1,109 @@
+"""
+window_logger.py
+TensorBoard 視窗彙總：每步只把數值放進記憶體，每個視窗 (N 步或 T 秒) 才寫一次
+mean / min / max / last 與指定 key 的直方圖，取代每步 logger.dump()。
+
+可輸出到 SB3 logger (model.logger) 或 torch SummaryWriter。
+"""
+import time
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+# 直方圖只給 TensorBoard，其他 SB3 輸出格式 (stdout / csv / json) 不支援陣列
+_HIST_EXCLUDE = ("stdout", "log", "json", "csv")
+
+
+class WindowAggregator:
+    """
+    Collects per-step values and emits one summary per window.
+    Args:
+        every_steps: window length in steps (None = wall clock only)
+        every_secs: window length in wall-clock seconds (None = steps only)
+        histograms: keys that are also written as a histogram of the window's values
+    """
+
+    def __init__(self, every_steps: Optional[int] = 100, every_secs: Optional[float] = None,
+                 histograms: Iterable[str] = (), clock=time.monotonic):
+        if every_steps is None and every_secs is None:
+            raise ValueError("set every_steps and/or every_secs")
+        self.every_steps = every_steps
+        self.every_secs = every_secs
+        self.histograms = set(histograms)
+        self.clock = clock
+        self._values: Dict[str, list] = {}
+        self._steps = 0
+        self._t_start = clock()
+        self.windows = 0
+
+    def add(self, key: str, value):
+        """Add a scalar or an array (e.g. one value per env) for this window."""
+        values = self._values.get(key)
+        if values is None:
+            values = self._values[key] = []
+        if np.ndim(value):
+            values.extend(np.ravel(value).tolist())
+        else:
+            values.append(float(value))
+
+    def add_many(self, values: dict):
+        for key, value in values.items():
+            self.add(key, value)
+
+    def step(self, n=1) -> bool:
+        """Count n steps; True when the window is due."""
+        self._steps += n
+        return self.due()
+
+    def due(self) -> bool:
+        if self._steps == 0:
+            return False
+        if self.every_steps is not None and self._steps >= self.every_steps:
+            return True
+        return self.every_secs is not None and self.clock() - self._t_start >= self.every_secs
+
+    def summarize(self) -> dict:
+        """{"key/mean", "key/min", "key/max", "key/last"} for every key plus "key/hist" arrays."""
+        out = {}
+        for key, values in self._values.items():
+            if not values:
+                continue
+            arr = np.asarray(values, dtype=np.float64)
+            out[f"{key}/mean"] = float(arr.mean())
+            out[f"{key}/min"] = float(arr.min())
+            out[f"{key}/max"] = float(arr.max())
+            out[f"{key}/last"] = float(arr[-1])
+            if key in self.histograms:
+                out[f"{key}/hist"] = arr
+        return out
+
+    def reset(self):
+        for values in self._values.values():
+            values.clear()
+        self._steps = 0
+        self._t_start = self.clock()
+
+    # ------------------------------------------------------------------
+    def write_logger(self, logger, step: int, dump=True):
+        """Record the window into an SB3 logger and reset (dump=True writes the event file)."""
+        for key, value in self.summarize().items():
+            if isinstance(value, np.ndarray):
+                logger.record(key, value, exclude=_HIST_EXCLUDE)
+            else:
+                logger.record(key, value)
+        logger.record("window/steps", self._steps)
+        if dump:
+            logger.dump(step)
+        self.windows += 1
+        self.reset()
+
+    def write_summary_writer(self, writer, step: int):
+        """Write the window through a torch SummaryWriter and reset."""
+        for key, value in self.summarize().items():
+            if isinstance(value, np.ndarray):
+                writer.add_histogram(key, value, step)
+            else:
+                writer.add_scalar(key, value, step)
+        writer.add_scalar("window/steps", self._steps, step)
+        self.windows += 1
+        self.reset()
@@ -0,0 +1,139 @@
+"""
+workload.py
+升溫 / 預熱用的負載產生器。
+
+ - CudaMatmulWorkload : GPU 矩陣乘法 (tensor 只配置一次，每個 burst 一次 matmul + synchronize)
+ - CPUWorkload        : numpy 矩陣乘法，沒有 GPU 時的替代負載 (測試 / 開發用)
+ - DutyCycleWorker    : 背景執行緒，每個 period 先跑 duty * period 秒的 burst 再休息，
+                        duty 可隨時調整 (0 = 閒置，1 = 滿載)
+ - SimLoad            : 模擬環境用，duty 直接對應 ThermalModel 的 util
+"""
+import threading
+import time
+
+import numpy as np
+
+
+class CPUWorkload:
+    """Stand-in load: one numpy matmul per burst (BLAS releases the GIL)."""
+
+    def __init__(self, size=256, seed=0):
+        rng = np.random.default_rng(seed)
+        self.a = rng.standard_normal((size, size), dtype=np.float32)
+        self.b = rng.standard_normal((size, size), dtype=np.float32)
+
+    def burst(self):
+        np.matmul(self.a, self.b)
+
+    def close(self):
+        pass
+
+
+class CudaMatmulWorkload:
+    """
+    GPU load: one size x size matmul per burst, synchronized so the duty cycle
+    measures real GPU busy time. Tensors are allocated on the first burst.
+    """
+
+    def __init__(self, size=4096, device="cuda"):
+        self.size = size
+        self.device = device
+        self._a = self._b = None
+
+    def burst(self):
+        import torch
+        if self._a is None:
+            self._a = torch.randn(self.size, self.size, device=self.device)
+            self._b = torch.randn(self.size, self.size, device=self.device)
+        torch.matmul(self._a, self._b)
+        torch.cuda.synchronize(self.device)
+
+    def close(self):
+        self._a = self._b = None
+
+
+class DutyCycleWorker:
+    """
+    Runs workload.burst() in a background thread for a fraction of every period.
+    Args:
+        workload: object with burst() (short, blocking) and close()
+        period: duty-cycle period in seconds (shorter than the thermal time constant)
+        duty: initial duty in [0, 1]
+    """
+
+    def __init__(self, workload, period=0.2, duty=0.0, clock=time.monotonic):
+        self.workload = workload
+        self.period = float(period)
+        self.clock = clock
+        self._duty = float(np.clip(duty, 0.0, 1.0))
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.busy_secs = 0.0
+        self.bursts = 0
+
+    @property
+    def duty(self) -> float:
+        return self._duty
+
+    def set_duty(self, duty: float):
+        # 單一 float 指派，worker 下一個 period 生效
+        self._duty = float(np.clip(duty, 0.0, 1.0))
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="duty-cycle-load", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def close(self):
+        self.stop()
+        self.workload.close()
+
+    def _loop(self):
+        clock = self.clock
+        while not self._stop_event.is_set():
+            t0 = clock()
+            on_time = self._duty * self.period
+            while clock() - t0 < on_time and not self._stop_event.is_set():
+                self.workload.burst()
+                self.bursts += 1
+            busy = clock() - t0
+            self.busy_secs += busy
+            self._stop_event.wait(max(self.period - busy, 0.0))
+
+
+class SimLoad:
+    """Duty interface for ThermalModel: duty d sets util = 100 * d (restored on stop)."""
+
+    def __init__(self, model, index=None):
+        self.model = model
+        self.index = index
+        self._saved = None
+
+    @property
+    def duty(self) -> float:
+        util = self.model.util if self.index is None else self.model.util[self.index]
+        return float(np.mean(util)) / 100.0
+
+    def set_duty(self, duty: float):
+        self.model.set_util(100.0 * float(np.clip(duty, 0.0, 1.0)), index=self.index)
+
+    def start(self):
+        if self._saved is None:
+            self._saved = np.array(self.model.util, copy=True)
+
+    def stop(self):
+        if self._saved is not None:
+            self.model.util[:] = self._saved
+            self._saved = None
+
+    def close(self):
+        self.stop()